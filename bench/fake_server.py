@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class FakeOpenLibrary:
+    """
+    A local stand-in for the openlibrary API, for benchmarks and tests.
+
+    Serves /search.json, /works/*.json, /books/*.json and /api/books with
+    generated data for a single author, and /recentchanges.json from the
+    changes list, which is kept newest first. Requests for a path in
+    failing_paths, such as "/works/OL1W.json", are answered with a 503.
+
+    Args:
+        num_books (int): The number of works the author has.
+        latency (float): Seconds added to every response.
+        jitter (float): Up to this many extra seconds added at random.
+        error_rate (float): The fraction of requests answered with a 503.
+        payload_size (int): The number of subjects per work, which sets
+            the size of work responses.
+        seed (int): Seeds the random jitter and errors.
+    """
+
+    def __init__(
+        self,
+        num_books=100,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        payload_size=10,
+        seed=0
+    ):
+        self.num_books = num_books
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.payload_size = payload_size
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.publisher = "Fake Press"
+        self.changes = []
+        self.failing_paths = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        """The base URL to pass to the fetch functions."""
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Starts serving in a background thread."""
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """Stops the server and closes its socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handler(self):
+        """Builds a request handler class bound to this server."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, body = fake.respond(self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if status == 503:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path):
+        """
+        Builds the response to a request, after the configured delay.
+
+        Args:
+            path (str): The request path and query string.
+
+        Returns:
+            tuple: The status code and JSON body.
+        """
+        with self.lock:
+            self.request_count += 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            failed = self.random.random() < self.error_rate
+
+        time.sleep(delay)
+
+        parsed = urlparse(path)
+
+        if failed or parsed.path in self.failing_paths:
+            return 503, {"error": "Service Unavailable"}
+
+        query = {
+            key: values[0] for key, values in parse_qs(parsed.query).items()
+        }
+
+        if parsed.path == "/search.json":
+            return 200, self.search(query)
+        if parsed.path == "/recentchanges.json":
+            offset = int(query.get("offset", 0))
+            return 200, self.changes[offset:offset + int(query.get("limit", 100))]
+        if parsed.path == "/api/books":
+            return 200, {
+                bibkey: {"bib_key": bibkey, "details": self.edition(bibkey[5:])}
+                for bibkey in query.get("bibkeys", "").split(",")
+                if bibkey
+            }
+        if parsed.path.startswith("/works/"):
+            return 200, self.work(parsed.path[:-len(".json")])
+        if parsed.path.startswith("/books/"):
+            edition_key = parsed.path[len("/books/"):-len(".json")]
+            return 200, self.edition(edition_key)
+        return 404, {"error": "notfound"}
+
+    def search(self, query):
+        """Builds a page of search results."""
+        limit = int(query.get("limit", 100))
+        start = (int(query.get("page", 1)) - 1) * limit
+        end = min(start + limit, self.num_books)
+
+        return {
+            "numFound": self.num_books,
+            "start": start,
+            "docs": [
+                {
+                    "key": f"/works/OL{i}W",
+                    "title": f"Book {i}",
+                    "author_name": [query.get("author", "")],
+                    "first_publish_year": 1900 + i % 120,
+                    "edition_count": i % 50 + 1,
+                    "language": ["eng"],
+                    "cover_edition_key": f"OL{i}M"
+                }
+                for i in range(start, end)
+            ]
+        }
+
+    def work(self, key):
+        """Builds a work record."""
+        return {
+            "key": key,
+            "subjects": [f"Subject {i}" for i in range(self.payload_size)]
+        }
+
+    def edition(self, key):
+        """Builds an edition record."""
+        return {
+            "key": f"/books/{key}",
+            "publishers": [self.publisher],
+            "isbn_13": [f"978{zlib.crc32(key.encode()) % 10 ** 10:010d}"]
+        }
+
+class FakeOpenLibraryProcess:
+    """
+    Runs a FakeOpenLibrary in a separate process.
+
+    Benchmarks use this so the server's response building is not counted
+    in the client's memory and does not compete with it for the GIL.
+
+    Takes the same arguments as FakeOpenLibrary.
+    """
+
+    def __init__(
+        self,
+        num_books=100,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        payload_size=10,
+        seed=0
+    ):
+        self.num_books = num_books
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.payload_size = payload_size
+        self.seed = seed
+        self.process = None
+        self.url = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Starts the server process and waits for its URL."""
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "bench.fake_server",
+                "--books", str(self.num_books),
+                "--latency", str(self.latency),
+                "--jitter", str(self.jitter),
+                "--error-rate", str(self.error_rate),
+                "--payload-size", str(self.payload_size),
+                "--seed", str(self.seed)
+            ],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True
+        )
+        self.url = self.process.stdout.readline().strip()
+        if not self.url:
+            self.stop()
+            raise RuntimeError("The fake server process did not start")
+
+    def stop(self):
+        """Stops the server process by closing its input."""
+        self.process.stdin.close()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a fake openlibrary API until stdin is closed."
+    )
+    parser.add_argument("--books", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--payload-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with FakeOpenLibrary(
+        num_books=args.books,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        payload_size=args.payload_size,
+        seed=args.seed
+    ) as server:
+        print(server.url, flush=True)
+        sys.stdin.read()
+
+if __name__ == "__main__":
+    main()
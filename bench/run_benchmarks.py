@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import threading
+import time
+import tracemalloc
+from bench.fake_server import FakeOpenLibraryProcess
+from src import async_utils
+from src.hedge import HedgedSession
+from src.pipeline import iter_staged_book_data
+from src.throttle import AdaptiveConcurrency, ThrottledSession
+from src.utils import create_session, generate_book_data
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+class TimedSession:
+    """
+    Records how long each GET request takes, and counts server errors.
+
+    Args:
+        session (requests.Session): The session to send requests with.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.latencies = []
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        started = time.perf_counter()
+        response = self.session.get(url, **kwargs)
+        with self.lock:
+            self.latencies.append(time.perf_counter() - started)
+            self.errors += response.status_code >= 500
+        return response
+
+class TimedAsyncClient:
+    """
+    An async client that sends requests with a TimedSession in threads.
+
+    Args:
+        timed_session (TimedSession): Sends and times the requests.
+    """
+
+    def __init__(self, timed_session):
+        self.timed_session = timed_session
+
+    async def get(self, url):
+        return await asyncio.to_thread(self.timed_session.get, url)
+
+def run_serial(url, session, workers):
+    """Runs generate_book_data one book at a time."""
+    return generate_book_data("Benchmark Author", url, session=session)
+
+def run_threaded(url, session, workers):
+    """Runs generate_book_data with a worker pool."""
+    return generate_book_data(
+        "Benchmark Author", url, max_workers=workers, session=session
+    )
+
+def run_throttled(url, session, workers):
+    """Runs generate_book_data with a worker pool behind adaptive throttling."""
+    throttled = ThrottledSession(session)
+    return generate_book_data(
+        "Benchmark Author", url, max_workers=workers, session=throttled
+    )
+
+def run_hedged(url, session, workers):
+    """Runs generate_book_data with a worker pool and hedged requests."""
+    hedged = HedgedSession(session, max_workers=workers * 2)
+    records = generate_book_data(
+        "Benchmark Author", url, max_workers=workers, session=hedged
+    )
+    hedged.close()
+    return records
+
+def run_streamed(url, session, workers):
+    """Runs generate_book_data with a worker pool and streamed search pages."""
+    return generate_book_data(
+        "Benchmark Author",
+        url,
+        max_workers=workers,
+        session=session,
+        stream=True
+    )
+
+def run_staged(url, session, workers):
+    """Runs the staged pipeline with a worker pool for the enrich-work stage."""
+    return list(iter_staged_book_data(
+        "Benchmark Author", url, session, workers={"enrich-work": workers}
+    ))
+
+def run_async(url, session, workers):
+    """Runs the asyncio pipeline."""
+    return asyncio.run(async_utils.generate_book_data(
+        "Benchmark Author",
+        url,
+        client=TimedAsyncClient(session),
+        concurrency=workers
+    ))
+
+def retrying(session, workers):
+    """
+    Retries server errors without limiting the request rate.
+
+    Args:
+        session (TimedSession): Sends and times the requests.
+        workers (int): The concurrency to keep, unchanged by throttling.
+
+    Returns:
+        ThrottledSession: A session that retries 5xx responses.
+    """
+    return ThrottledSession(
+        session,
+        concurrency=AdaptiveConcurrency(
+            initial=workers, minimum=workers, maximum=workers
+        ),
+        backoff=0.01
+    )
+
+MODES = {
+    "serial": run_serial,
+    "threaded": run_threaded,
+    "throttled": run_throttled,
+    "hedged": run_hedged,
+    "streamed": run_streamed,
+    "staged": run_staged,
+    "async": run_async
+}
+
+# Modes that retry failed requests themselves
+RETRYING_MODES = {"throttled"}
+
+def run_benchmark(mode, server, workers=16):
+    """
+    Times one pipeline mode against a fake openlibrary server.
+
+    Args:
+        mode (str): One of the MODES keys.
+        server (FakeOpenLibraryProcess): A running fake server. A
+            FakeOpenLibrary in this process also works, but its work is
+            then counted in the measurements.
+        workers (int): The worker pool size or concurrency limit.
+
+    When the server injects errors, modes that do not retry on their own
+    are run behind a retrying session, so every mode finishes.
+
+    Returns:
+        dict: Records per second, request latency percentiles in
+            milliseconds, server errors seen and peak Python memory in
+            bytes.
+    """
+    with create_session(pool_size=workers) as session:
+        timed_session = TimedSession(session)
+        mode_session = timed_session
+        if server.error_rate and mode not in RETRYING_MODES:
+            mode_session = retrying(timed_session, workers)
+        tracemalloc.start()
+        started = time.perf_counter()
+
+        try:
+            records = MODES[mode](server.url, mode_session, workers)
+        finally:
+            elapsed = time.perf_counter() - started
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    latencies = sorted(timed_session.latencies)
+
+    return {
+        "mode": mode,
+        "records": len(records),
+        "seconds": round(elapsed, 4),
+        "records_per_second": round(len(records) / elapsed, 2),
+        "requests": len(latencies),
+        "errors": timed_session.errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "peak_memory_bytes": peak_memory
+    }
+
+def percentile(values, pct):
+    """
+    Finds a percentile of sorted values by the nearest-rank method.
+
+    Args:
+        values (list): Values in ascending order.
+        pct (float): The percentile, from 0 to 100.
+
+    Returns:
+        float: The percentile, or 0 if there are no values.
+    """
+    if not values:
+        return 0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+def current_version():
+    """
+    Names the code being benchmarked.
+
+    Returns:
+        str: The short git commit hash, or "unknown" outside a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def save_results(results, directory=RESULTS_DIR):
+    """
+    Saves a benchmark run and compares it with the last one like it.
+
+    Args:
+        results (dict): The run's settings and per-mode results.
+        directory (str): Where result files are kept.
+
+    Returns:
+        dict: The change in records per second for each mode since the
+            latest run with the same settings, as a fraction. Modes that
+            failed in either run are left out. Empty if there is no such
+            run.
+    """
+    os.makedirs(directory, exist_ok=True)
+    previous_files = sorted(
+        name for name in os.listdir(directory) if name.endswith(".json")
+    )
+    changes = {}
+    previous = {}
+
+    for name in reversed(previous_files):
+        with open(os.path.join(directory, name)) as file:
+            run = json.load(file)
+        if run.get("settings") == results.get("settings"):
+            previous = {result["mode"]: result for result in run["results"]}
+            break
+
+    for result in results["results"]:
+        before = previous.get(result["mode"], {})
+        if before.get("records_per_second") and "error" not in result:
+            changes[result["mode"]] = round(
+                result["records_per_second"]
+                / before["records_per_second"] - 1,
+                4
+            )
+
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{results['version']}.json"
+    with open(os.path.join(directory, name), "w") as file:
+        json.dump(results, file, indent=2)
+
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline against a fake openlibrary server."
+    )
+    parser.add_argument("--books", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--payload-size", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--modes", nargs="+", default=list(MODES))
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    settings = {
+        "books": args.books,
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "payload_size": args.payload_size,
+        "workers": args.workers
+    }
+    results = []
+
+    for mode in args.modes:
+        with FakeOpenLibraryProcess(
+            num_books=args.books,
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            payload_size=args.payload_size
+        ) as server:
+            try:
+                result = run_benchmark(mode, server, args.workers)
+            except Exception as error:
+                result = {"mode": mode, "error": f"{type(error).__name__}: {error}"}
+        results.append(result)
+
+        if "error" in result:
+            print(f"{mode:>10}: failed with {result['error']}")
+            continue
+        print(
+            f"{mode:>10}: {result['records_per_second']:>9} records/s  "
+            f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  "
+            f"{result['errors']} errors  "
+            f"peak {result['peak_memory_bytes'] / 1024:.0f} KiB"
+        )
+
+    if not args.no_save:
+        changes = save_results({
+            "version": current_version(),
+            "settings": settings,
+            "results": results
+        })
+        for mode, change in changes.items():
+            print(f"{mode:>10}: {change:+.1%} records/s since the last run")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import asyncio
+import contextlib
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from src.utils import (
+    EDITION_BATCH_SIZE,
+    SEARCH_PAGE_SIZE,
+    batched,
+    create_session,
+    edition_batch_params,
+    empty_isbn_and_publisher_data,
+    extract_edition_batch,
+    extract_isbn_and_publisher_data,
+    extract_subjects,
+    get_edition_key,
+    merge_dicts,
+    search_params,
+    update_book_data
+)
+
+DEFAULT_CONCURRENCY = 100
+
+class SessionClient:
+    """
+    Sends async GET requests through a pooled requests session.
+
+    Each request runs on a thread pool sized to the concurrency, so the
+    number of requests in flight is not capped by asyncio's default
+    executor, and connections are reused from the session's pool.
+
+    Args:
+        session (requests.Session, optional): The session to send requests
+            with, such as one from create_session. A pooled session with
+            max_workers connections is created if not provided.
+        max_workers (int): The number of requests that can be in flight.
+    """
+
+    def __init__(self, session=None, max_workers=DEFAULT_CONCURRENCY):
+        self.owns_session = session is None
+        self.session = session or create_session(max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def get(self, url):
+        """
+        Performs a GET request on the thread pool.
+
+        Args:
+            url (str): The URL to request.
+
+        Returns:
+            requests.Response: The response.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.session.get, url)
+
+    def close(self):
+        """Stops the thread pool and closes the session if it was created here."""
+        self.executor.shutdown()
+        if self.owns_session:
+            self.session.close()
+
+async def get_json(url, client=None, semaphore=None):
+    """
+    Performs a GET request and decodes the JSON response body.
+
+    Args:
+        url (str): The URL to request.
+        client (object, optional): An async HTTP client whose get method
+            is awaitable, such as httpx.AsyncClient or a SessionClient. If
+            not provided, the request is made with requests in a worker
+            thread of asyncio's default executor, which suits one-off
+            calls only.
+        semaphore (asyncio.Semaphore, optional): Limits the number of
+            requests in flight.
+
+    Returns:
+        dict: The decoded response body.
+    """
+    async with semaphore or contextlib.nullcontext():
+        if client is None:
+            response = await asyncio.to_thread(requests.get, url)
+        else:
+            response = await client.get(url)
+    response.raise_for_status()
+    return response.json()
+
+async def fetch_books_by_author(name, url, client=None, semaphore=None):
+    """
+    Fetches a list of books from every page of the openlibrary search API.
+
+    Args:
+        name (str): The name of an author.
+        url (str): An openlibrary URL.
+        client (object, optional): An async HTTP client.
+        semaphore (asyncio.Semaphore, optional): Limits requests in flight.
+
+    Returns:
+        list: A list of dictionaries with information about the author's books.
+    """
+    books = []
+    page = 1
+
+    while True:
+        query = urlencode(search_params(name, page, SEARCH_PAGE_SIZE))
+        data = await get_json(f"{url}/search.json?{query}", client, semaphore)
+        docs = data["docs"]
+        books.extend(docs)
+        total = data.get("numFound")
+
+        if len(docs) < SEARCH_PAGE_SIZE:
+            return books
+        if total is not None and len(books) >= total:
+            return books
+
+        page += 1
+
+async def fetch_book_subjects(book_key, url, client=None, semaphore=None):
+    """
+    Retrieves the list of subjects for a book.
+
+    Args:
+        book_key (str): The openlibrary key for a book.
+        url (str): The main openlibrary URL.
+        client (object, optional): An async HTTP client.
+        semaphore (asyncio.Semaphore, optional): Limits requests in flight.
+
+    Returns:
+        dict: A dictionary listing the book's subjects.
+    """
+    data = await get_json(f"{url}{book_key}.json", client, semaphore)
+    return extract_subjects(data)
+
+async def fetch_isbn_and_publisher_data(
+    edition_key, url, client=None, semaphore=None
+):
+    """
+    Retrieves a book's ISBN and publisher data.
+
+    Args:
+        edition_key (str): A book's edition key.
+        url (str): An openlibrary URL.
+        client (object, optional): An async HTTP client.
+        semaphore (asyncio.Semaphore, optional): Limits requests in flight.
+
+    Returns:
+        dict: The book's ISBN and publisher data.
+    """
+    data = await get_json(f"{url}/books/{edition_key}.json", client, semaphore)
+    return extract_isbn_and_publisher_data(data)
+
+async def fetch_isbn_and_publisher_data_batch(
+    edition_keys,
+    url,
+    client=None,
+    semaphore=None,
+    batch_size=EDITION_BATCH_SIZE
+):
+    """
+    Retrieves ISBN and publisher data for many editions at once.
+
+    Editions are requested from the books API in concurrent groups of
+    batch_size rather than one request per edition.
+
+    Args:
+        edition_keys (list): Edition keys, as returned by get_edition_key.
+            Missing keys are skipped.
+        url (str): An openlibrary URL.
+        client (object, optional): An async HTTP client.
+        semaphore (asyncio.Semaphore, optional): Limits requests in flight.
+        batch_size (int): The number of editions per request.
+
+    Returns:
+        dict: ISBN and publisher data for each edition key. Editions
+            unknown to openlibrary have empty data.
+    """
+    edition_keys = list(dict.fromkeys(key for key in edition_keys if key))
+    batches = list(batched(edition_keys, batch_size))
+    responses = await asyncio.gather(*(
+        get_json(
+            f"{url}/api/books?{urlencode(edition_batch_params(batch))}",
+            client,
+            semaphore
+        )
+        for batch in batches
+    ))
+
+    book_dicts = {}
+    for batch, data in zip(batches, responses):
+        book_dicts.update(extract_edition_batch(batch, data))
+    return book_dicts
+
+async def enrich_book(book, url, client=None, semaphore=None, editions=None):
+    """
+    Fetches a book's subjects, ISBNs and publishers and merges them.
+
+    Args:
+        book (dict): A book dictionary from the openlibrary search API.
+        url (str): An openlibrary URL.
+        client (object, optional): An async HTTP client.
+        semaphore (asyncio.Semaphore, optional): Limits requests in flight.
+        editions (asyncio.Future, optional): Resolves to ISBN and
+            publisher data by edition key, shared by the books of one
+            search. The book's edition is looked up on its own if not
+            provided.
+
+    Returns:
+        dict: Pipeline-ready data about the book. A book without a known
+            edition has empty ISBN and publisher data.
+    """
+    updated_book = update_book_data(book)
+    edition_key = get_edition_key(book)
+
+    if editions is None:
+        editions = fetch_isbn_and_publisher_data_batch(
+            [edition_key], url, client, semaphore
+        )
+
+    subjects, isbn_data = await asyncio.gather(
+        fetch_book_subjects(updated_book["id"], url, client, semaphore),
+        editions
+    )
+    return merge_dicts(
+        updated_book,
+        subjects,
+        isbn_data.get(edition_key) or empty_isbn_and_publisher_data()
+    )
+
+async def generate_book_data(
+    author,
+    url,
+    client=None,
+    concurrency=DEFAULT_CONCURRENCY,
+    edition_batch_size=EDITION_BATCH_SIZE,
+    session=None
+):
+    """
+    Retrieves and formats data for an author's books.
+
+    Args:
+        author (str): The name of an author.
+        url (str): An openlibrary URL.
+        client (object, optional): An async HTTP client. For thousands of
+            requests in flight use a truly async client such as
+            httpx.AsyncClient. If not provided, a SessionClient with
+            concurrency threads is used.
+        concurrency (int): The maximum number of requests in flight.
+        edition_batch_size (int): The number of editions per books API
+            request.
+        session (requests.Session, optional): The pooled session the
+            default SessionClient sends requests with. Ignored if a client
+            is given.
+
+    Returns:
+        list: A list of pipeline-ready data about the author's books.
+    """
+    if client is None:
+        client = SessionClient(session, concurrency)
+        try:
+            return await generate_book_data(
+                author, url, client, concurrency, edition_batch_size
+            )
+        finally:
+            client.close()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    book_list = await fetch_books_by_author(author, url, client, semaphore)
+    editions = asyncio.ensure_future(fetch_isbn_and_publisher_data_batch(
+        [get_edition_key(book) for book in book_list],
+        url,
+        client,
+        semaphore,
+        edition_batch_size
+    ))
+    return list(await asyncio.gather(*(
+        enrich_book(book, url, client, semaphore, editions)
+        for book in book_list
+    )))
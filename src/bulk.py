@@ -0,0 +1,282 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from src.main import URL
+from src.sinks import NDJSONSink
+from src.utils import create_session, iter_book_records
+
+DEFAULT_BULK_WORKERS = 8
+
+# State of the current worker process, set up by init_worker
+worker_state = {}
+
+def read_authors(path):
+    """
+    Reads author names from a file, one per line.
+
+    Blank lines, lines starting with # and repeated names are skipped.
+
+    Args:
+        path (str): The file of author names.
+
+    Returns:
+        list: The author names, in file order.
+    """
+    with open(path, encoding="utf-8") as file:
+        names = (line.strip() for line in file)
+        return list(dict.fromkeys(
+            name for name in names if name and not name.startswith("#")
+        ))
+
+class ClaimedKeys:
+    """
+    Work keys shared between processes, each enriched by one author only.
+
+    Checking whether a key is in the container claims it for the current
+    owner, so it can be passed to iter_book_records as exclude: the first
+    author to reach a work enriches it and every later author skips it.
+    A claim stays pending until mark_done is called once its record has
+    been written, and pending claims can be released so that a failed
+    author's works are fetched again.
+
+    Args:
+        path (str): The SQLite database file shared by every process.
+        owner (str, optional): Who new claims belong to, such as the
+            author being fetched.
+    """
+
+    def __init__(self, path, owner=None):
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.owner = owner
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS claims ("
+                "key TEXT PRIMARY KEY, owner TEXT, done INTEGER NOT NULL)"
+            )
+
+    def __contains__(self, key):
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO claims VALUES (?, ?, 0)",
+                (key, self.owner)
+            )
+        return cursor.rowcount == 0
+
+    def mark_done(self, keys):
+        """
+        Makes claims permanent, so later runs skip the works.
+
+        Args:
+            keys (iterable): The work keys whose records were written.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE claims SET done = 1 WHERE key = ?",
+                [(key,) for key in keys]
+            )
+
+    def release(self, owner=None):
+        """
+        Drops pending claims, so the works can be claimed again.
+
+        Args:
+            owner (str, optional): Only release this owner's claims.
+                Every pending claim is released if not provided.
+        """
+        with self.connection:
+            if owner is None:
+                self.connection.execute("DELETE FROM claims WHERE done = 0")
+            else:
+                self.connection.execute(
+                    "DELETE FROM claims WHERE done = 0 AND owner = ?",
+                    (owner,)
+                )
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+def init_worker(url, max_workers, claims_path):
+    """
+    Sets up a worker process with its own connection pool.
+
+    Args:
+        url (str): An openlibrary URL.
+        max_workers (int): The worker pool size used per author.
+        claims_path (str): The shared ClaimedKeys database.
+    """
+    worker_state["url"] = url
+    worker_state["max_workers"] = max_workers
+    worker_state["session"] = create_session(max_workers)
+    worker_state["claims"] = ClaimedKeys(claims_path)
+
+def fetch_author(author):
+    """
+    Fetches the unclaimed books of one author in a worker process.
+
+    Args:
+        author (str): The name of an author.
+
+    Returns:
+        list: Pipeline-ready data about the author's books that no other
+            author has claimed.
+    """
+    claims = worker_state["claims"]
+    claims.owner = author
+
+    return [
+        book.to_dict()
+        for book in iter_book_records(
+            author,
+            worker_state["url"],
+            worker_state["max_workers"],
+            worker_state["session"],
+            exclude=claims
+        )
+    ]
+
+def iter_bulk_book_data(
+    authors,
+    url=URL,
+    processes=None,
+    max_workers=DEFAULT_BULK_WORKERS,
+    claims_path=None,
+    failures=None
+):
+    """
+    Fetches book data for many authors across a pool of processes.
+
+    Each process keeps its own pooled session. Works are claimed across
+    processes, so a co-authored book is enriched and yielded once. A record's
+    claim is only kept once the consumer comes back for the next record,
+    which for run_bulk means the record was handed to the sink. An author whose
+    fetch fails is skipped and its claims are released, so a rerun with
+    the same claims database fetches its works again.
+
+    Args:
+        authors (iterable): Author names.
+        url (str): An openlibrary URL.
+        processes (int, optional): The number of worker processes.
+            Defaults to the number of CPUs.
+        max_workers (int): The worker pool size used per author.
+        claims_path (str, optional): The database of claimed work keys.
+            A temporary one is used if not provided. Reusing a database
+            skips works written by an earlier run, and pending claims
+            left by an interrupted run are released when a run starts.
+        failures (dict, optional): Filled with the error of each author
+            that failed, keyed by name.
+
+    Yields:
+        dict: Pipeline-ready data about a book, grouped by author in the
+            order authors finish.
+    """
+    processes = processes or os.cpu_count()
+    failures = {} if failures is None else failures
+
+    with tempfile.TemporaryDirectory() as directory:
+        claims_path = claims_path or os.path.join(directory, "claims.db")
+        claims = ClaimedKeys(claims_path)
+        claims.release()
+
+        try:
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=init_worker,
+                initargs=(url, max_workers, claims_path)
+            ) as executor:
+                authors = iter(authors)
+                pending = {}
+
+                while True:
+                    for author in authors:
+                        pending[executor.submit(fetch_author, author)] = author
+                        if len(pending) >= processes * 2:
+                            break
+
+                    if not pending:
+                        return
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        author = pending.pop(future)
+                        try:
+                            records = future.result()
+                        except Exception as error:
+                            failures[author] = error
+                            claims.release(author)
+                            continue
+
+                        taken = []
+                        try:
+                            for record in records:
+                                yield record
+                                taken.append(record["id"])
+                        finally:
+                            claims.mark_done(taken)
+        finally:
+            claims.close()
+
+def run_bulk(authors, sink, url=URL, **options):
+    """
+    Writes book data for many authors to one sink.
+
+    Args:
+        authors (iterable): Author names.
+        sink (object): Where records are written, such as an NDJSONSink.
+            Must have write and flush methods.
+        url (str): An openlibrary URL.
+        **options: Passed on to iter_bulk_book_data, e.g. processes or
+            failures.
+
+    Returns:
+        int: The number of records written.
+    """
+    written = 0
+
+    for record in iter_bulk_book_data(authors, url, **options):
+        sink.write(record)
+        written += 1
+
+    sink.flush()
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fetch book data for every author in a file."
+    )
+    parser.add_argument("authors", help="a file of author names, one per line")
+    parser.add_argument("output", help="an NDJSON file, gzipped if it ends in .gz")
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=DEFAULT_BULK_WORKERS)
+    parser.add_argument("--claims", default=None)
+    args = parser.parse_args()
+
+    failures = {}
+    # Works marked done in an existing claims database are skipped, so
+    # their records must be kept from the previous run's output
+    resuming = args.claims is not None and os.path.exists(args.claims)
+
+    with NDJSONSink(args.output, append=resuming) as sink:
+        written = run_bulk(
+            read_authors(args.authors),
+            sink,
+            args.url,
+            processes=args.processes,
+            max_workers=args.workers,
+            claims_path=args.claims,
+            failures=failures
+        )
+    print(f"Wrote {written} records to {args.output}")
+
+    for author, error in failures.items():
+        print(f"Failed to fetch {author}: {error}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
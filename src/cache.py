@@ -0,0 +1,232 @@
+import requests
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+DAY = 24 * 60 * 60
+
+# Seconds before a cached response is revalidated, by URL path fragment
+DEFAULT_TTLS = {
+    "/search.json": DAY,
+    "/works/": 7 * DAY,
+    "/books/": 7 * DAY,
+    "/api/books": 7 * DAY
+}
+
+class ResponseCache:
+    """
+    Stores response bodies in a local SQLite database, keyed by URL.
+
+    Args:
+        path (str): The database file. Defaults to an in-memory database.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL NOT NULL
+                )
+                """
+            )
+
+    def get(self, url):
+        """
+        Looks up a cached response.
+
+        Args:
+            url (str): The full request URL.
+
+        Returns:
+            dict: The body, etag, last_modified and stored_at values, or
+                None if the URL has not been cached.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT body, etag, last_modified, stored_at "
+                "FROM responses WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return dict(zip(["body", "etag", "last_modified", "stored_at"], row))
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """
+        Stores or replaces a response body.
+
+        Args:
+            url (str): The full request URL.
+            body (bytes): The response body.
+            etag (str, optional): The response's ETag header.
+            last_modified (str, optional): The response's Last-Modified header.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, time.time())
+            )
+
+    def touch(self, url):
+        """
+        Marks a cached response as fresh again after revalidation.
+
+        Args:
+            url (str): The full request URL.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE responses SET stored_at = ? WHERE url = ?",
+                (time.time(), url)
+            )
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+class CachedSession:
+    """
+    Serves GET requests from a ResponseCache before going to the network.
+
+    Fresh entries are returned without a request. Stale entries are
+    revalidated with If-None-Match and If-Modified-Since headers, and
+    reused if the server answers 304 Not Modified.
+
+    Args:
+        cache (ResponseCache): Where responses are stored.
+        session (requests.Session, optional): The session used on a miss.
+        ttls (dict, optional): Seconds each endpoint stays fresh, keyed by
+            URL path fragment. Defaults to DEFAULT_TTLS.
+        default_ttl (int): Seconds an entry stays fresh if no TTL matches.
+    """
+
+    def __init__(self, cache, session=None, ttls=None, default_ttl=DAY):
+        self.cache = cache
+        self.session = session or requests
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0}
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, **kwargs):
+        """
+        Performs a GET request, using the cache where possible.
+
+        Args:
+            url (str): The URL to request.
+            params (dict, optional): Query string parameters.
+            **kwargs: Passed on to the wrapped session.
+
+        Returns:
+            requests.Response: The response. Responses served from the
+                cache have from_cache set to True.
+        """
+        key = cache_key(url, params)
+        entry = self.cache.get(key)
+
+        if entry and time.time() - entry["stored_at"] < self.ttl_for(key):
+            self.record("hits")
+            return build_response(key, entry["body"])
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self.session.get(
+            url, params=params, headers=headers, **kwargs
+        )
+
+        if entry and response.status_code == 304:
+            self.cache.touch(key)
+            self.record("revalidated")
+            return build_response(key, entry["body"])
+
+        self.record("misses")
+
+        if response.status_code == 200:
+            self.cache.put(
+                key,
+                response.content,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified")
+            )
+
+        return response
+
+    def ttl_for(self, url):
+        """
+        Finds how long a URL's cached response stays fresh.
+
+        Args:
+            url (str): The full request URL.
+
+        Returns:
+            int: The TTL in seconds.
+        """
+        for fragment, ttl in self.ttls.items():
+            if fragment in url:
+                return ttl
+        return self.default_ttl
+
+    def record(self, outcome):
+        """
+        Increments a cache statistic.
+
+        Args:
+            outcome (str): One of "hits", "misses" or "revalidated".
+        """
+        with self.lock:
+            self.stats[outcome] += 1
+
+    def close(self):
+        """Closes the wrapped session if it has a close method."""
+        if hasattr(self.session, "close"):
+            self.session.close()
+
+def cache_key(url, params=None):
+    """
+    Builds the key a request is cached under.
+
+    Args:
+        url (str): The URL to request.
+        params (dict, optional): Query string parameters.
+
+    Returns:
+        str: The URL with its query string.
+    """
+    if not params:
+        return url
+    separator = "&" if "?" in url else "?"
+    return f"{url}{separator}{urlencode(params)}"
+
+def build_response(url, body):
+    """
+    Creates a successful response from a cached body.
+
+    Args:
+        url (str): The request URL.
+        body (bytes): The cached response body.
+
+    Returns:
+        requests.Response: A 200 response flagged with from_cache.
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = 200
+    response.encoding = "utf-8"
+    response._content = body
+    response._content_consumed = True
+    response.from_cache = True
+    return response
@@ -0,0 +1,244 @@
+import sqlite3
+from src.utils import iter_book_records
+
+DEFAULT_CHECKPOINT_INTERVAL = 100
+
+class Checkpoint:
+    """
+    Records which authors, works and editions a run has finished.
+
+    Keys are stored in a local SQLite database, so a restarted run can
+    skip everything that was already fetched and persisted.
+
+    Args:
+        path (str): The database file.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS done (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    parent TEXT,
+                    PRIMARY KEY (kind, key)
+                )
+                """
+            )
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS marks (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+                """
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def is_done(self, kind, key):
+        """
+        Checks whether a key has been finished.
+
+        Args:
+            kind (str): "author", "work" or "edition".
+            key (str): The author name, work key or edition key.
+
+        Returns:
+            bool: True if the key was marked done.
+        """
+        row = self.connection.execute(
+            "SELECT 1 FROM done WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        return row is not None
+
+    def done(self, kind):
+        """
+        Gives a container view of the finished keys of one kind.
+
+        Args:
+            kind (str): "author", "work" or "edition".
+
+        Returns:
+            DoneKeys: Supports the in operator, without loading every key.
+        """
+        return DoneKeys(self, kind)
+
+    def mark_done(self, items):
+        """
+        Marks keys as finished. Marking a key twice has no effect.
+
+        Args:
+            items (iterable): (kind, key, parent) tuples. The parent links
+                an edition to its work, and a work to its author.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO done VALUES (?, ?, ?)", items
+            )
+
+    def is_started(self):
+        """
+        Checks whether a run has marked anything done.
+
+        Returns:
+            bool: True if any key was marked done.
+        """
+        return self.connection.execute("SELECT 1 FROM done").fetchone() is not None
+
+    def parent(self, kind, key):
+        """
+        Looks up the parent a key was marked done with.
+
+        Args:
+            kind (str): "author", "work" or "edition".
+            key (str): The key to look up.
+
+        Returns:
+            str: The parent key, or None if there is none.
+        """
+        row = self.connection.execute(
+            "SELECT parent FROM done WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def children(self, kind, parent):
+        """
+        Lists the keys that were marked done with a parent.
+
+        Args:
+            kind (str): "author", "work" or "edition".
+            parent (str): The parent key, e.g. a work key for editions.
+
+        Returns:
+            list: The child keys.
+        """
+        rows = self.connection.execute(
+            "SELECT key FROM done WHERE kind = ? AND parent = ?", (kind, parent)
+        ).fetchall()
+        return [key for key, in rows]
+
+    def mark(self, name):
+        """
+        Looks up a high-water mark, such as the last change synced.
+
+        Args:
+            name (str): The mark's name.
+
+        Returns:
+            str: The stored value, or None if the mark has not been set.
+        """
+        row = self.connection.execute(
+            "SELECT value FROM marks WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_mark(self, name, value):
+        """
+        Stores a high-water mark.
+
+        Args:
+            name (str): The mark's name.
+            value (str): The new value.
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO marks VALUES (?, ?)", (name, value)
+            )
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+class DoneKeys:
+    """
+    A container of the finished keys of one kind.
+
+    Args:
+        checkpoint (Checkpoint): The checkpoint to query.
+        kind (str): "author", "work" or "edition".
+    """
+
+    def __init__(self, checkpoint, kind):
+        self.checkpoint = checkpoint
+        self.kind = kind
+
+    def __contains__(self, key):
+        return self.checkpoint.is_done(self.kind, key)
+
+def run_checkpointed(
+    authors,
+    url,
+    sink,
+    checkpoint,
+    interval=DEFAULT_CHECKPOINT_INTERVAL,
+    **options
+):
+    """
+    Fetches book data for many authors, resuming from a checkpoint.
+
+    Finished authors and works are skipped. Works are only marked done
+    after the sink has been flushed, so a crash never loses a record that
+    the checkpoint claims was persisted.
+
+    Resuming needs a sink that keeps the records of earlier runs, such as
+    an NDJSONSink opened with append=True or a SQLSink.
+
+    Args:
+        authors (iterable): Author names.
+        url (str): An openlibrary URL.
+        sink (object): Where records are written, such as an NDJSONSink.
+            Must have write and flush methods. A sink with resumable set
+            to False is refused once the checkpoint has keys done.
+        checkpoint (Checkpoint): Records finished authors, works and
+            editions.
+        interval (int): The number of records written between flushes.
+        **options: Passed on to iter_book_records, e.g. max_workers.
+
+    Returns:
+        int: The number of records written by this run.
+
+    Raises:
+        ValueError: If resuming into a sink that replaced earlier output.
+    """
+    if not getattr(sink, "resumable", True) and checkpoint.is_started():
+        raise ValueError(
+            "The checkpoint has finished records that this sink does not "
+            "keep; open it in append mode to resume"
+        )
+
+    written = 0
+
+    for author in authors:
+        if checkpoint.is_done("author", author):
+            continue
+
+        pending = []
+        unflushed = 0
+
+        for book in iter_book_records(
+            author, url, exclude=checkpoint.done("work"), **options
+        ):
+            sink.write(book)
+            written += 1
+            unflushed += 1
+            pending.append(("work", book.id, author))
+            if book.edition_key:
+                pending.append(("edition", book.edition_key, book.id))
+
+            if unflushed >= interval:
+                sink.flush()
+                checkpoint.mark_done(pending)
+                pending = []
+                unflushed = 0
+
+        sink.flush()
+        checkpoint.mark_done(pending + [("author", author, None)])
+
+    return written
@@ -0,0 +1,275 @@
+import requests
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from src.cache import cache_key
+from src.metrics import ResponseView
+
+DEFAULT_MAX_ENTRIES = 10000
+
+# URL path fragments of the endpoints whose requests are coalesced
+COALESCED_PATHS = ("/works/", "/books/")
+
+class CoalescingSession:
+    """
+    Shares one request between concurrent GETs of the same URL.
+
+    The first caller for a URL sends the request and later callers wait
+    for its response instead of sending their own. Successful responses
+    are kept in a bounded LRU, so repeated keys, such as co-authored works
+    and shared editions, do not reach the network again. Each shared
+    response decodes its JSON body once.
+
+    Batched books API lookups are coalesced per edition key rather than
+    per URL, through the editions attribute; see
+    fetch_isbn_and_publisher_data_batch.
+
+    Args:
+        session (requests.Session, optional): The session used to send
+            requests.
+        max_entries (int): The number of resolved responses kept.
+        paths (tuple): URL path fragments of the requests to coalesce.
+            Other requests are passed straight through.
+        ttl (float, optional): Seconds a resolved response is reused for.
+            Kept until evicted if not provided.
+        batch_window (float): Seconds to collect edition keys from
+            concurrent lookups into shared batch requests.
+    """
+
+    def __init__(
+        self,
+        session=None,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        paths=COALESCED_PATHS,
+        ttl=None,
+        batch_window=0
+    ):
+        self.session = session or requests
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.paths = paths
+        self.resolved = OrderedDict()
+        self.in_flight = {}
+        self.stats = {"hits": 0, "coalesced": 0, "misses": 0}
+        self.lock = threading.Lock()
+        self.editions = KeyedCoalescer(max_entries, ttl, batch_window)
+
+    def get(self, url, params=None, **kwargs):
+        """
+        Performs a GET request, or joins an identical one.
+
+        Args:
+            url (str): The URL to request.
+            params (dict, optional): Query string parameters.
+            **kwargs: Passed on to the wrapped session.
+
+        Returns:
+            requests.Response: The response. Callers that reuse another
+                caller's response get a ResponseView of it flagged with
+                from_cache, as the shared response must not be modified.
+        """
+        if kwargs.get("stream") or not any(path in url for path in self.paths):
+            return self.session.get(url, params=params, **kwargs)
+
+        key = cache_key(url, params)
+        leader = False
+
+        with self.lock:
+            if is_fresh(self.resolved, key, self.ttl):
+                self.resolved.move_to_end(key)
+                self.stats["hits"] += 1
+                return ResponseView(self.resolved[key][1], from_cache=True)
+
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+            else:
+                self.stats["misses"] += 1
+                future = self.in_flight[key] = Future()
+                leader = True
+
+        if not leader:
+            return ResponseView(future.result(), from_cache=True)
+
+        try:
+            response = self.session.get(url, params=params, **kwargs)
+        except BaseException as error:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(error)
+            raise
+
+        response = decode_once(response)
+
+        with self.lock:
+            del self.in_flight[key]
+            if response.status_code == 200:
+                self.resolved[key] = (time.monotonic(), response)
+                if len(self.resolved) > self.max_entries:
+                    self.resolved.popitem(last=False)
+
+        future.set_result(response)
+        return response
+
+    def close(self):
+        """Closes the wrapped session if it has a close method."""
+        if hasattr(self.session, "close"):
+            self.session.close()
+
+class KeyedCoalescer:
+    """
+    Shares the lookup of individual keys between concurrent batches.
+
+    A batch is split into keys already resolved, keys another caller is
+    fetching and the rest. Only the rest are fetched, and the caller then
+    waits for the keys in flight elsewhere. Resolved values are kept in a
+    bounded LRU.
+
+    With a batch window, the first caller with keys to fetch waits for the
+    window and fetches every key other callers queued meanwhile in the
+    same call, so concurrent lookups share batch requests.
+
+    Args:
+        max_entries (int): The number of resolved values kept.
+        ttl (float, optional): Seconds a resolved value is reused for.
+            Kept until evicted if not provided.
+        batch_window (float): Seconds to collect keys from other callers
+            before fetching.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=None, batch_window=0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.batch_window = batch_window
+        self.resolved = OrderedDict()
+        self.in_flight = {}
+        self.pending = {}
+        self.collecting = False
+        self.stats = {"hits": 0, "coalesced": 0, "misses": 0, "batches": 0}
+        self.lock = threading.Lock()
+
+    def resolve(self, keys, fetch):
+        """
+        Looks up many keys, fetching only those nobody else has.
+
+        Args:
+            keys (iterable): The keys to look up.
+            fetch (callable): Takes a list of keys and returns a dictionary
+                with a value for each of them. It may be called with keys
+                queued by other callers.
+
+        Returns:
+            dict: The value of each key.
+        """
+        found = {}
+        waiting = {}
+        leader = False
+
+        with self.lock:
+            for key in keys:
+                if is_fresh(self.resolved, key, self.ttl):
+                    self.resolved.move_to_end(key)
+                    self.stats["hits"] += 1
+                    found[key] = self.resolved[key][1]
+                elif key in self.in_flight:
+                    self.stats["coalesced"] += 1
+                    waiting[key] = self.in_flight[key]
+                else:
+                    self.stats["misses"] += 1
+                    waiting[key] = self.in_flight[key] = Future()
+                    self.pending[key] = waiting[key]
+
+            if self.pending and not self.collecting:
+                self.collecting = leader = True
+
+        # The leader fetches the queued keys before waiting on anyone
+        # else's, so two callers waiting on each other cannot deadlock
+        if leader:
+            if self.batch_window:
+                time.sleep(self.batch_window)
+            with self.lock:
+                batch = self.pending
+                self.pending = {}
+                self.collecting = False
+                self.stats["batches"] += 1
+            self.fetch_batch(batch, fetch)
+
+        for key, future in waiting.items():
+            found[key] = future.result()
+
+        return found
+
+    def fetch_batch(self, batch, fetch):
+        """
+        Fetches queued keys and resolves everyone waiting on them.
+
+        Args:
+            batch (dict): Maps each key to fetch to its future.
+            fetch (callable): See resolve.
+        """
+        try:
+            fetched = fetch(list(batch))
+        except BaseException as error:
+            with self.lock:
+                for key in batch:
+                    del self.in_flight[key]
+            for future in batch.values():
+                future.set_exception(error)
+            raise
+
+        with self.lock:
+            resolved_at = time.monotonic()
+            for key in batch:
+                del self.in_flight[key]
+                self.resolved[key] = (resolved_at, fetched[key])
+                if len(self.resolved) > self.max_entries:
+                    self.resolved.popitem(last=False)
+
+        for key, future in batch.items():
+            future.set_result(fetched[key])
+
+def is_fresh(resolved, key, ttl):
+    """
+    Checks whether an LRU holds a key that has not expired.
+
+    Expired entries are removed, so the caller fetches them again.
+
+    Args:
+        resolved (OrderedDict): Maps keys to (resolved_at, value) tuples.
+        key (object): The key to look up.
+        ttl (float): Seconds an entry is fresh for, or None for no expiry.
+
+    Returns:
+        bool: Whether the key's entry can be reused.
+    """
+    entry = resolved.get(key)
+    if entry is None:
+        return False
+    if ttl is not None and time.monotonic() - entry[0] >= ttl:
+        del resolved[key]
+        return False
+    return True
+
+def decode_once(response):
+    """
+    Makes a shared response decode its JSON body only once.
+
+    Args:
+        response (requests.Response): The response to share.
+
+    Returns:
+        ResponseView: A view of the response whose json method decodes
+            the body on the first call and returns the same value after.
+    """
+    decode = response.json
+    lock = threading.Lock()
+    decoded = []
+
+    def json(**kwargs):
+        with lock:
+            if not decoded:
+                decoded.append(decode(**kwargs))
+        return decoded[0]
+
+    return ResponseView(response, json=json)
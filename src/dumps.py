@@ -0,0 +1,280 @@
+import gzip
+import json
+import re
+import sqlite3
+from src.utils import (
+    batched,
+    empty_isbn_and_publisher_data,
+    extract_isbn_and_publisher_data,
+    extract_subjects,
+    merge_dicts,
+    update_book_data
+)
+
+INDEX_BATCH_SIZE = 10000
+
+YEAR_PATTERN = re.compile(r"\b(\d{4})\b")
+
+def iter_dump(path):
+    """
+    Reads records from an openlibrary data dump.
+
+    Each line of a dump holds the type, key, revision, last modified date
+    and JSON record, separated by tabs. Gzipped dumps are decompressed as
+    they are read.
+
+    Args:
+        path (str): The dump file, gzipped if it ends in .gz.
+
+    Yields:
+        tuple: The record's type, key and decoded JSON.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+
+    with opener(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            columns = line.rstrip("\n").split("\t")
+            if len(columns) < 5:
+                continue
+            yield columns[0], columns[1], json.loads(columns[4])
+
+class DumpIndex:
+    """
+    An on-disk index of authors and editions, used to join them to works.
+
+    Args:
+        path (str): The SQLite database file for the index.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS authors (
+                    key TEXT PRIMARY KEY,
+                    name TEXT
+                );
+                CREATE TABLE IF NOT EXISTS editions (
+                    key TEXT PRIMARY KEY,
+                    work_key TEXT NOT NULL,
+                    record TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS editions_work_key
+                    ON editions (work_key);
+                """
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_authors(self, path):
+        """
+        Indexes author names from an authors dump.
+
+        Args:
+            path (str): The authors dump file.
+        """
+        rows = (
+            (key, record.get("name"))
+            for record_type, key, record in iter_dump(path)
+            if record_type == "/type/author"
+        )
+        self.insert_batches("INSERT OR REPLACE INTO authors VALUES (?, ?)", rows)
+
+    def add_editions(self, path):
+        """
+        Indexes editions from an editions dump by the work they belong to.
+
+        Args:
+            path (str): The editions dump file.
+        """
+        rows = (
+            (key, record["works"][0]["key"], json.dumps(record))
+            for record_type, key, record in iter_dump(path)
+            if record_type == "/type/edition" and record.get("works")
+        )
+        self.insert_batches(
+            "INSERT OR REPLACE INTO editions VALUES (?, ?, ?)", rows
+        )
+
+    def insert_batches(self, statement, rows):
+        """
+        Inserts rows in batches, committing after each batch.
+
+        Args:
+            statement (str): The INSERT statement.
+            rows (iterable): Parameters for each row.
+        """
+        for batch in batched(rows, INDEX_BATCH_SIZE):
+            with self.connection:
+                self.connection.executemany(statement, batch)
+
+    def author_names(self, author_keys):
+        """
+        Looks up author names.
+
+        Args:
+            author_keys (list): Author keys, e.g. "/authors/OL52922A".
+
+        Returns:
+            list: The names of the authors found, in the given order.
+        """
+        names = []
+        for key in author_keys:
+            row = self.connection.execute(
+                "SELECT name FROM authors WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[0]:
+                names.append(row[0])
+        return names
+
+    def editions(self, work_key):
+        """
+        Looks up a work's editions.
+
+        Args:
+            work_key (str): A work key, e.g. "/works/OL675783W".
+
+        Returns:
+            list: The decoded edition records.
+        """
+        rows = self.connection.execute(
+            "SELECT record FROM editions WHERE work_key = ? ORDER BY key",
+            (work_key,)
+        )
+        return [json.loads(record) for record, in rows]
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+def iter_dump_book_data(works_path, editions_path, authors_path, index_path):
+    """
+    Builds pipeline-ready book data from openlibrary dumps, without HTTP.
+
+    Authors and editions are indexed on disk first, then works are
+    streamed and joined to them one at a time.
+
+    Args:
+        works_path (str): The works dump file.
+        editions_path (str): The editions dump file.
+        authors_path (str): The authors dump file.
+        index_path (str): Where to store the SQLite join index.
+
+    Yields:
+        dict: Book data in the same shape as generate_book_data returns.
+    """
+    with DumpIndex(index_path) as index:
+        index.add_authors(authors_path)
+        index.add_editions(editions_path)
+
+        for record_type, key, work in iter_dump(works_path):
+            if record_type == "/type/work":
+                yield build_dump_book_data(work, index)
+
+def build_dump_book_data(work, index):
+    """
+    Builds pipeline-ready data for a work from the dump index.
+
+    Args:
+        work (dict): A work record from the works dump.
+        index (DumpIndex): The author and edition index.
+
+    Returns:
+        dict: Book data in the same shape as generate_book_data returns.
+    """
+    editions = index.editions(work["key"])
+    author_keys = [
+        author["author"]["key"]
+        for author in work.get("authors", [])
+        if "author" in author
+    ]
+
+    search_doc = {
+        "key": work["key"],
+        "title": work["title"],
+        "author_name": index.author_names(author_keys),
+        "edition_count": len(editions),
+        "language": edition_languages(editions)
+    }
+    first_publish_year = earliest_year(
+        [work.get("first_publish_date")]
+        + [edition.get("publish_date") for edition in editions]
+    )
+    if first_publish_year:
+        search_doc["first_publish_year"] = first_publish_year
+
+    edition = choose_edition(editions)
+
+    if edition:
+        isbn_data = extract_isbn_and_publisher_data(
+            dict(edition, publishers=edition.get("publishers", []))
+        )
+    else:
+        isbn_data = empty_isbn_and_publisher_data()
+
+    return merge_dicts(
+        update_book_data(search_doc), extract_subjects(work), isbn_data
+    )
+
+def choose_edition(editions):
+    """
+    Picks the edition used for ISBN and publisher data.
+
+    Mirrors the search API's cover_edition_key by preferring editions with
+    a cover, then editions with publishers.
+
+    Args:
+        editions (list): A work's edition records.
+
+    Returns:
+        dict: The chosen edition, or None if the work has no editions.
+    """
+    for has_data in (
+        lambda edition: edition.get("covers"),
+        lambda edition: edition.get("publishers")
+    ):
+        for edition in editions:
+            if has_data(edition):
+                return edition
+    return editions[0] if editions else None
+
+def edition_languages(editions):
+    """
+    Lists the language codes used by a work's editions.
+
+    Args:
+        editions (list): A work's edition records.
+
+    Returns:
+        list: Unique language codes, e.g. "eng", in order of appearance.
+    """
+    languages = {}
+    for edition in editions:
+        for language in edition.get("languages", []):
+            languages[language["key"].split("/")[-1]] = None
+    return list(languages)
+
+def earliest_year(dates):
+    """
+    Finds the earliest four-digit year in a list of free-text dates.
+
+    Args:
+        dates (list): Dates such as "1985" or "March 3, 1986". None values
+            are ignored.
+
+    Returns:
+        int: The earliest year, or None if no year is found.
+    """
+    years = [
+        int(match.group(1))
+        for date in dates
+        if date
+        for match in [YEAR_PATTERN.search(date)]
+        if match
+    ]
+    return min(years) if years else None
@@ -0,0 +1,174 @@
+import math
+import requests
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from src.metrics import ResponseView
+
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_MAX_HEDGE_RATE = 0.05
+
+# URL path fragments of the requests that may be hedged
+HEDGED_PATHS = ("/works/", "/books/", "/api/books")
+
+class HedgedSession:
+    """
+    Sends a duplicate of a GET request that is slower than usual.
+
+    Latencies of recent requests are tracked, and a request that has not
+    answered by their chosen percentile is sent again. The first response
+    is used and the other is cancelled, or closed if it already started.
+    Hedges are capped at a fraction of all requests so a slow upstream is
+    not sent twice the load.
+
+    Args:
+        session (requests.Session, optional): The session used to send
+            requests. It must allow two connections per hedged request.
+        percentile (float): The latency percentile, from 0 to 100, after
+            which a request is hedged.
+        max_hedge_rate (float): The most hedges sent per request.
+        min_samples (int): Requests to observe before hedging starts.
+        window (int): The number of recent latencies kept.
+        max_workers (int): The most requests in flight, hedges included.
+        paths (tuple): URL path fragments of the requests to hedge. Other
+            requests are passed straight through.
+    """
+
+    def __init__(
+        self,
+        session=None,
+        percentile=DEFAULT_HEDGE_PERCENTILE,
+        max_hedge_rate=DEFAULT_MAX_HEDGE_RATE,
+        min_samples=20,
+        window=1000,
+        max_workers=32,
+        paths=HEDGED_PATHS
+    ):
+        self.session = session or requests
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.paths = paths
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0}
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        """
+        Performs a GET request, hedging it if it is slow.
+
+        Args:
+            url (str): The URL to request.
+            **kwargs: Passed on to the wrapped session.
+
+        Returns:
+            requests.Response: The first response to arrive. Hedged
+                requests return a ResponseView of it with hedged set to
+                True, leaving a possibly shared response unmodified.
+        """
+        if kwargs.get("stream") or not any(path in url for path in self.paths):
+            return self.session.get(url, **kwargs)
+
+        with self.lock:
+            self.stats["requests"] += 1
+        deadline = self.deadline()
+
+        primary = self.executor.submit(self.timed_get, url, kwargs)
+        done, _ = wait([primary], timeout=deadline)
+        if done or not self.reserve_hedge():
+            return primary.result()
+
+        hedge = self.executor.submit(self.timed_get, url, kwargs)
+        pending = {primary, hedge}
+
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = done.pop()
+            if winner.exception() is None or not pending:
+                break
+
+        for loser in done | pending:
+            if not loser.cancel():
+                loser.add_done_callback(close_response)
+
+        response = winner.result()
+        if winner is hedge:
+            with self.lock:
+                self.stats["hedge_wins"] += 1
+        return ResponseView(response, hedged=True)
+
+    def timed_get(self, url, kwargs):
+        """
+        Sends one request and records its latency.
+
+        Args:
+            url (str): The URL to request.
+            kwargs (dict): Passed on to the wrapped session.
+
+        Returns:
+            requests.Response: The response.
+        """
+        started = time.perf_counter()
+        response = self.session.get(url, **kwargs)
+        with self.lock:
+            self.latencies.append(time.perf_counter() - started)
+        return response
+
+    def deadline(self):
+        """
+        Finds how long a request may take before it is hedged.
+
+        Returns:
+            float: The latency percentile in seconds, or None until
+                min_samples requests have been observed.
+        """
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            latencies = sorted(self.latencies)
+
+        rank = max(1, math.ceil(self.percentile / 100 * len(latencies)))
+        return latencies[rank - 1]
+
+    def reserve_hedge(self):
+        """
+        Counts a hedge if the hedge rate allows another.
+
+        Returns:
+            bool: True if a hedge may be sent.
+        """
+        with self.lock:
+            if self.stats["hedged"] + 1 > self.max_hedge_rate * self.stats["requests"]:
+                return False
+            self.stats["hedged"] += 1
+            return True
+
+    def hedge_rate(self):
+        """
+        Reports the fraction of requests that were hedged.
+
+        Returns:
+            float: Hedges per request, or 0 before any request.
+        """
+        with self.lock:
+            if not self.stats["requests"]:
+                return 0.0
+            return self.stats["hedged"] / self.stats["requests"]
+
+    def close(self):
+        """Stops the worker pool and closes the wrapped session."""
+        self.executor.shutdown()
+        if hasattr(self.session, "close"):
+            self.session.close()
+
+def close_response(future):
+    """
+    Closes the response of a request that lost a hedge.
+
+    Args:
+        future (concurrent.futures.Future): The losing request.
+    """
+    if future.exception() is None:
+        future.result().close()
@@ -0,0 +1,210 @@
+import codecs
+import json
+import re
+
+# Bytes read from a streamed response at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+NON_WHITESPACE = re.compile(r"\S")
+STRUCTURAL = re.compile(r'["{}\[\],:]')
+STRING_SPECIAL = re.compile(r'["\\]')
+
+def json_loads():
+    """
+    Picks the fastest installed JSON decoder.
+
+    Returns:
+        callable: orjson.loads if the optional orjson package is installed,
+            otherwise json.loads.
+    """
+    try:
+        import orjson
+    except ImportError:
+        return json.loads
+    return orjson.loads
+
+def iter_json_array(chunks, key, header=None, loads=None):
+    """
+    Yields the elements of one array in a JSON object as they arrive.
+
+    Only the element being decoded is held in memory, so the rest of the
+    array never has to be downloaded or decoded all at once.
+
+    Args:
+        chunks (iterable): The object's JSON text, as bytes or str chunks,
+            such as response.iter_content().
+        key (str): The top-level key of the array to stream.
+        header (dict, optional): Filled in with the object's other
+            top-level keys. Keys that come after the array are only added
+            once every element has been yielded.
+        loads (callable, optional): Decodes each element. Defaults to the
+            result of json_loads.
+
+    Yields:
+        object: Each decoded element of the array, in order.
+
+    Raises:
+        ValueError: If the text is not a JSON object or is cut short.
+    """
+    loads = loads or json_loads()
+    reader = JSONReader(chunks)
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        name = reader.read_value(json.loads)
+        reader.expect(":")
+
+        if name == key:
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.read_value(loads)
+                    if reader.expect(",", "]") == "]":
+                        break
+        else:
+            value = reader.read_value(loads)
+            if header is not None:
+                header[name] = value
+
+        if reader.expect(",", "}") == "}":
+            return
+
+class JSONReader:
+    """
+    Reads JSON text from a stream of chunks, one value at a time.
+
+    Args:
+        chunks (iterable): JSON text as bytes or str chunks.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+
+    def fill(self):
+        """
+        Appends the next chunk, dropping text that has been read.
+
+        Returns:
+            bool: False if the stream has ended.
+        """
+        for chunk in self.chunks:
+            if isinstance(chunk, bytes):
+                chunk = self.decoder.decode(chunk)
+            if chunk:
+                self.text = self.text[self.pos:] + chunk
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self):
+        """
+        Skips whitespace and looks at the next character.
+
+        Returns:
+            str: The next character, or an empty string at the end.
+        """
+        while True:
+            match = NON_WHITESPACE.search(self.text, self.pos)
+            if match:
+                self.pos = match.start()
+                return match.group()
+            self.pos = len(self.text)
+            if not self.fill():
+                return ""
+
+    def expect(self, *chars):
+        """
+        Reads the next character, which must be one of chars.
+
+        Returns:
+            str: The character read.
+
+        Raises:
+            ValueError: If a different character, or nothing, comes next.
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                f"Expected {' or '.join(chars)} in JSON stream, got {char!r}"
+            )
+        self.pos += 1
+        return char
+
+    def read_value(self, loads):
+        """
+        Decodes the value at the cursor and moves past it.
+
+        Args:
+            loads (callable): Decodes the value's text.
+
+        Returns:
+            object: The decoded value.
+        """
+        self.peek()
+        end = self.value_end()
+        value = loads(self.text[self.pos:end])
+        self.pos = end
+        return value
+
+    def value_end(self):
+        """
+        Finds where the value at the cursor ends, reading chunks as needed.
+
+        Returns:
+            int: The index in self.text just past the value.
+
+        Raises:
+            ValueError: If the stream ends inside the value.
+        """
+        offset = 0
+        depth = 0
+        in_string = False
+
+        while True:
+            start = self.pos + offset
+            pattern = STRING_SPECIAL if in_string else STRUCTURAL
+            match = pattern.search(self.text, start)
+
+            if match is None or (
+                in_string
+                and match.group() == "\\"
+                and match.end() == len(self.text)
+            ):
+                # Rescan a trailing backslash once its escaped character
+                # has arrived
+                end = len(self.text) if match is None else match.start()
+                offset = end - self.pos
+                if not self.fill():
+                    if depth == 0 and not in_string:
+                        return len(self.text)
+                    raise ValueError("JSON stream ended inside a value")
+                continue
+
+            char = match.group()
+            offset = match.end() - self.pos
+
+            if in_string:
+                if char == "\\":
+                    offset += 1
+                    continue
+                in_string = False
+                if depth == 0:
+                    return match.end()
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            elif depth == 0:
+                return match.start()
+            elif char in "}]":
+                depth -= 1
+                if depth == 0:
+                    return match.end()
@@ -0,0 +1,416 @@
+import contextlib
+import json
+import threading
+import time
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Upper bounds, in seconds, of the stage timing histogram buckets
+STAGE_BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1, 10)
+
+class Histogram:
+    """
+    Counts observations into cumulative buckets, Prometheus style.
+
+    Args:
+        buckets (tuple): The bucket upper bounds, in ascending order.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """
+        Records a value.
+
+        Args:
+            value (float): The value to record.
+        """
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def snapshot(self):
+        """
+        Summarises the histogram.
+
+        Returns:
+            dict: The count, sum and cumulative count per bucket bound.
+        """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip(map(str, self.buckets), self.counts))
+        }
+
+class Metrics:
+    """
+    Collects per-endpoint request metrics and per-stage timings.
+
+    Hooks added with add_hook are called with every observation, so they
+    can forward events to a tracing or logging system.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hooks = []
+        self.requests = {}
+        self.stages = {}
+
+    def add_hook(self, hook):
+        """
+        Registers a callable that receives each observation.
+
+        Args:
+            hook (callable): Called with an event dictionary whose "type"
+                is "request" or "stage".
+        """
+        self.hooks.append(hook)
+
+    def observe_request(
+        self,
+        endpoint,
+        seconds,
+        status_code,
+        response_bytes=0,
+        retries=0,
+        from_cache=False
+    ):
+        """
+        Records a completed request.
+
+        Args:
+            endpoint (str): "search", "works", "books" or "other".
+            seconds (float): How long the request took.
+            status_code (int): The response status, or None on an error.
+            response_bytes (int): The size of the response body.
+            retries (int): Retries taken by a ThrottledSession.
+            from_cache (bool): Whether the response came from a cache.
+        """
+        with self.lock:
+            stats = self.requests.setdefault(endpoint, {
+                "latency": Histogram(REQUEST_BUCKETS),
+                "bytes": 0,
+                "status_codes": {},
+                "retries": 0,
+                "cache_hits": 0
+            })
+            stats["latency"].observe(seconds)
+            stats["bytes"] += response_bytes
+            status = str(status_code or "error")
+            stats["status_codes"][status] = stats["status_codes"].get(status, 0) + 1
+            stats["retries"] += retries
+            stats["cache_hits"] += int(from_cache)
+
+        self.emit({
+            "type": "request",
+            "endpoint": endpoint,
+            "seconds": seconds,
+            "status_code": status_code,
+            "bytes": response_bytes,
+            "retries": retries,
+            "from_cache": from_cache
+        })
+
+    def observe_stage(self, stage, seconds):
+        """
+        Records the time spent in a pipeline stage.
+
+        Args:
+            stage (str): The stage name, e.g. "normalise", "merge" or "sink".
+            seconds (float): How long it took.
+        """
+        with self.lock:
+            self.stages.setdefault(stage, Histogram(STAGE_BUCKETS)).observe(seconds)
+
+        self.emit({"type": "stage", "stage": stage, "seconds": seconds})
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Times the body of a with statement as a pipeline stage.
+
+        Args:
+            name (str): The stage name.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(name, time.perf_counter() - started)
+
+    def emit(self, event):
+        """
+        Passes an event to every hook.
+
+        Args:
+            event (dict): The observation.
+        """
+        for hook in self.hooks:
+            hook(event)
+
+    def snapshot(self):
+        """
+        Summarises everything recorded so far.
+
+        Returns:
+            dict: Request metrics by endpoint and timings by stage.
+        """
+        with self.lock:
+            return {
+                "requests": {
+                    endpoint: dict(
+                        stats,
+                        latency=stats["latency"].snapshot(),
+                        status_codes=dict(stats["status_codes"])
+                    )
+                    for endpoint, stats in self.requests.items()
+                },
+                "stages": {
+                    stage: histogram.snapshot()
+                    for stage, histogram in self.stages.items()
+                }
+            }
+
+    def to_json(self):
+        """
+        Serialises the snapshot.
+
+        Returns:
+            str: The snapshot as JSON.
+        """
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self):
+        """
+        Formats the snapshot in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, one sample per line.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        lines += histogram_lines(
+            "book_pipeline_request_seconds",
+            "endpoint",
+            {
+                endpoint: stats["latency"]
+                for endpoint, stats in snapshot["requests"].items()
+            }
+        )
+        for name, key in (
+            ("book_pipeline_response_bytes_total", "bytes"),
+            ("book_pipeline_retries_total", "retries"),
+            ("book_pipeline_cache_hits_total", "cache_hits")
+        ):
+            lines.append(f"# TYPE {name} counter")
+            for endpoint, stats in snapshot["requests"].items():
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {stats[key]}')
+
+        lines.append("# TYPE book_pipeline_responses_total counter")
+        for endpoint, stats in snapshot["requests"].items():
+            for status, count in stats["status_codes"].items():
+                lines.append(
+                    "book_pipeline_responses_total"
+                    f'{{endpoint="{endpoint}",status="{status}"}} {count}'
+                )
+
+        lines += histogram_lines(
+            "book_pipeline_stage_seconds", "stage", snapshot["stages"]
+        )
+
+        return "\n".join(lines) + "\n"
+
+def histogram_lines(name, label, histograms):
+    """
+    Formats labelled histograms in the Prometheus text format.
+
+    Args:
+        name (str): The metric name.
+        label (str): The label that tells the histograms apart.
+        histograms (dict): Histogram snapshots keyed by label value.
+
+    Returns:
+        list: The lines for the metric.
+    """
+    lines = [f"# TYPE {name} histogram"]
+
+    for value, histogram in histograms.items():
+        for bound, count in histogram["buckets"].items():
+            lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {count}')
+        lines.append(
+            f'{name}_bucket{{{label}="{value}",le="+Inf"}} {histogram["count"]}'
+        )
+        lines.append(f'{name}_sum{{{label}="{value}"}} {histogram["sum"]}')
+        lines.append(f'{name}_count{{{label}="{value}"}} {histogram["count"]}')
+
+    return lines
+
+def endpoint_for(url):
+    """
+    Names the openlibrary endpoint a URL belongs to.
+
+    Args:
+        url (str): A request URL.
+
+    Returns:
+        str: "search", "works", "books" or "other".
+    """
+    if "/search.json" in url:
+        return "search"
+    if "/works/" in url:
+        return "works"
+    if "/books/" in url or "/api/books" in url:
+        return "books"
+    return "other"
+
+def stage_timer(metrics, name):
+    """
+    Times a pipeline stage if metrics are being collected.
+
+    Args:
+        metrics (Metrics): Where to record the timing, or None.
+        name (str): The stage name.
+
+    Returns:
+        A context manager timing the stage, or doing nothing.
+    """
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.stage(name)
+
+class ResponseView:
+    """
+    A per-caller view of a response that may be shared between callers.
+
+    Attributes are read from the response, except the overrides, so a
+    wrapper can flag a response or replace its methods without modifying
+    an object other threads may be using.
+
+    Args:
+        response (requests.Response): The response to view.
+        **overrides: Attributes to set on the view only, such as
+            from_cache=True or a replacement json method.
+    """
+
+    def __init__(self, response, **overrides):
+        self.response = response
+        self.__dict__.update(overrides)
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.response.close()
+
+class InstrumentedSession:
+    """
+    Records metrics for every GET request sent through a session.
+
+    JSON decoding of each response is timed as the "decode" stage. Other
+    attributes are read from the wrapped session.
+
+    Args:
+        session (requests.Session): The session to send requests with.
+        metrics (Metrics): Where to record the metrics.
+    """
+
+    def __init__(self, session, metrics):
+        self.session = session
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def get(self, url, **kwargs):
+        """
+        Performs a GET request and records its metrics.
+
+        Args:
+            url (str): The URL to request.
+            **kwargs: Passed on to the wrapped session.
+
+        Returns:
+            ResponseView: A view of the wrapped session's response whose
+                json method is timed. The response itself is not modified,
+                as it may be shared with other callers.
+        """
+        endpoint = endpoint_for(url)
+        started = time.perf_counter()
+
+        try:
+            response = self.session.get(url, **kwargs)
+        except Exception:
+            self.metrics.observe_request(
+                endpoint, time.perf_counter() - started, None
+            )
+            raise
+
+        seconds = time.perf_counter() - started
+
+        if kwargs.get("stream"):
+            response_bytes = int(response.headers.get("Content-Length", 0))
+        else:
+            response_bytes = len(response.content)
+
+        self.metrics.observe_request(
+            endpoint,
+            seconds,
+            response.status_code,
+            response_bytes,
+            getattr(response, "retries", 0),
+            getattr(response, "from_cache", False)
+        )
+
+        def timed_json(**json_kwargs):
+            with self.metrics.stage("decode"):
+                return response.json(**json_kwargs)
+
+        return ResponseView(response, json=timed_json)
+
+    def close(self):
+        """Closes the wrapped session if it has a close method."""
+        if hasattr(self.session, "close"):
+            self.session.close()
+
+class InstrumentedSink:
+    """
+    Times the writes and flushes of a sink as the "sink" stage.
+
+    Args:
+        sink (object): A sink such as NDJSONSink or SQLSink.
+        metrics (Metrics): Where to record the timings.
+    """
+
+    def __init__(self, sink, metrics):
+        self.sink = sink
+        self.metrics = metrics
+        self.resumable = getattr(sink, "resumable", True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, record):
+        with self.metrics.stage("sink"):
+            self.sink.write(record)
+
+    def flush(self):
+        with self.metrics.stage("sink"):
+            self.sink.flush()
+
+    def close(self):
+        with self.metrics.stage("sink"):
+            self.sink.close()
@@ -0,0 +1,458 @@
+import queue
+import threading
+import time
+from src.records import Book
+from src.utils import (
+    DEFAULT_POOL_SIZE,
+    EDITION_BATCH_SIZE,
+    create_session,
+    fetch_book_subjects,
+    fetch_isbn_and_publisher_data_batch,
+    get_edition_key,
+    iter_books_by_author
+)
+
+DEFAULT_QUEUE_SIZE = 100
+
+# Workers given to each stage of the book pipeline by default
+DEFAULT_STAGE_WORKERS = {
+    "normalise": 1,
+    "enrich-work": DEFAULT_POOL_SIZE,
+    "enrich-edition": 2,
+    "merge": 1
+}
+
+# Seconds between checks for a stopped pipeline while a queue is blocked
+POLL_INTERVAL = 0.1
+
+class Stage:
+    """
+    One step of a Pipeline, run by its own pool of worker threads.
+
+    Args:
+        name (str): Identifies the stage in the statistics.
+        function (callable): Turns an item into the item passed on. With
+            batch_size, takes a list of items and returns a list of the
+            same length.
+        workers (int): The number of threads running the stage.
+        batch_size (int, optional): Pass up to this many queued items to
+            function at once.
+    """
+
+    def __init__(self, name, function, workers=1, batch_size=None):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.batch_size = batch_size
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self.lock = threading.Lock()
+
+    def record(self, count, seconds):
+        """
+        Adds to the stage's statistics.
+
+        Args:
+            count (int): Items processed.
+            seconds (float): Time spent processing them.
+        """
+        with self.lock:
+            self.processed += count
+            self.busy_seconds += seconds
+
+class Pipeline:
+    """
+    Runs items through stages connected by bounded queues.
+
+    Each stage reads from its own queue and writes to the next stage's.
+    A full queue blocks the stage before it, so a slow stage slows the
+    stages feeding it instead of letting items pile up in memory. At most
+    max_in_flight items are inside the pipeline at once, and results come
+    out in the order the source produced them.
+
+    The source is read by one thread and reported in the statistics as the
+    first stage, with the time spent waiting on it as its busy time.
+
+    Args:
+        source (iterable): The items to process.
+        stages (list): Stage objects, in order.
+        queue_size (int): The capacity of each stage's input queue.
+        max_in_flight (int, optional): The most items between the source
+            and the output. Defaults to enough to fill every queue.
+        source_name (str): Identifies the source in the statistics.
+    """
+
+    def __init__(
+        self,
+        source,
+        stages,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        max_in_flight=None,
+        source_name="source"
+    ):
+        self.source = source
+        self.source_stage = Stage(source_name, None)
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.output = queue.Queue()
+        self.in_flight = threading.BoundedSemaphore(
+            max_in_flight or queue_size * (len(stages) + 1)
+        )
+        self.stopped = threading.Event()
+        self.started = None
+        self.remaining = [stage.workers for stage in stages]
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def __iter__(self):
+        return self.run()
+
+    def run(self):
+        """
+        Starts the stages and yields their results.
+
+        Yields:
+            object: The output of the last stage for each source item, in
+                source order.
+
+        Raises:
+            Exception: The first error raised by the source or a stage.
+        """
+        self.started = time.perf_counter()
+        self.threads = [threading.Thread(target=self.feed, daemon=True)]
+        for index, stage in enumerate(self.stages):
+            self.threads += [
+                threading.Thread(target=self.work, args=(index,), daemon=True)
+                for _ in range(stage.workers)
+            ]
+        for thread in self.threads:
+            thread.start()
+
+        pending = {}
+        expected = 0
+
+        try:
+            while True:
+                while expected not in pending:
+                    sequence, item = self.output.get()
+                    pending[sequence] = item
+                item = pending.pop(expected)
+                if item is END:
+                    return
+                if isinstance(item, Failure):
+                    raise item.error
+                expected += 1
+                self.in_flight.release()
+                yield item
+        finally:
+            self.stopped.set()
+
+    def feed(self):
+        """Numbers the source's items and queues them for the first stage."""
+        sequence = 0
+        try:
+            items = iter(self.source)
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                self.source_stage.record(1, time.perf_counter() - started)
+
+                if not self.acquire():
+                    return
+                self.put(0, (sequence, item))
+                sequence += 1
+        except Exception as error:
+            self.acquire()
+            self.put(0, (sequence, Failure(error)))
+            sequence += 1
+        self.put(0, (sequence, END))
+
+    def work(self, index):
+        """
+        Runs one worker of a stage until the source is exhausted.
+
+        Args:
+            index (int): The stage's position in the pipeline.
+        """
+        stage = self.stages[index]
+        inbox = self.queues[index]
+
+        while not self.stopped.is_set():
+            try:
+                batch = [inbox.get(timeout=POLL_INTERVAL)]
+            except queue.Empty:
+                continue
+            while stage.batch_size and len(batch) < stage.batch_size:
+                try:
+                    batch.append(inbox.get_nowait())
+                except queue.Empty:
+                    break
+
+            items = [entry for entry in batch if entry[1] is not END]
+            if items:
+                for entry in self.process(stage, items):
+                    self.put(index + 1, entry)
+
+            if len(items) < len(batch):
+                self.finish(index, batch[-1][0])
+                return
+
+    def process(self, stage, items):
+        """
+        Applies a stage's function to items, turning errors into failures.
+
+        Args:
+            stage (Stage): The stage to run.
+            items (list): (sequence, item) pairs.
+
+        Returns:
+            list: (sequence, result) pairs.
+        """
+        values = [item for _, item in items if not isinstance(item, Failure)]
+        started = time.perf_counter()
+
+        try:
+            if stage.batch_size:
+                results = iter(stage.function(values))
+            else:
+                results = iter([stage.function(value) for value in values])
+        except Exception as error:
+            results = iter([Failure(error)] * len(values))
+
+        stage.record(len(values), time.perf_counter() - started)
+
+        return [
+            (sequence, item if isinstance(item, Failure) else next(results))
+            for sequence, item in items
+        ]
+
+    def finish(self, index, sequence):
+        """
+        Passes the end of the stream on once every worker has seen it.
+
+        Args:
+            index (int): The stage's position in the pipeline.
+            sequence (int): The end marker's sequence number.
+        """
+        with self.lock:
+            self.remaining[index] -= 1
+            last = self.remaining[index] == 0
+
+        self.put(index + 1 if last else index, (sequence, END))
+
+    def put(self, index, entry):
+        """
+        Queues an entry for a stage, or for the output after the last.
+
+        Waits while the queue is full, unless the pipeline stops.
+
+        Args:
+            index (int): The stage's position in the pipeline.
+            entry (tuple): A (sequence, item) pair.
+        """
+        target = self.output if index == len(self.stages) else self.queues[index]
+        stage = self.stages[index] if index < len(self.stages) else None
+
+        while not self.stopped.is_set():
+            try:
+                target.put(entry, timeout=POLL_INTERVAL)
+            except queue.Full:
+                continue
+            if stage is not None:
+                stage.max_depth = max(stage.max_depth, target.qsize())
+            return
+
+    def acquire(self):
+        """
+        Waits until another item may enter the pipeline.
+
+        Returns:
+            bool: False if the pipeline stopped while waiting.
+        """
+        while not self.stopped.is_set():
+            if self.in_flight.acquire(timeout=POLL_INTERVAL):
+                return True
+        return False
+
+    def stats(self):
+        """
+        Reports each stage's queue depth and throughput.
+
+        Returns:
+            dict: For the source and then each stage name, its workers, current and highest
+                input queue depth, items processed, busy seconds, items
+                per second of running time and utilisation, the share of
+                its workers' time spent processing.
+        """
+        elapsed = time.perf_counter() - self.started if self.started else 0
+        stats = {
+            self.source_stage.name: stage_stats(self.source_stage, 0, elapsed)
+        }
+
+        for stage, inbox in zip(self.stages, self.queues):
+            stats[stage.name] = stage_stats(stage, inbox.qsize(), elapsed)
+
+        return stats
+
+def stage_stats(stage, queue_depth, elapsed):
+    """
+    Summarises one stage's statistics.
+
+    Args:
+        stage (Stage): The stage.
+        queue_depth (int): The number of items waiting for it.
+        elapsed (float): Seconds the pipeline has been running.
+
+    Returns:
+        dict: See Pipeline.stats.
+    """
+    with stage.lock:
+        return {
+            "workers": stage.workers,
+            "queue_depth": queue_depth,
+            "max_queue_depth": stage.max_depth,
+            "processed": stage.processed,
+            "busy_seconds": round(stage.busy_seconds, 6),
+            "items_per_second": (
+                round(stage.processed / elapsed, 2) if elapsed else 0.0
+            ),
+            "utilisation": (
+                round(stage.busy_seconds / (elapsed * stage.workers), 4)
+                if elapsed else 0.0
+            )
+        }
+
+class Failure:
+    """
+    Carries an error through the remaining stages to the output.
+
+    Args:
+        error (Exception): The error raised.
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+# Marks the end of the source
+END = object()
+
+def build_book_pipeline(
+    author,
+    url,
+    session=None,
+    workers=None,
+    queue_size=DEFAULT_QUEUE_SIZE,
+    edition_batch_size=EDITION_BATCH_SIZE,
+    sink=None
+):
+    """
+    Builds generate_book_data as a staged pipeline.
+
+    The stages are search, normalise, enrich-work, enrich-edition, merge
+    and, if a sink is given, sink. Search is the pipeline's source: it
+    pages through results on one thread, as each page decides whether
+    there is another, and is reported in the statistics as a stage.
+    Enrich-edition looks editions up in batches.
+
+    Args:
+        author (str): The name of an author.
+        url (str): An openlibrary URL.
+        session (requests.Session): A session shared by every stage. Its
+            pool should be at least as large as the enrich stages' workers.
+        workers (dict, optional): Worker counts by stage name, overriding
+            DEFAULT_STAGE_WORKERS.
+        queue_size (int): The capacity of each stage's input queue.
+        edition_batch_size (int): The most editions looked up per books
+            API request.
+        sink (object, optional): Where the sink stage writes records, such
+            as an NDJSONSink. It is written by one worker, in the order
+            records finish, and left for the caller to flush and close.
+
+    Returns:
+        Pipeline: Yields Book records in search order when iterated.
+    """
+    workers = dict(DEFAULT_STAGE_WORKERS, **(workers or {}))
+
+    def normalise(book_data):
+        book = Book.from_search_doc(book_data)
+        book.edition_key = get_edition_key(book_data)
+        return book, None, None
+
+    def enrich_work(item):
+        book, _, _ = item
+        return book, fetch_book_subjects(book.id, url, session), None
+
+    def enrich_edition(items):
+        editions = fetch_isbn_and_publisher_data_batch(
+            [book.edition_key for book, _, _ in items],
+            url,
+            session,
+            edition_batch_size
+        )
+        return [
+            (book, subjects, editions.get(book.edition_key))
+            for book, subjects, _ in items
+        ]
+
+    def merge(item):
+        book, subjects, edition = item
+        book.update(subjects)
+        if edition is not None:
+            book.update(edition)
+        return book
+
+    stages = [
+        Stage("normalise", normalise, workers["normalise"]),
+        Stage("enrich-work", enrich_work, workers["enrich-work"]),
+        Stage(
+            "enrich-edition",
+            enrich_edition,
+            workers["enrich-edition"],
+            batch_size=edition_batch_size
+        ),
+        Stage("merge", merge, workers["merge"])
+    ]
+
+    if sink is not None:
+        def write(book):
+            sink.write(book)
+            return book
+
+        stages.append(Stage("sink", write, 1))
+
+    return Pipeline(
+        iter_books_by_author(author, url, session),
+        stages,
+        queue_size,
+        source_name="search"
+    )
+
+def iter_staged_book_data(author, url, session=None, **options):
+    """
+    Yields pipeline-ready data for an author's books from a staged pipeline.
+
+    Args:
+        author (str): The name of an author.
+        url (str): An openlibrary URL.
+        session (requests.Session, optional): A session shared by every
+            stage. A pooled session is created and closed if not provided.
+        **options: Passed on to build_book_pipeline, e.g. workers.
+
+    Yields:
+        dict: Pipeline-ready data about one of the author's books, in
+            search order.
+    """
+    if session is None:
+        workers = dict(DEFAULT_STAGE_WORKERS, **(options.get("workers") or {}))
+        with create_session(
+            workers["enrich-work"] + workers["enrich-edition"]
+        ) as session:
+            yield from iter_staged_book_data(author, url, session, **options)
+        return
+
+    for book in build_book_pipeline(author, url, session, **options):
+        yield book.to_dict()
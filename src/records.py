@@ -0,0 +1,117 @@
+import json
+
+# (output key, search doc key, required) for each field copied from a
+# search doc. Book's fields, the search API fields parameter and
+# update_book_data all follow this schema.
+BOOK_FIELDS = (
+    ("id", "key", True),
+    ("title", "title", True),
+    ("author_name", "author_name", False),
+    ("first_publish_year", "first_publish_year", False),
+    ("edition_count", "edition_count", True),
+    ("language", "language", False)
+)
+
+# Fields filled from work and edition lookups, after the search fields
+ENRICHED_FIELDS = ("subjects", "publisher", "isbn")
+
+class Book:
+    """
+    A pipeline-ready book record.
+
+    Uses __slots__ so that each record is a fixed set of fields rather
+    than a dictionary, and is filled in place as search, work and edition
+    data arrive. The fields are the output keys of SCHEMA followed by
+    ENRICHED_FIELDS. Fields not yet filled hold the same empty values that
+    generate_book_data uses for missing data.
+
+    The edition_key attribute records which edition the ISBN and publisher
+    data came from. It is not one of the output fields.
+
+    Args:
+        **fields: Initial values, keyed by field name.
+    """
+
+    SCHEMA = BOOK_FIELDS
+    FIELDS = tuple(key for key, _, _ in SCHEMA) + ENRICHED_FIELDS
+
+    __slots__ = FIELDS + ("edition_key",)
+
+    def __init__(self, **fields):
+        for key, _, required in self.SCHEMA:
+            setattr(self, key, None if required else [])
+        self.subjects = []
+        self.publisher = []
+        self.isbn = {"isbn_10": [], "isbn_13": []}
+        self.edition_key = None
+        self.update(fields)
+
+    @classmethod
+    def from_search_doc(cls, book_data):
+        """
+        Creates a record from a search API doc.
+
+        Args:
+            book_data (dict): A book from the openlibrary search API.
+
+        Returns:
+            Book: The new record.
+
+        Raises:
+            KeyError: If a required field is missing from the doc.
+        """
+        book = cls()
+        for key, source_key, required in cls.SCHEMA:
+            if required:
+                setattr(book, key, book_data[source_key])
+            else:
+                setattr(book, key, book_data.get(source_key, []))
+        return book
+
+    def search_data(self):
+        """
+        Lists the fields copied from the search doc.
+
+        Returns:
+            dict: The values of the SCHEMA fields, in order.
+        """
+        return {key: getattr(self, key) for key, _, _ in self.SCHEMA}
+
+    def update(self, data):
+        """
+        Fills fields in place, e.g. from fetch_book_subjects.
+
+        Args:
+            data (dict): New values, keyed by field name.
+
+        Raises:
+            AttributeError: If a key is not a Book field.
+        """
+        for key, value in data.items():
+            setattr(self, key, value)
+
+    def to_dict(self):
+        """
+        Converts the record to the dictionary generate_book_data returns.
+
+        Returns:
+            dict: The record's fields, in order.
+        """
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    def to_json(self):
+        """
+        Serialises the record.
+
+        Returns:
+            str: The record as a JSON object.
+        """
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def __eq__(self, other):
+        if not isinstance(other, Book):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Book(id={self.id!r}, title={self.title!r})"
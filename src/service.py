@@ -0,0 +1,264 @@
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+import requests
+from src.coalesce import CoalescingSession
+from src.main import URL
+from src.metrics import Metrics
+from src.utils import DEFAULT_POOL_SIZE, create_session, generate_book_data
+
+DEFAULT_RESULT_TTL = 60 * 60
+DEFAULT_MAX_RESULTS = 1024
+DEFAULT_BATCH_WINDOW = 0.01
+
+class BookService:
+    """
+    Looks up authors' books with connections and caches kept warm.
+
+    One pooled session is shared by every lookup, with a CoalescingSession
+    in front of it so works and editions shared between authors are only
+    fetched once while fresh. Finished lookups are kept in an LRU of
+    encoded results, and concurrent lookups of the same author share one
+    fetch.
+
+    Concurrent lookups are batched: edition keys from every lookup that
+    arrive within batch_window of each other are combined into shared
+    books API requests.
+
+    Args:
+        url (str): An openlibrary URL.
+        max_workers (int): The worker pool size used per author.
+        author_workers (int): The number of authors fetched at once.
+        result_ttl (float): Seconds a finished lookup, and the work and
+            edition data it was built from, is served from memory.
+        max_results (int): The number of finished lookups kept.
+        batch_window (float): Seconds to collect edition keys from
+            concurrent lookups into one batch.
+        session (requests.Session, optional): The session to fetch with.
+            A pooled session is created if not provided.
+    """
+
+    def __init__(
+        self,
+        url=URL,
+        max_workers=DEFAULT_POOL_SIZE,
+        author_workers=4,
+        result_ttl=DEFAULT_RESULT_TTL,
+        max_results=DEFAULT_MAX_RESULTS,
+        batch_window=DEFAULT_BATCH_WINDOW,
+        session=None
+    ):
+        self.url = url
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self.metrics = Metrics()
+        self.owns_session = session is None
+        self.base_session = session or create_session(
+            max_workers * author_workers
+        )
+        self.session = CoalescingSession(
+            self.base_session, ttl=result_ttl, batch_window=batch_window
+        )
+        self.executor = ThreadPoolExecutor(max_workers=author_workers)
+        self.results = OrderedDict()
+        self.in_flight = {}
+        self.stats = {"hits": 0, "joined": 0, "fetched": 0}
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def books(self, author):
+        """
+        Looks up an author's books, waiting for them to be fetched.
+
+        Args:
+            author (str): The name of an author.
+
+        Returns:
+            bytes: The JSON encoded list of generate_book_data records.
+        """
+        return self.submit(author).result()
+
+    def submit(self, author):
+        """
+        Starts a lookup, or joins a finished or in-flight one.
+
+        Args:
+            author (str): The name of an author.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the JSON encoded records.
+        """
+        with self.lock:
+            entry = self.results.get(author)
+            if entry and time.monotonic() - entry[0] < self.result_ttl:
+                self.results.move_to_end(author)
+                self.stats["hits"] += 1
+                future = Future()
+                future.set_result(entry[1])
+                return future
+
+            if author in self.in_flight:
+                self.stats["joined"] += 1
+                return self.in_flight[author]
+
+            future = self.in_flight[author] = Future()
+
+        self.executor.submit(self.fetch, author)
+        return future
+
+    def fetch(self, author):
+        """
+        Fetches an author's books and resolves everyone waiting on them.
+
+        Args:
+            author (str): The name of an author.
+        """
+        future = self.in_flight[author]
+        try:
+            records = generate_book_data(
+                author,
+                self.url,
+                max_workers=self.max_workers,
+                session=self.session,
+                metrics=self.metrics
+            )
+            body = json.dumps(records).encode()
+        except Exception as error:
+            with self.lock:
+                del self.in_flight[author]
+            future.set_exception(error)
+            return
+
+        with self.lock:
+            del self.in_flight[author]
+            self.stats["fetched"] += 1
+            self.results[author] = (time.monotonic(), body)
+            self.results.move_to_end(author)
+            if len(self.results) > self.max_results:
+                self.results.popitem(last=False)
+        future.set_result(body)
+
+    def close(self):
+        """Stops the worker pool and closes the session."""
+        self.executor.shutdown()
+        if self.owns_session:
+            self.base_session.close()
+
+def make_handler(service):
+    """
+    Builds a request handler class that serves a BookService.
+
+    Routes:
+        GET /authors/{name}/books: The author's records as JSON.
+        GET /health: The service's lookup statistics.
+        GET /metrics: Request and stage metrics in Prometheus format.
+
+    Args:
+        service (BookService): The service to serve.
+
+    Returns:
+        type: A BaseHTTPRequestHandler subclass.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            parts = urlparse(self.path).path.strip("/").split("/")
+
+            if len(parts) == 3 and parts[0] == "authors" and parts[2] == "books":
+                try:
+                    body = service.books(unquote(parts[1]))
+                except requests.RequestException as error:
+                    self.send(502, {"error": str(error)})
+                except Exception as error:
+                    self.send(500, {"error": str(error)})
+                else:
+                    self.send(200, body)
+            elif parts == ["health"]:
+                with service.lock:
+                    stats = dict(service.stats)
+                stats["edition_batches"] = (
+                    service.session.editions.stats["batches"]
+                )
+                self.send(200, {"status": "ok", **stats})
+            elif parts == ["metrics"]:
+                self.send(
+                    200,
+                    service.metrics.to_prometheus().encode(),
+                    "text/plain; version=0.0.4"
+                )
+            else:
+                self.send(404, {"error": "not found"})
+
+        def send(self, status, body, content_type="application/json"):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def serve(service, host="127.0.0.1", port=8080):
+    """
+    Creates an HTTP server for a BookService.
+
+    Args:
+        service (BookService): The service to serve.
+        host (str): The address to listen on.
+        port (int): The port to listen on, or 0 for any free port.
+
+    Returns:
+        ThreadingHTTPServer: The server, ready for serve_forever.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve openlibrary book data over a local HTTP API."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--workers", type=int, default=DEFAULT_POOL_SIZE)
+    parser.add_argument("--author-workers", type=int, default=4)
+    parser.add_argument("--result-ttl", type=float, default=DEFAULT_RESULT_TTL)
+    args = parser.parse_args()
+
+    with BookService(
+        args.url,
+        max_workers=args.workers,
+        author_workers=args.author_workers,
+        result_ttl=args.result_ttl
+    ) as service:
+        server = serve(service, args.host, args.port)
+        print(f"Serving on http://{args.host}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+if __name__ == "__main__":
+    main()
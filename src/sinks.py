@@ -0,0 +1,641 @@
+import gzip
+import json
+import tempfile
+import zlib
+from src.json_stream import STREAM_CHUNK_SIZE
+from src.records import Book
+from src.utils import batched
+
+DEFAULT_SINK_BATCH_SIZE = 1000
+DEFAULT_COMMIT_INTERVAL = 10000
+
+# Positional placeholders for the DB-API paramstyles SQLSink supports.
+# psycopg reports pyformat but also takes %s with positional parameters.
+PLACEHOLDERS = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+
+# (table, value column, record field) for each list field of a book record
+BOOK_CHILD_TABLES = (
+    ("book_authors", "author_name", "author_name"),
+    ("book_languages", "language", "language"),
+    ("book_subjects", "subject", "subjects"),
+    ("book_publishers", "publisher", "publisher")
+)
+
+BOOK_TABLES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS books (
+        id TEXT PRIMARY KEY,
+        title TEXT,
+        first_publish_year INTEGER,
+        edition_count INTEGER
+    )
+    """,
+    *[
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            book_id TEXT NOT NULL REFERENCES books (id),
+            {column} TEXT NOT NULL,
+            PRIMARY KEY (book_id, {column})
+        )
+        """
+        for table, column, _ in BOOK_CHILD_TABLES
+    ],
+    """
+    CREATE TABLE IF NOT EXISTS book_isbns (
+        book_id TEXT NOT NULL REFERENCES books (id),
+        isbn TEXT NOT NULL,
+        isbn_type TEXT NOT NULL,
+        PRIMARY KEY (book_id, isbn)
+    )
+    """
+]
+
+class NDJSONSink:
+    """
+    Writes book records to a newline-delimited JSON file as they arrive.
+
+    Records are buffered and written in batches, so memory use depends on
+    the batch size rather than the number of records.
+
+    Args:
+        path (str): The output file.
+        compress (bool, optional): Whether to gzip the output. Defaults to
+            True if path ends in .gz.
+        batch_size (int): The number of records buffered between writes.
+        append (bool): Whether to add to an existing file instead of
+            replacing it, as when resuming a checkpointed run. A partial
+            last line left by a crash is dropped, and a gzip member a
+            crash left unfinished is rewritten with its complete lines.
+    """
+
+    def __init__(
+        self,
+        path,
+        compress=None,
+        batch_size=DEFAULT_SINK_BATCH_SIZE,
+        append=False
+    ):
+        if compress is None:
+            compress = path.endswith(".gz")
+
+        mode = "a" if append else "w"
+
+        if compress:
+            if append:
+                drop_partial_gzip_member(path)
+            self.file = gzip.open(path, mode + "t", encoding="utf-8")
+        else:
+            if append:
+                drop_partial_line(path)
+            self.file = open(path, mode, encoding="utf-8")
+
+        # Only an appending sink keeps the records of earlier runs
+        self.resumable = append
+        self.batch_size = batch_size
+        self.buffer = []
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, record):
+        """
+        Adds a record, flushing the buffer once a batch is full.
+
+        Args:
+            record (dict or Book): Pipeline-ready book data.
+        """
+        if isinstance(record, Book):
+            self.buffer.append(record.to_json())
+        else:
+            self.buffer.append(json.dumps(record, ensure_ascii=False))
+        self.count += 1
+
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def write_all(self, records):
+        """
+        Writes every record from an iterable, such as iter_book_data.
+
+        Args:
+            records (iterable): Pipeline-ready book data.
+
+        Returns:
+            int: The total number of records written by this sink.
+        """
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def flush(self):
+        """Writes buffered records to the file."""
+        if self.buffer:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        """Flushes any buffered records and closes the file."""
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+def drop_partial_line(path):
+    """
+    Truncates a file after its last newline, if it exists.
+
+    Args:
+        path (str): An uncompressed NDJSON file.
+    """
+    try:
+        file = open(path, "r+b")
+    except FileNotFoundError:
+        return
+
+    with file:
+        end = file.seek(0, 2)
+        position = end
+        while position > 0:
+            step = min(DEFAULT_SINK_BATCH_SIZE, position)
+            file.seek(position - step)
+            newline = file.read(step).rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position < end:
+            file.truncate(position)
+
+def drop_partial_gzip_member(path):
+    """
+    Repairs a gzipped file whose last member was left unfinished, if it exists.
+
+    gzip.open flushes lines into a member that is only finished on close,
+    so a crash leaves a truncated member that nothing can be appended
+    after. The member is cut off and the complete lines decompressed from
+    it are written back as a new member.
+
+    Args:
+        path (str): A gzipped NDJSON file.
+    """
+    try:
+        file = open(path, "r+b")
+    except FileNotFoundError:
+        return
+
+    with file, tempfile.TemporaryFile() as lines:
+        decompressor = zlib.decompressobj(wbits=31)
+        member_start = 0
+        consumed = 0
+        complete = 0
+
+        try:
+            while chunk := file.read(STREAM_CHUNK_SIZE):
+                consumed += len(chunk)
+                while chunk:
+                    data = decompressor.decompress(chunk)
+                    newline = data.rfind(b"\n")
+                    if newline != -1:
+                        complete = lines.tell() + newline + 1
+                    lines.write(data)
+
+                    if not decompressor.eof:
+                        break
+                    chunk = decompressor.unused_data
+                    member_start = consumed - len(chunk)
+                    decompressor = zlib.decompressobj(wbits=31)
+                    lines.seek(0)
+                    lines.truncate()
+                    complete = 0
+        except zlib.error:
+            pass
+
+        if member_start == consumed:
+            return
+
+        file.seek(member_start)
+        file.truncate()
+        if not complete:
+            return
+
+        lines.seek(0)
+        with gzip.GzipFile(fileobj=file, mode="wb") as member:
+            while complete:
+                data = lines.read(min(STREAM_CHUNK_SIZE, complete))
+                member.write(data)
+                complete -= len(data)
+
+def read_ndjson(path):
+    """
+    Reads records back from a file written by NDJSONSink.
+
+    Args:
+        path (str): The NDJSON file, gzipped if it ends in .gz.
+
+    Yields:
+        dict: Each record in the file.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+
+    with opener(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+class SQLSink:
+    """
+    Upserts book records into a SQL database in batches.
+
+    Books are keyed on their work id. Authors, languages, subjects,
+    publishers and ISBNs go into child tables, which are replaced whenever
+    a book is written again. Works with sqlite3 and other DB-API drivers
+    whose database supports INSERT ... ON CONFLICT, such as PostgreSQL.
+
+    Args:
+        connection (object): A DB-API connection.
+        batch_size (int): The number of records per executemany call.
+        commit_interval (int): The number of records between commits.
+        paramstyle (str): The driver's DB-API paramstyle, "qmark" for
+            sqlite3 or "format" or "pyformat" for drivers such as psycopg.
+        create_tables (bool): Whether to create the tables if missing.
+
+    Raises:
+        ValueError: If the paramstyle is not one of PLACEHOLDERS.
+    """
+
+    def __init__(
+        self,
+        connection,
+        batch_size=DEFAULT_SINK_BATCH_SIZE,
+        commit_interval=DEFAULT_COMMIT_INTERVAL,
+        paramstyle="qmark",
+        create_tables=True
+    ):
+        if paramstyle not in PLACEHOLDERS:
+            raise ValueError(f"Unsupported paramstyle: {paramstyle}")
+
+        self.connection = connection
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.placeholder = PLACEHOLDERS[paramstyle]
+        self.buffer = []
+        self.uncommitted = 0
+        self.count = 0
+
+        if create_tables:
+            cursor = self.connection.cursor()
+            for statement in BOOK_TABLES_DDL:
+                cursor.execute(statement)
+            self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, record):
+        """
+        Adds a record, writing the batch once it is full and committing
+        every commit_interval records.
+
+        Args:
+            record (dict or Book): Pipeline-ready book data.
+        """
+        if isinstance(record, Book):
+            record = record.to_dict()
+        self.buffer.append(record)
+        self.count += 1
+
+        if len(self.buffer) >= self.batch_size:
+            self.write_batch()
+            if self.uncommitted >= self.commit_interval:
+                self.commit()
+
+    def write_all(self, records):
+        """
+        Writes every record from an iterable, such as iter_book_data.
+
+        Args:
+            records (iterable): Pipeline-ready book data.
+
+        Returns:
+            int: The total number of records written by this sink.
+        """
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def write_batch(self):
+        """Upserts the buffered records without committing."""
+        if not self.buffer:
+            return
+
+        p = self.placeholder
+        records = list(
+            {record["id"]: record for record in self.buffer}.values()
+        )
+        book_ids = [(record["id"],) for record in records]
+        cursor = self.connection.cursor()
+
+        cursor.executemany(
+            f"""
+            INSERT INTO books (id, title, first_publish_year, edition_count)
+            VALUES ({p}, {p}, {p}, {p})
+            ON CONFLICT (id) DO UPDATE SET
+                title = excluded.title,
+                first_publish_year = excluded.first_publish_year,
+                edition_count = excluded.edition_count
+            """,
+            [
+                (
+                    record["id"],
+                    record["title"],
+                    record.get("first_publish_year") or None,
+                    record.get("edition_count")
+                )
+                for record in records
+            ]
+        )
+
+        for table, column, field in BOOK_CHILD_TABLES:
+            cursor.executemany(
+                f"DELETE FROM {table} WHERE book_id = {p}", book_ids
+            )
+            cursor.executemany(
+                f"INSERT INTO {table} (book_id, {column}) VALUES ({p}, {p})",
+                [
+                    (record["id"], value)
+                    for record in records
+                    for value in dict.fromkeys(record.get(field) or [])
+                ]
+            )
+
+        cursor.executemany(
+            f"DELETE FROM book_isbns WHERE book_id = {p}", book_ids
+        )
+        cursor.executemany(
+            "INSERT INTO book_isbns (book_id, isbn, isbn_type) "
+            f"VALUES ({p}, {p}, {p})",
+            [
+                (record["id"], isbn, isbn_type)
+                for record in records
+                for isbn, isbn_type in book_isbns(record).items()
+            ]
+        )
+
+        self.uncommitted += len(self.buffer)
+        self.buffer = []
+
+    def read(self, book_ids):
+        """
+        Reads stored records back from the database.
+
+        The child tables do not record order, so list fields such as
+        subjects may come back in a different order than written.
+
+        Args:
+            book_ids (iterable): The work ids of the records to read.
+
+        Returns:
+            dict: Pipeline-ready book data keyed by work id. Ids that have
+                not been stored are left out.
+        """
+        p = self.placeholder
+        records = {}
+        cursor = self.connection.cursor()
+
+        for batch in batched(book_ids, self.batch_size):
+            in_batch = ", ".join([p] * len(batch))
+            cursor.execute(
+                "SELECT id, title, first_publish_year, edition_count "
+                f"FROM books WHERE id IN ({in_batch})",
+                batch
+            )
+            for book_id, title, year, edition_count in cursor.fetchall():
+                records[book_id] = Book(
+                    id=book_id,
+                    title=title,
+                    first_publish_year=[] if year is None else year,
+                    edition_count=edition_count
+                ).to_dict()
+
+            for table, column, field in BOOK_CHILD_TABLES:
+                cursor.execute(
+                    f"SELECT book_id, {column} FROM {table} "
+                    f"WHERE book_id IN ({in_batch})",
+                    batch
+                )
+                for book_id, value in cursor.fetchall():
+                    if book_id in records:
+                        records[book_id][field].append(value)
+
+            cursor.execute(
+                "SELECT book_id, isbn, isbn_type FROM book_isbns "
+                f"WHERE book_id IN ({in_batch})",
+                batch
+            )
+            for book_id, isbn, isbn_type in cursor.fetchall():
+                if book_id in records:
+                    records[book_id]["isbn"][isbn_type].append(isbn)
+
+        return records
+
+    def commit(self):
+        """Commits the records written so far."""
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def flush(self):
+        """Writes and commits any buffered records."""
+        self.write_batch()
+        self.commit()
+
+    def close(self):
+        """Writes and commits any buffered records."""
+        self.flush()
+
+def book_isbns(record):
+    """
+    Lists a record's ISBNs with their type.
+
+    Args:
+        record (dict): Pipeline-ready book data.
+
+    Returns:
+        dict: The type, "isbn_10" or "isbn_13", of each ISBN.
+    """
+    isbn_data = record.get("isbn") or {}
+    isbns = {}
+    for isbn_type in ("isbn_10", "isbn_13"):
+        for isbn in isbn_data.get(isbn_type, []):
+            isbns[isbn] = isbn_type
+    return isbns
+
+def book_schema(dictionary_encoded=True):
+    """
+    Builds the Arrow schema for book records.
+
+    Args:
+        dictionary_encoded (bool): Whether to dictionary-encode languages
+            and subjects, which repeat across many books.
+
+    Returns:
+        pyarrow.Schema: The schema of generate_book_data's records.
+    """
+    pa = import_pyarrow()
+    strings = pa.list_(pa.string())
+    if dictionary_encoded:
+        categories = pa.list_(pa.dictionary(pa.int32(), pa.string()))
+    else:
+        categories = strings
+
+    return pa.schema([
+        ("id", pa.string()),
+        ("title", pa.string()),
+        ("author_name", strings),
+        ("first_publish_year", pa.int32()),
+        ("edition_count", pa.int32()),
+        ("language", categories),
+        ("subjects", categories),
+        ("publisher", strings),
+        ("isbn", pa.struct([("isbn_10", strings), ("isbn_13", strings)]))
+    ])
+
+def to_record_batch(records, schema=None):
+    """
+    Converts book records into an Arrow record batch.
+
+    Missing publish years, stored as empty lists by update_book_data,
+    become nulls.
+
+    Args:
+        records (list): Pipeline-ready book data, as dicts or Books.
+        schema (pyarrow.Schema, optional): Defaults to book_schema().
+
+    Returns:
+        pyarrow.RecordBatch: One column per record field.
+    """
+    pa = import_pyarrow()
+    schema = schema or book_schema()
+    columns = {field.name: [] for field in schema}
+
+    for record in records:
+        if isinstance(record, Book):
+            record = record.to_dict()
+        for name, values in columns.items():
+            values.append(record.get(name))
+
+    columns["first_publish_year"] = [
+        year or None for year in columns["first_publish_year"]
+    ]
+
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(columns[field.name], type=field.type)
+            for field in schema
+        ],
+        schema=schema
+    )
+
+class ParquetSink:
+    """
+    Writes book records to a Parquet file, one row group per batch.
+
+    Languages and subjects are dictionary-encoded by Parquet itself, so
+    they read back as plain string lists. Requires the optional pyarrow
+    package.
+
+    Args:
+        path (str): The output file.
+        batch_size (int): The number of records per row group.
+        compression (str): The Parquet compression codec.
+    """
+
+    def __init__(
+        self, path, batch_size=DEFAULT_SINK_BATCH_SIZE, compression="zstd"
+    ):
+        import_pyarrow()
+        import pyarrow.parquet as pq
+
+        self.schema = book_schema(dictionary_encoded=False)
+        self.writer = pq.ParquetWriter(
+            path,
+            self.schema,
+            compression=compression,
+            use_dictionary=["language.list.element", "subjects.list.element"]
+        )
+        # Parquet files cannot be appended to
+        self.resumable = False
+        self.batch_size = batch_size
+        self.buffer = []
+        self.count = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, record):
+        """
+        Adds a record, writing a row group once a batch is full.
+
+        Args:
+            record (dict or Book): Pipeline-ready book data.
+        """
+        self.buffer.append(record)
+        self.count += 1
+
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def write_all(self, records):
+        """
+        Writes every record from an iterable, such as iter_book_data.
+
+        Args:
+            records (iterable): Pipeline-ready book data.
+
+        Returns:
+            int: The total number of records written by this sink.
+        """
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def flush(self):
+        """Writes buffered records as a row group."""
+        if self.buffer:
+            self.writer.write_batch(to_record_batch(self.buffer, self.schema))
+            self.buffer = []
+
+    def close(self):
+        """Writes any buffered records and closes the file."""
+        if not self.closed:
+            self.flush()
+            self.writer.close()
+            self.closed = True
+
+def import_pyarrow():
+    """
+    Imports the optional pyarrow dependency.
+
+    Returns:
+        module: The pyarrow module.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow
+    except ImportError as error:
+        raise ImportError(
+            "Columnar output requires pyarrow: pip install pyarrow"
+        ) from error
+    return pyarrow
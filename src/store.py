@@ -0,0 +1,218 @@
+import argparse
+import sqlite3
+from src.sinks import SQLSink, read_ndjson
+
+# (table, column) of the inverted index behind each query filter
+INDEXED_FILTERS = {
+    "subject": ("book_subjects", "subject"),
+    "language": ("book_languages", "language"),
+    "author": ("book_authors", "author_name"),
+    "publisher": ("book_publishers", "publisher"),
+    "isbn": ("book_isbns", "isbn")
+}
+
+STORE_INDEXES_DDL = [
+    *[
+        f"CREATE INDEX IF NOT EXISTS {table}_{column}_index "
+        f"ON {table} ({column}, book_id)"
+        for table, column in INDEXED_FILTERS.values()
+    ],
+    "CREATE INDEX IF NOT EXISTS books_first_publish_year_index "
+    "ON books (first_publish_year, id)"
+]
+
+class BookStore:
+    """
+    A local SQLite store of book records with indexed filtered lookups.
+
+    Records are stored with SQLSink's tables. Each list field gets an
+    inverted index from value to work id, and first_publish_year a sorted
+    index, so a query intersects the matching ids from each index instead
+    of scanning every record.
+
+    Args:
+        path (str): The SQLite database file.
+        **options: Passed on to SQLSink, e.g. batch_size.
+    """
+
+    def __init__(self, path, **options):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.sink = SQLSink(self.connection, **options)
+
+        for statement in STORE_INDEXES_DDL:
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, record):
+        """
+        Adds or replaces a record. Call flush before querying it.
+
+        Args:
+            record (dict or Book): Pipeline-ready book data.
+        """
+        self.sink.write(record)
+
+    def load(self, records):
+        """
+        Stores every record from an iterable, such as iter_book_data.
+
+        Args:
+            records (iterable): Pipeline-ready book data.
+
+        Returns:
+            int: The total number of records written to the store.
+        """
+        count = self.sink.write_all(records)
+        self.flush()
+        return count
+
+    def flush(self):
+        """Writes and commits buffered records."""
+        self.sink.flush()
+
+    def close(self):
+        """Flushes buffered records and closes the database."""
+        self.sink.close()
+        self.connection.close()
+
+    def query(self, limit=None, offset=0, **filters):
+        """
+        Finds the work ids of the records matching every filter.
+
+        Args:
+            limit (int, optional): The most ids to return.
+            offset (int): The number of matching ids to skip.
+            **filters: See matching, e.g. subject="Fiction".
+
+        Returns:
+            list: The matching work ids, sorted.
+        """
+        sql, params = matching(**filters)
+        cursor = self.connection.execute(
+            f"{sql} ORDER BY 1 LIMIT ? OFFSET ?",
+            params + [-1 if limit is None else limit, offset]
+        )
+        return [book_id for book_id, in cursor]
+
+    def find(self, limit=None, offset=0, **filters):
+        """
+        Reads the records matching every filter.
+
+        Takes the same arguments as query.
+
+        Returns:
+            list: Pipeline-ready book data, sorted by work id.
+        """
+        book_ids = self.query(limit, offset, **filters)
+        records = self.sink.read(book_ids)
+        return [records[book_id] for book_id in book_ids]
+
+    def count(self, **filters):
+        """
+        Counts the records matching every filter.
+
+        Args:
+            **filters: See matching, e.g. subject="Fiction".
+
+        Returns:
+            int: The number of matching records.
+        """
+        sql, params = matching(**filters)
+        cursor = self.connection.execute(f"SELECT COUNT(*) FROM ({sql})", params)
+        return cursor.fetchone()[0]
+
+def matching(
+    subject=None,
+    language=None,
+    author=None,
+    publisher=None,
+    isbn=None,
+    min_year=None,
+    max_year=None
+):
+    """
+    Builds a query intersecting the indexes for each filter.
+
+    A list filter may be one value or a list of values, all of which a
+    record must have. Filters left as None are not applied.
+
+    Args:
+        subject (str or list, optional): Subjects.
+        language (str or list, optional): Language codes, e.g. "eng".
+        author (str or list, optional): Author names.
+        publisher (str or list, optional): Publishers.
+        isbn (str or list, optional): ISBN-10s or ISBN-13s.
+        min_year (int, optional): The earliest first_publish_year.
+        max_year (int, optional): The latest first_publish_year.
+
+    Returns:
+        tuple: The SQL selecting matching work ids, and its parameters.
+    """
+    filters = {
+        "subject": subject,
+        "language": language,
+        "author": author,
+        "publisher": publisher,
+        "isbn": isbn
+    }
+    selects = []
+    params = []
+
+    for name, values in filters.items():
+        if values is None:
+            continue
+        table, column = INDEXED_FILTERS[name]
+        for value in [values] if isinstance(values, str) else values:
+            selects.append(f"SELECT book_id FROM {table} WHERE {column} = ?")
+            params.append(value)
+
+    if min_year is not None or max_year is not None:
+        selects.append(
+            "SELECT id FROM books WHERE first_publish_year BETWEEN ? AND ?"
+        )
+        params += [
+            -2**63 if min_year is None else min_year,
+            2**63 - 1 if max_year is None else max_year
+        ]
+
+    if not selects:
+        selects.append("SELECT id FROM books")
+
+    return " INTERSECT ".join(selects), params
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load book records into a local store and query it."
+    )
+    parser.add_argument("store", help="a SQLite database file")
+    parser.add_argument("--load", help="an NDJSON file of records to add")
+    for name in INDEXED_FILTERS:
+        parser.add_argument(f"--{name}", action="append", default=None)
+    parser.add_argument("--min-year", type=int, default=None)
+    parser.add_argument("--max-year", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    with BookStore(args.store) as store:
+        if args.load:
+            written = store.load(read_ndjson(args.load))
+            print(f"Loaded {written} records into {args.store}")
+            return
+
+        for book_id in store.query(
+            **{name: getattr(args, name) for name in INDEXED_FILTERS},
+            min_year=args.min_year,
+            max_year=args.max_year,
+            limit=args.limit
+        ):
+            print(book_id)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import requests
+from src.records import Book
+from src.utils import fetch_book_subjects, fetch_isbn_and_publisher_data_batch
+
+RECENT_CHANGES_PAGE_SIZE = 1000
+
+# The checkpoint mark holding the timestamp of the last change synced
+SYNC_MARK = "recentchanges"
+
+def iter_recent_changes(
+    url,
+    since=None,
+    session=None,
+    limit=RECENT_CHANGES_PAGE_SIZE
+):
+    """
+    Yields changes from the openlibrary recent-changes feed, newest first.
+
+    Args:
+        url (str): An openlibrary URL.
+        since (str, optional): An ISO 8601 timestamp. Only changes made
+            after it are yielded. Every change is yielded if not provided.
+        session (requests.Session, optional): A session to send the
+            requests with.
+        limit (int): The number of changes requested per page.
+
+    Yields:
+        dict: A change, with its timestamp and the changed keys.
+    """
+    offset = 0
+
+    while True:
+        response = (session or requests).get(
+            f"{url}/recentchanges.json",
+            params={"limit": limit, "offset": offset}
+        )
+        response.raise_for_status()
+        changes = response.json()
+
+        for change in changes:
+            if since is not None and change["timestamp"] <= since:
+                return
+            yield change
+
+        if len(changes) < limit:
+            return
+        offset += limit
+
+def changed_keys(changes):
+    """
+    Collects the work and edition keys touched by changes.
+
+    Args:
+        changes (iterable): Changes from iter_recent_changes.
+
+    Returns:
+        tuple: The set of changed work keys, such as "/works/OL1W", and
+            the set of changed edition keys, such as "OL1M".
+    """
+    works = set()
+    editions = set()
+
+    for change in changes:
+        for changed in change.get("changes", []):
+            key = changed["key"]
+            if key.startswith("/works/"):
+                works.add(key)
+            elif key.startswith("/books/"):
+                editions.add(key[len("/books/"):])
+
+    return works, editions
+
+def affected_books(works, editions, checkpoint):
+    """
+    Maps changed keys back to the stored records that use them.
+
+    Args:
+        works (set): Changed work keys.
+        editions (set): Changed edition keys.
+        checkpoint (Checkpoint): The checkpoint of the runs that stored
+            the records, which links each edition to its work.
+
+    Returns:
+        set: The work ids of the stored records to refresh.
+    """
+    affected = {key for key in works if checkpoint.is_done("work", key)}
+
+    for edition_key in editions:
+        work = checkpoint.parent("edition", edition_key)
+        if work is not None:
+            affected.add(work)
+
+    return affected
+
+def sync_changes(
+    url,
+    sink,
+    checkpoint,
+    session=None,
+    limit=RECENT_CHANGES_PAGE_SIZE
+):
+    """
+    Refreshes stored records whose works or editions changed.
+
+    Reads the recent-changes feed from the checkpoint's high-water mark,
+    re-fetches subjects and ISBN and publisher data for the affected
+    records only, merges them into the stored records and writes them
+    back. Fields that come from the search API are kept as stored.
+
+    The first call only sets the mark to the newest change, so call it
+    before the first full run to pick up everything changed since.
+
+    Args:
+        url (str): An openlibrary URL.
+        sink (SQLSink): The store holding the records from earlier runs.
+        checkpoint (Checkpoint): The checkpoint of those runs. Its mark
+            is moved forward once the refreshed records are flushed.
+        session (requests.Session, optional): A session to send the
+            requests with.
+        limit (int): The number of changes requested per page.
+
+    Returns:
+        int: The number of records refreshed.
+    """
+    since = checkpoint.mark(SYNC_MARK)
+
+    if since is None:
+        for change in iter_recent_changes(url, session=session, limit=1):
+            checkpoint.set_mark(SYNC_MARK, change["timestamp"])
+            break
+        return 0
+
+    changes = list(iter_recent_changes(url, since, session, limit))
+    if not changes:
+        return 0
+
+    works, editions = changed_keys(changes)
+    records = sink.read(sorted(affected_books(works, editions, checkpoint)))
+    books = []
+    edition_keys = []
+
+    for work_id, record in records.items():
+        book = Book(**record)
+        book.update(fetch_book_subjects(work_id, url, session))
+        for edition_key in checkpoint.children("edition", work_id):
+            book.edition_key = edition_key
+            edition_keys.append(edition_key)
+        books.append(book)
+
+    isbn_data = fetch_isbn_and_publisher_data_batch(edition_keys, url, session)
+
+    for book in books:
+        if book.edition_key in isbn_data:
+            book.update(isbn_data[book.edition_key])
+        sink.write(book)
+
+    sink.flush()
+    checkpoint.set_mark(SYNC_MARK, changes[0]["timestamp"])
+    return len(books)
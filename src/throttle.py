@@ -0,0 +1,270 @@
+import random
+import requests
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Status codes that mean the server wants us to slow down
+THROTTLE_STATUS_CODES = {429, 503}
+
+# Status codes worth retrying, on top of THROTTLE_STATUS_CODES
+RETRY_STATUS_CODES = {500, 502, 504}
+
+class TokenBucket:
+    """
+    Limits the rate of requests shared between threads.
+
+    Args:
+        rate (float, optional): Tokens added per second. If not provided
+            the rate is unlimited and only pauses hold requests back.
+        capacity (int): The largest burst allowed.
+    """
+
+    def __init__(self, rate=None, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+
+                if self.rate is None:
+                    if now >= self.paused_until:
+                        return
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(
+                        self.capacity,
+                        self.tokens + (now - self.updated_at) * self.rate
+                    )
+                    self.updated_at = now
+
+                    if now >= self.paused_until and self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+
+                    wait = max(
+                        self.paused_until - now,
+                        (1 - self.tokens) / self.rate
+                    )
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Stops handing out tokens for a while, e.g. after a Retry-After.
+
+        Args:
+            seconds (float): How long to pause for.
+        """
+        with self.lock:
+            self.paused_until = max(
+                self.paused_until, time.monotonic() + seconds
+            )
+
+class AdaptiveConcurrency:
+    """
+    Limits requests in flight, adjusting the limit with AIMD.
+
+    Each success raises the limit by increase / limit, adding roughly
+    increase per round of requests. Each throttled response multiplies
+    the limit by decrease.
+
+    Args:
+        initial (int): The starting limit.
+        minimum (int): The lowest the limit can fall to.
+        maximum (int): The highest the limit can rise to.
+        increase (float): The additive increase per round of requests.
+        decrease (float): The multiplicative decrease when throttled.
+    """
+
+    def __init__(
+        self, initial=4, minimum=1, maximum=64, increase=1, decrease=0.5
+    ):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        """Raises the limit after a successful response."""
+        with self.condition:
+            self.limit = min(
+                self.maximum, self.limit + self.increase / self.limit
+            )
+            self.condition.notify_all()
+
+    def on_throttle(self):
+        """Cuts the limit after a throttled response."""
+        with self.condition:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+
+class ThrottledSession:
+    """
+    Sends GET requests through a rate limiter, retrying failures.
+
+    Throttled and server error responses, connection errors and timeouts
+    are retried with jittered exponential backoff. A Retry-After header
+    pauses every request sharing the token bucket for the given time.
+
+    By default the request rate is not capped: the concurrency limit
+    backs off when throttled and grows again on success, and Retry-After
+    pauses cover the rest. Pass a bucket with a rate to enforce a known
+    quota.
+
+    Args:
+        session (requests.Session, optional): The session to send requests
+            with.
+        bucket (TokenBucket, optional): Limits the request rate. Unlimited,
+            apart from Retry-After pauses, if not provided.
+        concurrency (AdaptiveConcurrency, optional): Limits requests in
+            flight.
+        max_retries (int): Retries before giving up on a request.
+        backoff (float): The base delay in seconds between retries.
+        max_backoff (float): The longest delay between retries.
+    """
+
+    def __init__(
+        self,
+        session=None,
+        bucket=None,
+        concurrency=None,
+        max_retries=5,
+        backoff=0.5,
+        max_backoff=60
+    ):
+        self.session = session or requests
+        self.bucket = bucket or TokenBucket()
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0}
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        """
+        Performs a rate limited GET request.
+
+        Args:
+            url (str): The URL to request.
+            **kwargs: Passed on to the wrapped session.
+
+        Returns:
+            requests.Response: The first response that is not retried,
+                with the number of retries taken in its retries attribute.
+
+        Raises:
+            requests.exceptions.ConnectionError: If the last attempt could
+                not connect.
+            requests.exceptions.Timeout: If the last attempt timed out.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self.record("requests" if attempt == 0 else "retries")
+
+            try:
+                with self.concurrency:
+                    response = self.session.get(url, **kwargs)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout
+            ):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff_delay(attempt))
+                continue
+
+            status_code = response.status_code
+
+            if status_code in THROTTLE_STATUS_CODES:
+                self.record("throttled")
+                self.concurrency.on_throttle()
+            elif status_code not in RETRY_STATUS_CODES:
+                self.concurrency.on_success()
+                response.retries = attempt
+                return response
+
+            if attempt == self.max_retries:
+                response.retries = attempt
+                return response
+
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is not None:
+                self.bucket.pause(delay)
+            else:
+                time.sleep(self.backoff_delay(attempt))
+
+    def backoff_delay(self, attempt):
+        """
+        Picks a jittered exponential backoff delay.
+
+        Args:
+            attempt (int): The number of attempts already made, minus one.
+
+        Returns:
+            float: Seconds to wait before the next attempt.
+        """
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** attempt)
+        )
+
+    def record(self, outcome):
+        """
+        Increments a request statistic.
+
+        Args:
+            outcome (str): One of "requests", "retries" or "throttled".
+        """
+        with self.lock:
+            self.stats[outcome] += 1
+
+    def close(self):
+        """Closes the wrapped session if it has a close method."""
+        if hasattr(self.session, "close"):
+            self.session.close()
+
+def parse_retry_after(value):
+    """
+    Converts a Retry-After header into a delay.
+
+    Args:
+        value (str): The header value, in seconds or as an HTTP date.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -1,21 +1,221 @@
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from src.coalesce import KeyedCoalescer
+from src.json_stream import STREAM_CHUNK_SIZE, iter_json_array
+from src.metrics import InstrumentedSession, stage_timer
+from src.records import Book
 
-def fetch_books_by_author(name, url):
+DEFAULT_POOL_SIZE = 10
+SEARCH_PAGE_SIZE = 100
+EDITION_BATCH_SIZE = 50
+
+# Search doc keys checked by get_edition_key, in order of preference
+EDITION_KEY_FIELDS = ("cover_edition_key", "lending_edition_s")
+
+def create_session(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Creates a pooled HTTP session that keeps connections alive.
+
+    Args:
+        pool_size (int): The number of connections kept open per host.
+            This should match the number of concurrent requests.
+
+    Returns:
+        requests.Session: A session to share between fetch functions.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip"
+    return session
+
+def fetch_books_by_author(name, url, session=None):
     """
     Fetches a list of books from the openlibrary API.
     
     Args:
         name (str): The name of an author.
         url (str): An openlibrary URL.
+        session (requests.Session, optional): A session to send the
+            request with.
     
     Returns:
         list: A list of dictionaries with information about the author's books. 
     """
-    url = f"{url}/search.json?author={name}"
-    response = requests.get(url)
+    return list(iter_books_by_author(name, url, session))
+
+def iter_books_by_author(
+    name,
+    url,
+    session=None,
+    limit=SEARCH_PAGE_SIZE,
+    stream=False
+):
+    """
+    Yields an author's books from every page of the openlibrary search API.
+
+    The next page is requested in the background while the books on the
+    current page are being consumed.
+
+    Args:
+        name (str): The name of an author.
+        url (str): An openlibrary URL.
+        session (requests.Session, optional): A session to send the
+            requests with.
+        limit (int): The number of books requested per page.
+        stream (bool): Decode each page incrementally, yielding books as
+            they are downloaded instead of after the whole page arrives.
+
+    Yields:
+        dict: Information about one of the author's books.
+    """
+    if stream:
+        yield from iter_streamed_books_by_author(name, url, session, limit)
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        page = 1
+        fetched = 0
+        next_page = executor.submit(
+            fetch_search_page, name, url, page, limit, session
+        )
+
+        while next_page is not None:
+            data = next_page.result()
+            docs = data["docs"]
+            fetched += len(docs)
+            total = data.get("numFound")
+            next_page = None
+
+            if len(docs) == limit and (total is None or fetched < total):
+                page += 1
+                next_page = executor.submit(
+                    fetch_search_page, name, url, page, limit, session
+                )
+
+            yield from docs
+
+def iter_streamed_books_by_author(
+    name,
+    url,
+    session=None,
+    limit=SEARCH_PAGE_SIZE
+):
+    """
+    Yields an author's books while each search page is still downloading.
+
+    Only one book of a page is decoded at a time. The next page is
+    requested as soon as the current page's numFound shows there is one.
+
+    Takes the same arguments as iter_books_by_author.
+
+    Yields:
+        dict: Information about one of the author's books.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        page = 1
+        next_page = executor.submit(
+            open_search_page, name, url, page, limit, session
+        )
+
+        while next_page is not None:
+            response = next_page.result()
+            next_page = None
+            header = {}
+            count = 0
+
+            with response:
+                for doc in iter_json_array(
+                    response.iter_content(STREAM_CHUNK_SIZE), "docs", header
+                ):
+                    count += 1
+                    total = header.get("numFound")
+                    if next_page is None and total is not None \
+                            and page * limit < total:
+                        next_page = executor.submit(
+                            open_search_page, name, url, page + 1, limit, session
+                        )
+                    yield doc
+
+            if count < limit:
+                if next_page is not None:
+                    next_page.result().close()
+                next_page = None
+            elif next_page is None and header.get("numFound") is None:
+                next_page = executor.submit(
+                    open_search_page, name, url, page + 1, limit, session
+                )
+            page += 1
+
+def open_search_page(name, url, page, limit, session=None):
+    """
+    Requests a single page of an author's books without reading the body.
+
+    Takes the same arguments as fetch_search_page.
+
+    Returns:
+        requests.Response: A streamed response, to be read and closed by
+            the caller.
+    """
+    response = (session or requests).get(
+        f"{url}/search.json",
+        params=search_params(name, page, limit),
+        stream=True
+    )
+    response.raise_for_status()
+    return response
+
+def fetch_search_page(name, url, page, limit, session=None):
+    """
+    Fetches a single page of an author's books.
+
+    Args:
+        name (str): The name of an author.
+        url (str): An openlibrary URL.
+        page (int): The page number, starting from 1.
+        limit (int): The number of books per page.
+        session (requests.Session, optional): A session to send the
+            request with.
+
+    Returns:
+        dict: The decoded search response.
+    """
+    response = (session or requests).get(
+        f"{url}/search.json", params=search_params(name, page, limit)
+    )
     response.raise_for_status()
-    data = response.json()
-    return data["docs"]
+    return response.json()
+
+def search_params(name, page, limit):
+    """
+    Builds the query parameters for a page of an author's books.
+
+    Args:
+        name (str): The name of an author.
+        page (int): The page number, starting from 1.
+        limit (int): The number of books per page.
+
+    Returns:
+        dict: The search API parameters.
+    """
+    return {
+        "author": name,
+        "page": page,
+        "limit": limit,
+        "fields": search_fields()
+    }
+
+def search_fields():
+    """
+    Lists the search doc fields read by update_book_data and get_edition_key.
+
+    Returns:
+        str: A comma-separated list for the search API's fields parameter.
+    """
+    source_keys = [source_key for _, source_key, _ in Book.SCHEMA]
+    return ",".join(source_keys + list(EDITION_KEY_FIELDS))
 
 def update_book_data(book_data):
     """
@@ -27,54 +227,71 @@ def update_book_data(book_data):
     Returns:
         dict: A streamlined set of data with updated key-value pairs.
     """
-    book_dict = {}
-
     if not book_data:
-        return book_dict
-
-    book_dict["id"] = book_data["key"]
-    book_dict["title"] = book_data["title"]
-    book_dict["author_name"] = book_data.get("author_name", [])
-    book_dict["first_publish_year"] = book_data.get("first_publish_year", [])
-    book_dict["edition_count"] = book_data["edition_count"]
-    book_dict["language"] = book_data.get("language", [])
-    
-    return book_dict
+        return {}
 
-def fetch_book_subjects(book_key, url):
+    return Book.from_search_doc(book_data).search_data()
+
+def fetch_book_subjects(book_key, url, session=None):
     """
     Retrieves the list of subjects for a book.
     
     Args:
         url (str): The main openlibrary URL.
         book_key (str): The openlibrary key for a book.
+        session (requests.Session, optional): A session to send the
+            request with.
     
     Returns:
         dict: A dictionary listing the book's subjects.
     """
     url = f"{url}{book_key}.json"
-    response = requests.get(url)
+    response = (session or requests).get(url)
     response.raise_for_status()
-    data = response.json()
+    return extract_subjects(response.json())
+
+def extract_subjects(data):
+    """
+    Extracts the list of subjects from a work response body.
+
+    Args:
+        data (dict): A decoded openlibrary work.
+
+    Returns:
+        dict: A dictionary listing the book's subjects.
+    """
     book_dict = {}
     book_dict["subjects"] = data.get("subjects", [])
     return book_dict
 
-def fetch_isbn_and_publisher_data(edition_key, url):
+def fetch_isbn_and_publisher_data(edition_key, url, session=None):
     """
     Retrieves a book's ISBN and publisher data.
     
     Args:
         edition_key (str): A book's edition key.
         url (str): An openlibrary URL.
+        session (requests.Session, optional): A session to send the
+            request with.
     
     Returns:
         dict: The book's ISBN and publisher data.
     """
     url = f"{url}/books/{edition_key}.json"
-    response = requests.get(url)
+    response = (session or requests).get(url)
     response.raise_for_status()
-    data = response.json()
+    return extract_isbn_and_publisher_data(response.json())
+
+def extract_isbn_and_publisher_data(data):
+    """
+    Extracts ISBN and publisher data from an edition response body.
+
+    Args:
+        data (dict): A decoded openlibrary edition.
+
+    Returns:
+        dict: The book's ISBN and publisher data.
+    """
     book_dict = {}
     book_dict["publisher"] = data["publishers"]
     book_dict["isbn"] = {
@@ -83,6 +300,117 @@ def fetch_isbn_and_publisher_data(edition_key, url):
     }
     return book_dict
 
+def fetch_isbn_and_publisher_data_batch(
+    edition_keys, url, session=None, batch_size=EDITION_BATCH_SIZE
+):
+    """
+    Retrieves ISBN and publisher data for many editions at once.
+
+    Editions are requested from the books API in groups of batch_size
+    rather than one request per edition. If the session coalesces
+    editions, as CoalescingSession does, editions already resolved or
+    being fetched by another batch are taken from it and only the rest
+    are requested.
+
+    Args:
+        edition_keys (list): Edition keys, as returned by get_edition_key.
+            Missing keys are skipped.
+        url (str): An openlibrary URL.
+        session (requests.Session, optional): A session to send the
+            requests with.
+        batch_size (int): The number of editions per request.
+
+    Returns:
+        dict: ISBN and publisher data for each edition key. Editions
+            unknown to openlibrary have empty data.
+    """
+    edition_keys = list(dict.fromkeys(key for key in edition_keys if key))
+
+    def fetch(keys):
+        book_dicts = {}
+        for batch in batched(keys, batch_size):
+            response = (session or requests).get(
+                f"{url}/api/books", params=edition_batch_params(batch)
+            )
+            response.raise_for_status()
+            book_dicts.update(extract_edition_batch(batch, response.json()))
+        return book_dicts
+
+    editions = getattr(session, "editions", None)
+    if isinstance(editions, KeyedCoalescer):
+        return editions.resolve(edition_keys, fetch)
+    return fetch(edition_keys)
+
+def edition_batch_params(edition_keys):
+    """
+    Builds the books API query for a batch of editions.
+
+    Args:
+        edition_keys (list): Edition keys, none of them missing.
+
+    Returns:
+        dict: Query string parameters for /api/books.
+    """
+    return {
+        "bibkeys": ",".join(f"OLID:{key}" for key in edition_keys),
+        "format": "json",
+        "jscmd": "details"
+    }
+
+def extract_edition_batch(edition_keys, data):
+    """
+    Extracts ISBN and publisher data from a books API response body.
+
+    Args:
+        edition_keys (list): The edition keys that were requested.
+        data (dict): The decoded response, keyed by bibkey.
+
+    Returns:
+        dict: ISBN and publisher data for each edition key. Editions
+            missing from the response have empty data.
+    """
+    book_dicts = {}
+
+    for key in edition_keys:
+        edition = data.get(f"OLID:{key}")
+        if edition:
+            book_dicts[key] = extract_isbn_and_publisher_data(edition["details"])
+        else:
+            book_dicts[key] = empty_isbn_and_publisher_data()
+
+    return book_dicts
+
+def empty_isbn_and_publisher_data():
+    """
+    Creates ISBN and publisher data for a book without a known edition.
+
+    Returns:
+        dict: Empty ISBN and publisher data.
+    """
+    return {"publisher": [], "isbn": {"isbn_10": [], "isbn_13": []}}
+
+def batched(iterable, size):
+    """
+    Splits an iterable into lists of a given size.
+
+    Args:
+        iterable (iterable): The items to split.
+        size (int): The maximum number of items per list.
+
+    Yields:
+        list: The next group of items.
+    """
+    batch = []
+
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
 def get_edition_key(book):
     """
     Retrieves a book's edition key.
@@ -93,7 +421,9 @@ def get_edition_key(book):
     Returns:
         str: The book's edition key.
     """
-    return book.get("cover_edition_key") or (book.get("lending_edition_s"))
+    for key in EDITION_KEY_FIELDS:
+        if book.get(key):
+            return book[key]
 
 def merge_dicts(*dicts):
     """
@@ -118,33 +448,220 @@ def merge_dicts(*dicts):
     
     return new_dict
 
-def generate_book_data(author, url):
+def generate_book_data(
+    author,
+    url,
+    max_workers=None,
+    session=None,
+    edition_batch_size=EDITION_BATCH_SIZE,
+    metrics=None,
+    stream=False
+):
     """
     Retrieves and formats data for an author's books.
 
     Args:
         name (str): The name of an author.
         url (str): An openlibrary URL.
+        max_workers (int, optional): Size of the worker pool used to fetch
+            work and edition data concurrently. Books are enriched one at
+            a time if not provided.
+        session (requests.Session, optional): A session shared by every
+            request. A pooled session sized to max_workers is created and
+            closed again if not provided.
+        edition_batch_size (int): The number of editions looked up per
+            books API request.
+        metrics (Metrics, optional): Records per-endpoint request metrics
+            and normalise, decode and merge timings if provided.
+        stream (bool): Decode search pages incrementally, so books are
+            enriched while the rest of a page is still downloading.
     
     Returns:
         list: A list of pipeline-ready data about the author's books. 
     """
-    book_list = fetch_books_by_author(author, url)
+    return list(iter_book_data(
+        author, url, max_workers, session, edition_batch_size, metrics, stream
+    ))
 
-    new_book_list = []
+def iter_book_data(
+    author,
+    url,
+    max_workers=None,
+    session=None,
+    edition_batch_size=EDITION_BATCH_SIZE,
+    metrics=None,
+    stream=False
+):
+    """
+    Yields pipeline-ready data for an author's books as it is fetched.
 
-    for book in book_list:
+    Takes the same arguments as generate_book_data.
 
-        edition_key = get_edition_key(book)
-    
-        updated_book = update_book_data(book)
+    Yields:
+        dict: Pipeline-ready data about one of the author's books, in
+            search order.
+    """
+    for book in iter_book_records(
+        author,
+        url,
+        max_workers,
+        session,
+        edition_batch_size,
+        metrics=metrics,
+        stream=stream
+    ):
+        yield book.to_dict()
+
+def iter_book_records(
+    author,
+    url,
+    max_workers=None,
+    session=None,
+    edition_batch_size=EDITION_BATCH_SIZE,
+    exclude=(),
+    metrics=None,
+    stream=False
+):
+    """
+    Yields Book records for an author's books as they are fetched.
+
+    Takes the same arguments as generate_book_data, plus:
+
+    Args:
+        exclude (container): Work keys to skip without enriching, such as
+            works finished by an earlier run.
+
+    Yields:
+        Book: A record for one of the author's books, in search order.
+    """
+    if session is None:
+        with create_session(max_workers or DEFAULT_POOL_SIZE) as session:
+            yield from iter_book_records(
+                author,
+                url,
+                max_workers,
+                session,
+                edition_batch_size,
+                exclude,
+                metrics,
+                stream
+            )
+        return
+
+    if metrics and not isinstance(session, InstrumentedSession):
+        session = InstrumentedSession(session, metrics)
+
+    book_list = (
+        book for book in iter_books_by_author(
+            author, url, session, stream=stream
+        )
+        if book["key"] not in exclude
+    )
 
-        subjects = fetch_book_subjects(updated_book["id"], url)
+    if max_workers:
+        yield from enrich_books_concurrently(
+            book_list, url, max_workers, session, edition_batch_size, metrics
+        )
+        return
 
-        isbn_data = fetch_isbn_and_publisher_data(edition_key, url)
+    for batch in batched(book_list, edition_batch_size):
 
-        new_dict = merge_dicts(updated_book, subjects, isbn_data)
+        edition_keys = [get_edition_key(book) for book in batch]
 
-        new_book_list.append(new_dict)
+        isbn_data = fetch_isbn_and_publisher_data_batch(
+            edition_keys, url, session, edition_batch_size
+        )
+
+        for book_data, edition_key in zip(batch, edition_keys):
     
-    return new_book_list
\ No newline at end of file
+            with stage_timer(metrics, "normalise"):
+                book = Book.from_search_doc(book_data)
+
+            book.edition_key = edition_key
+
+            subjects = fetch_book_subjects(book.id, url, session)
+
+            with stage_timer(metrics, "merge"):
+                book.update(subjects)
+
+                if edition_key in isbn_data:
+                    book.update(isbn_data[edition_key])
+
+            yield book
+
+def enrich_books_concurrently(
+    book_list,
+    url,
+    max_workers,
+    session=None,
+    edition_batch_size=EDITION_BATCH_SIZE,
+    metrics=None
+):
+    """
+    Fetches subject, ISBN and publisher data for many books at once.
+
+    Requests for the next batch of books are sent while the results of the
+    previous batch are being consumed.
+
+    Args:
+        book_list (iterable): Book dictionaries from the openlibrary
+            search API.
+        url (str): An openlibrary URL.
+        max_workers (int): The maximum number of requests in flight.
+        session (requests.Session, optional): A session shared by every
+            request.
+        edition_batch_size (int): The number of editions looked up per
+            books API request.
+        metrics (Metrics, optional): Records normalise and merge timings.
+
+    Yields:
+        Book: Enriched records, in the same order as book_list.
+    """
+    pending = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch in batched(book_list, edition_batch_size):
+            edition_keys = [get_edition_key(book) for book in batch]
+            isbn_data = executor.submit(
+                fetch_isbn_and_publisher_data_batch,
+                edition_keys,
+                url,
+                session,
+                edition_batch_size
+            )
+            submitted = []
+
+            for book_data, edition_key in zip(batch, edition_keys):
+                with stage_timer(metrics, "normalise"):
+                    book = Book.from_search_doc(book_data)
+                book.edition_key = edition_key
+                subjects = executor.submit(
+                    fetch_book_subjects, book.id, url, session
+                )
+                submitted.append((book, subjects, edition_key, isbn_data))
+
+            yield from merge_enriched_books(pending, metrics)
+            pending = submitted
+
+        yield from merge_enriched_books(pending, metrics)
+
+def merge_enriched_books(pending, metrics=None):
+    """
+    Waits for a batch's enrichment requests and fills in its records.
+
+    Args:
+        pending (list): Tuples of a Book, its subjects future, its edition
+            key and the batch's ISBN and publisher future.
+        metrics (Metrics, optional): Records merge timings.
+
+    Yields:
+        Book: The filled-in records.
+    """
+    for book, subjects, edition_key, isbn_data in pending:
+        subjects = subjects.result()
+        editions = isbn_data.result()
+        with stage_timer(metrics, "merge"):
+            book.update(subjects)
+            if edition_key in editions:
+                book.update(editions[edition_key])
+        yield book
@@ -0,0 +1,455 @@
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from src.bulk import read_authors
+from src.main import URL
+from src.records import Book
+from src.sinks import NDJSONSink
+from src.utils import (
+    create_session,
+    fetch_book_subjects,
+    fetch_isbn_and_publisher_data,
+    get_edition_key,
+    iter_books_by_author
+)
+
+DEFAULT_VISIBILITY_TIMEOUT = 300
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_LEASE_SIZE = 10
+
+class WorkQueue:
+    """
+    A durable queue of author, work and edition tasks in SQLite.
+
+    Workers lease tasks, run them and mark them done. A leased task that
+    is not completed within its visibility timeout, because its worker
+    died or hung, becomes available to other workers again. Tasks are
+    assigned to shards by a hash of their key, so hosts sharing the
+    database file can split a run without contending for the same tasks.
+    Author tasks, which add the work and edition tasks, can be run by a
+    worker in any shard.
+
+    The database uses SQLite's rollback journal rather than WAL, which
+    needs memory shared by every process and so only works on one host.
+    Hosts sharing the file need a network filesystem with working POSIX
+    file locks.
+
+    Args:
+        path (str): The database file, on storage shared by every worker.
+        shards (int): The number of shards tasks are hashed into. Must be
+            the same for every process using the file.
+    """
+
+    def __init__(self, path, shards=1):
+        self.shards = shards
+        self.connection = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode = DELETE")
+        with self.transaction():
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    shard INTEGER NOT NULL,
+                    payload TEXT,
+                    state TEXT NOT NULL DEFAULT 'ready',
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    PRIMARY KEY (kind, key)
+                )
+                """
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS tasks_by_state "
+                "ON tasks (state, shard, lease_expires)"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Runs a block in a write transaction, taking the lock up front."""
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def shard_for(self, key):
+        """
+        Picks a task's shard.
+
+        Args:
+            key (str): The task key.
+
+        Returns:
+            int: The shard, stable across processes and hosts.
+        """
+        return zlib.crc32(key.encode()) % self.shards
+
+    def put(self, tasks):
+        """
+        Adds tasks. Adding a task that already exists has no effect.
+
+        Args:
+            tasks (iterable): (kind, key, payload) tuples. The payload is
+                any JSON-serialisable value, or None.
+        """
+        with self.transaction():
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO tasks (kind, key, shard, payload) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (kind, key, self.shard_for(key), json.dumps(payload))
+                    for kind, key, payload in tasks
+                ]
+            )
+
+    def lease(
+        self,
+        owner,
+        limit=DEFAULT_LEASE_SIZE,
+        shard=None,
+        visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT,
+        max_attempts=DEFAULT_MAX_ATTEMPTS
+    ):
+        """
+        Takes ready tasks, and tasks whose lease has expired.
+
+        An expired task that has already been leased max_attempts times,
+        because its worker crashed or hung every time, is marked failed
+        instead of being leased again.
+
+        Args:
+            owner (str): Identifies the worker taking the tasks.
+            limit (int): The most tasks to take.
+            shard (int, optional): Only take work and edition tasks from
+                this shard. Author tasks are taken from any shard, since
+                they add tasks to every shard.
+            visibility_timeout (float): Seconds until an unfinished task
+                can be taken by another worker.
+            max_attempts (int): Leases after which an expired task is
+                given up on.
+
+        Returns:
+            list: (kind, key, payload) tuples for the leased tasks.
+        """
+        now = time.time()
+        shard_filter = "" if shard is None else "AND (shard = ? OR kind = 'author')"
+        shard_args = () if shard is None else (shard,)
+
+        with self.transaction():
+            self.connection.execute(
+                "UPDATE tasks SET state = 'failed', "
+                "error = 'Lease expired ' || attempts || ' times', "
+                "owner = NULL, lease_expires = NULL "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, max_attempts)
+            )
+            rows = self.connection.execute(
+                f"""
+                SELECT kind, key, payload FROM tasks
+                WHERE (state = 'ready' OR (state = 'leased' AND lease_expires < ?))
+                {shard_filter}
+                LIMIT ?
+                """,
+                (now, *shard_args, limit)
+            ).fetchall()
+            self.connection.executemany(
+                "UPDATE tasks SET state = 'leased', owner = ?, "
+                "lease_expires = ?, attempts = attempts + 1 "
+                "WHERE kind = ? AND key = ?",
+                [
+                    (owner, now + visibility_timeout, kind, key)
+                    for kind, key, _ in rows
+                ]
+            )
+
+        return [(kind, key, json.loads(payload)) for kind, key, payload in rows]
+
+    def complete(self, owner, kind, key, result=None):
+        """
+        Marks a leased task done and stores its result.
+
+        Args:
+            owner (str): The worker holding the lease.
+            kind (str): The task kind.
+            key (str): The task key.
+            result (object, optional): A JSON-serialisable result.
+
+        Returns:
+            bool: False if the lease had been lost to another worker, in
+                which case the result is discarded.
+        """
+        with self.transaction():
+            cursor = self.connection.execute(
+                "UPDATE tasks SET state = 'done', result = ?, "
+                "owner = NULL, lease_expires = NULL "
+                "WHERE kind = ? AND key = ? AND owner = ? AND state = 'leased'",
+                (json.dumps(result), kind, key, owner)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, owner, kind, key, error, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Returns a leased task to the queue after an error.
+
+        Args:
+            owner (str): The worker holding the lease.
+            kind (str): The task kind.
+            key (str): The task key.
+            error (str): A description of the error.
+            max_attempts (int): Attempts after which the task is marked
+                failed instead of being retried.
+        """
+        with self.transaction():
+            self.connection.execute(
+                "UPDATE tasks SET "
+                "state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'ready' END, "
+                "error = ?, owner = NULL, lease_expires = NULL "
+                "WHERE kind = ? AND key = ? AND owner = ? AND state = 'leased'",
+                (max_attempts, error, kind, key, owner)
+            )
+
+    def counts(self):
+        """
+        Counts tasks by state.
+
+        Returns:
+            dict: The number of ready, leased, done and failed tasks.
+        """
+        counts = {"ready": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(self.connection.execute(
+            "SELECT state, COUNT(*) FROM tasks GROUP BY state"
+        ).fetchall())
+        return counts
+
+    def pending(self, shard=None):
+        """
+        Counts tasks that are ready or leased.
+
+        Args:
+            shard (int, optional): Only count tasks in this shard, plus
+                author tasks in any shard, since those can still add
+                tasks to this one.
+
+        Returns:
+            int: The number of tasks not yet done or failed.
+        """
+        shard_filter = "" if shard is None else "AND (shard = ? OR kind = 'author')"
+        shard_args = () if shard is None else (shard,)
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM tasks "
+            f"WHERE state IN ('ready', 'leased') {shard_filter}",
+            shard_args
+        ).fetchone()[0]
+
+    def result(self, kind, key):
+        """
+        Looks up a finished task's result.
+
+        Args:
+            kind (str): The task kind.
+            key (str): The task key.
+
+        Returns:
+            object: The stored result, or None if the task is not done.
+        """
+        row = self.connection.execute(
+            "SELECT result FROM tasks WHERE kind = ? AND key = ? AND state = 'done'",
+            (kind, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+def run_task(queue, kind, key, payload, url, session=None):
+    """
+    Runs one task, adding any tasks it discovers.
+
+    An author task searches for the author's books and adds a work task
+    for each book and an edition task for each edition. Work and edition
+    tasks fetch subjects and ISBN and publisher data.
+
+    Args:
+        queue (WorkQueue): Where discovered tasks are added.
+        kind (str): "author", "work" or "edition".
+        key (str): The author name, work key or edition key.
+        payload (object): The task payload.
+        url (str): An openlibrary URL.
+        session (requests.Session, optional): A session to send requests
+            with.
+
+    Returns:
+        object: The task result to store.
+    """
+    if kind == "author":
+        tasks = []
+        for book_data in iter_books_by_author(key, url, session):
+            book = Book.from_search_doc(book_data)
+            edition_key = get_edition_key(book_data)
+            tasks.append(("work", book.id, {
+                "record": book.to_dict(), "edition_key": edition_key
+            }))
+            if edition_key:
+                tasks.append(("edition", edition_key, None))
+        queue.put(tasks)
+        return len(tasks)
+    if kind == "work":
+        return fetch_book_subjects(key, url, session)
+    if kind == "edition":
+        return fetch_isbn_and_publisher_data(key, url, session)
+    raise ValueError(f"Unknown task kind: {kind}")
+
+def run_worker(
+    queue,
+    url,
+    owner=None,
+    shard=None,
+    session=None,
+    lease_size=DEFAULT_LEASE_SIZE,
+    visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT,
+    poll_interval=1.0,
+    max_attempts=DEFAULT_MAX_ATTEMPTS
+):
+    """
+    Pulls and runs tasks until the queue has none left to run.
+
+    Any number of workers can run against the same queue, on one host or
+    many. A worker keeps polling while tasks in its shard are leased by
+    others, or author tasks anywhere are unfinished, since an expired
+    lease or a new author's works may still need running.
+
+    Args:
+        queue (WorkQueue): The shared queue.
+        url (str): An openlibrary URL.
+        owner (str, optional): Identifies this worker. Defaults to the
+            host name and process ID.
+        shard (int, optional): Only run tasks from this shard.
+        session (requests.Session, optional): A session to send requests
+            with. A pooled session is created and closed if not provided.
+        lease_size (int): The number of tasks leased at a time.
+        visibility_timeout (float): Seconds a lease lasts.
+        poll_interval (float): Seconds to wait when every task is leased.
+        max_attempts (int): Attempts before a failing task is given up on.
+
+    Returns:
+        int: The number of tasks this worker completed.
+    """
+    if session is None:
+        with create_session() as session:
+            return run_worker(
+                queue,
+                url,
+                owner,
+                shard,
+                session,
+                lease_size,
+                visibility_timeout,
+                poll_interval,
+                max_attempts
+            )
+
+    owner = owner or f"{os.uname().nodename}:{os.getpid()}"
+    completed = 0
+
+    while True:
+        tasks = queue.lease(
+            owner, lease_size, shard, visibility_timeout, max_attempts
+        )
+
+        if not tasks:
+            if not queue.pending(shard):
+                return completed
+            time.sleep(poll_interval)
+            continue
+
+        for kind, key, payload in tasks:
+            try:
+                result = run_task(queue, kind, key, payload, url, session)
+            except Exception as error:
+                queue.fail(owner, kind, key, repr(error), max_attempts)
+            else:
+                completed += queue.complete(owner, kind, key, result)
+
+def iter_queue_records(queue):
+    """
+    Yields the records of every work whose tasks have all finished.
+
+    Args:
+        queue (WorkQueue): The queue the tasks ran in.
+
+    Yields:
+        dict: Pipeline-ready data about a book, as generate_book_data
+            returns it.
+    """
+    rows = queue.connection.execute(
+        """
+        SELECT work.payload, work.result, edition.result
+        FROM tasks AS work
+        LEFT JOIN tasks AS edition
+            ON edition.kind = 'edition'
+            AND edition.key = json_extract(work.payload, '$.edition_key')
+        WHERE work.kind = 'work' AND work.state = 'done'
+        AND (
+            json_extract(work.payload, '$.edition_key') IS NULL
+            OR edition.state = 'done'
+        )
+        ORDER BY work.rowid
+        """
+    )
+
+    for payload, subjects, edition in rows:
+        book = Book(**json.loads(payload)["record"])
+        book.update(json.loads(subjects))
+        if edition is not None:
+            book.update(json.loads(edition))
+        yield book.to_dict()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Split an ingestion run between workers with a shared queue."
+    )
+    parser.add_argument("queue", help="the queue database, on shared storage")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--add-authors", help="queue the authors in this file")
+    parser.add_argument("--work", action="store_true", help="run a worker")
+    parser.add_argument("--shard", type=int, default=None)
+    parser.add_argument("--export", help="write finished records to this file")
+    parser.add_argument("--url", default=URL)
+    args = parser.parse_args()
+
+    with WorkQueue(args.queue, args.shards) as queue:
+        if args.add_authors:
+            queue.put(
+                ("author", author, None)
+                for author in read_authors(args.add_authors)
+            )
+        if args.work:
+            completed = run_worker(queue, args.url, shard=args.shard)
+            print(f"Completed {completed} tasks")
+        if args.export:
+            with NDJSONSink(args.export) as sink:
+                for record in iter_queue_records(queue):
+                    sink.write(record)
+        print(queue.counts())
+
+if __name__ == "__main__":
+    main()
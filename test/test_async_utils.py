@@ -0,0 +1,227 @@
+from bench.fake_server import FakeOpenLibrary
+from src import async_utils
+from src.utils import generate_book_data
+import asyncio
+import pytest
+import threading
+import time
+from unittest.mock import patch, Mock
+import requests
+
+
+class FakeAsyncClient:
+    """An async client that serves canned responses and counts requests."""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.urls = []
+
+    async def get(self, url):
+        self.urls.append(url)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        response = Mock()
+        response.json.return_value = self.routes[url.split("?")[0]]
+        return response
+
+
+@pytest.fixture
+def fake_client():
+    """Creates a client serving one search page with three books."""
+    routes = {
+        "url/search.json": {
+            "docs": [
+                {
+                    "key": f"/works/OL{i}W",
+                    "title": f"Book {i}",
+                    "edition_count": i,
+                    "cover_edition_key": f"OL{i}M"
+                }
+                for i in range(3)
+            ]
+        }
+    }
+    routes["url/api/books"] = {}
+    for i in range(3):
+        routes[f"url/works/OL{i}W.json"] = {"subjects": [f"Subject {i}"]}
+        routes[f"url/books/OL{i}M.json"] = {
+            "publishers": [f"Publisher {i}"],
+            "isbn_13": [f"978{i}"]
+        }
+        routes["url/api/books"][f"OLID:OL{i}M"] = {
+            "details": routes[f"url/books/OL{i}M.json"]
+        }
+    yield FakeAsyncClient(routes)
+
+
+class TestAsyncFetchFunctions:
+    """Tests for the async fetch functions."""
+
+    def test_fetch_book_subjects(self, fake_client):
+        """Checks that subjects are extracted from the work."""
+        result = asyncio.run(
+            async_utils.fetch_book_subjects("/works/OL1W", "url", fake_client)
+        )
+
+        assert result == {"subjects": ["Subject 1"]}
+
+    def test_fetch_isbn_and_publisher_data(self, fake_client):
+        """Checks that ISBNs and publishers are extracted from the edition."""
+        result = asyncio.run(
+            async_utils.fetch_isbn_and_publisher_data("OL2M", "url", fake_client)
+        )
+
+        assert result == {
+            "publisher": ["Publisher 2"],
+            "isbn": {"isbn_10": [], "isbn_13": ["9782"]}
+        }
+
+    def test_uses_requests_without_client(self):
+        """Checks that requests is used in a thread if no client is given."""
+        with patch("requests.get") as mock_get:
+            mock_get.return_value.json.return_value = {"docs": [{"key": "a"}]}
+
+            result = asyncio.run(async_utils.fetch_books_by_author("name", "url"))
+
+        assert result == [{"key": "a"}]
+        mock_get.assert_called_once_with(
+            "url/search.json?author=name&page=1&limit=100&fields="
+            "key%2Ctitle%2Cauthor_name%2Cfirst_publish_year%2Cedition_count"
+            "%2Clanguage%2Ccover_edition_key%2Clending_edition_s"
+        )
+        mock_get.return_value.raise_for_status.assert_called_once()
+
+    def test_errors_raised(self):
+        """Checks that HTTP errors are raised."""
+        with patch("requests.get") as mock_get:
+            mock_get.return_value.raise_for_status.side_effect = (
+                requests.exceptions.HTTPError("404 Client Error")
+            )
+
+            with pytest.raises(requests.exceptions.HTTPError):
+                asyncio.run(async_utils.fetch_book_subjects("/works/x", "url"))
+
+
+class TestAsyncGenerateBookData:
+    """Tests for the async generate_book_data function."""
+
+    def test_returns_books_in_search_order(self, fake_client):
+        """Checks that merged books are returned in search order."""
+        result = asyncio.run(
+            async_utils.generate_book_data("name", "url", fake_client)
+        )
+
+        assert [book["id"] for book in result] == [
+            "/works/OL0W", "/works/OL1W", "/works/OL2W"
+        ]
+        assert result[1] == {
+            "id": "/works/OL1W",
+            "title": "Book 1",
+            "author_name": [],
+            "first_publish_year": [],
+            "edition_count": 1,
+            "language": [],
+            "subjects": ["Subject 1"],
+            "publisher": ["Publisher 1"],
+            "isbn": {"isbn_10": [], "isbn_13": ["9781"]}
+        }
+        assert len(fake_client.urls) == 5
+
+    def test_batches_edition_lookups(self, fake_client):
+        """Checks that every edition is looked up in one request."""
+        asyncio.run(async_utils.generate_book_data("name", "url", fake_client))
+
+        edition_urls = [url for url in fake_client.urls if "/api/books" in url]
+        assert edition_urls == [
+            "url/api/books?bibkeys=OLID%3AOL0M%2COLID%3AOL1M%2COLID%3AOL2M"
+            "&format=json&jscmd=details"
+        ]
+
+    def test_book_without_edition(self, fake_client):
+        """Checks that a book without an edition gets empty data."""
+        docs = fake_client.routes["url/search.json"]["docs"]
+        del docs[1]["cover_edition_key"]
+
+        result = asyncio.run(
+            async_utils.generate_book_data("name", "url", fake_client)
+        )
+
+        assert result[1]["publisher"] == []
+        assert result[1]["isbn"] == {"isbn_10": [], "isbn_13": []}
+        assert result[2]["publisher"] == ["Publisher 2"]
+        assert not any("None" in url for url in fake_client.urls)
+
+    def test_enrich_book_without_edition(self, fake_client):
+        """Checks that enrich_book makes no edition request without a key."""
+        result = asyncio.run(
+            async_utils.enrich_book(
+                {"key": "/works/OL1W", "title": "Book 1", "edition_count": 1},
+                "url",
+                fake_client
+            )
+        )
+
+        assert result["subjects"] == ["Subject 1"]
+        assert result["publisher"] == []
+        assert fake_client.urls == ["url/works/OL1W.json"]
+
+    def test_fetches_concurrently(self, fake_client):
+        """Checks that enrichment requests overlap."""
+        asyncio.run(async_utils.generate_book_data("name", "url", fake_client))
+
+        assert fake_client.max_in_flight == 4
+
+    def test_respects_concurrency_limit(self, fake_client):
+        """Checks that no more than the limit are in flight at once."""
+        asyncio.run(
+            async_utils.generate_book_data(
+                "name", "url", fake_client, concurrency=2
+            )
+        )
+
+        assert fake_client.max_in_flight == 2
+
+
+class TestSessionClient:
+    """Tests for the SessionClient class."""
+
+    def test_runs_up_to_max_workers_at_once(self):
+        """Checks that requests in flight are not capped by the default executor."""
+        session = Mock()
+        lock = threading.Lock()
+        counts = {"in_flight": 0, "max_in_flight": 0}
+
+        def get(url):
+            with lock:
+                counts["in_flight"] += 1
+                counts["max_in_flight"] = max(
+                    counts["max_in_flight"], counts["in_flight"]
+                )
+            time.sleep(0.2)
+            with lock:
+                counts["in_flight"] -= 1
+
+        session.get.side_effect = get
+        client = async_utils.SessionClient(session, max_workers=64)
+
+        async def run():
+            await asyncio.gather(*(client.get("url") for _ in range(64)))
+
+        asyncio.run(run())
+        client.close()
+
+        assert counts["max_in_flight"] == 64
+        session.close.assert_not_called()
+
+    def test_default_client_matches_sync_pipeline(self):
+        """Checks that generate_book_data works without a client."""
+        with FakeOpenLibrary(num_books=5, payload_size=1) as server:
+            result = asyncio.run(
+                async_utils.generate_book_data("Author", server.url)
+            )
+
+            assert result == generate_book_data("Author", server.url)
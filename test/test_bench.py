@@ -0,0 +1,131 @@
+from bench.fake_server import FakeOpenLibrary, FakeOpenLibraryProcess
+from bench.run_benchmarks import MODES, run_benchmark, percentile, save_results
+from src.utils import generate_book_data
+import json
+import pytest
+import requests
+
+
+@pytest.fixture
+def server():
+    """Starts a fake openlibrary server with no added latency."""
+    with FakeOpenLibrary(num_books=7, payload_size=2) as server:
+        yield server
+
+
+class TestFakeOpenLibrary:
+    """Tests for the FakeOpenLibrary server."""
+
+    def test_serves_the_pipeline(self, server):
+        """Checks that generate_book_data runs end to end against it."""
+        result = generate_book_data("Author", server.url, max_workers=4)
+
+        assert len(result) == 7
+        assert result[3] == {
+            "id": "/works/OL3W",
+            "title": "Book 3",
+            "author_name": ["Author"],
+            "first_publish_year": 1903,
+            "edition_count": 4,
+            "language": ["eng"],
+            "subjects": ["Subject 0", "Subject 1"],
+            "publisher": ["Fake Press"],
+            "isbn": result[3]["isbn"]
+        }
+
+    def test_paginates_search(self, server):
+        """Checks that search results are split into pages."""
+        response = requests.get(
+            f"{server.url}/search.json", params={"page": 2, "limit": 5}
+        )
+
+        assert [doc["key"] for doc in response.json()["docs"]] == [
+            "/works/OL5W", "/works/OL6W"
+        ]
+
+    def test_injects_errors(self):
+        """Checks that the error rate produces 503 responses."""
+        with FakeOpenLibrary(error_rate=1) as server:
+            response = requests.get(f"{server.url}/works/OL1W.json")
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "0"
+
+    def test_runs_in_a_separate_process(self):
+        """Checks that the process server serves the pipeline and stops."""
+        with FakeOpenLibraryProcess(num_books=7, payload_size=2) as server:
+            result = run_benchmark("threaded", server, workers=4)
+
+        assert result["records"] == 7
+        assert server.process.returncode == 0
+
+
+class TestRunBenchmark:
+    """Tests for the benchmark runner."""
+
+    @pytest.mark.parametrize("mode", list(MODES))
+    def test_reports_throughput_latency_and_memory(self, server, mode):
+        """Checks that every mode reports its measurements."""
+        result = run_benchmark(mode, server, workers=4)
+
+        assert result["mode"] == mode
+        assert result["records"] == 7
+        assert result["records_per_second"] > 0
+        assert result["requests"] > 0
+        assert 0 < result["p50_ms"] <= result["p99_ms"]
+        assert result["peak_memory_bytes"] > 0
+
+    @pytest.mark.parametrize("mode", list(MODES))
+    def test_retries_injected_errors(self, mode):
+        """Checks that every mode finishes when the server injects errors."""
+        with FakeOpenLibrary(
+            num_books=7, payload_size=2, error_rate=0.2, seed=1
+        ) as server:
+            result = run_benchmark(mode, server, workers=4)
+
+        assert result["records"] == 7
+        assert result["errors"] > 0
+
+    def test_percentile(self):
+        """Checks nearest-rank percentiles."""
+        values = list(range(1, 101))
+
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([], 50) == 0
+
+    def test_save_results_compares_with_previous_run(self, tmp_path):
+        """Checks that throughput changes since the last run are reported."""
+        first = {"version": "a", "results": [
+            {"mode": "serial", "records_per_second": 10}
+        ]}
+        second = {"version": "b", "results": [
+            {"mode": "serial", "records_per_second": 8}
+        ]}
+
+        assert save_results(first, str(tmp_path / "results")) == {}
+        changes = save_results(second, str(tmp_path / "results"))
+
+        assert changes == {"serial": -0.2}
+        saved = sorted((tmp_path / "results").iterdir())
+        assert json.loads(saved[-1].read_text())["version"] == "b"
+
+    def test_save_results_compares_matching_settings(self, tmp_path):
+        """Checks that runs with other settings or errors are not compared."""
+        directory = str(tmp_path / "results")
+        slow = {"books": 200, "latency": 0.02}
+        fast = {"books": 200, "latency": 0}
+
+        save_results({"version": "a", "settings": slow, "results": [
+            {"mode": "serial", "records_per_second": 10},
+            {"mode": "async", "records_per_second": 10}
+        ]}, directory)
+        save_results({"version": "b", "settings": fast, "results": [
+            {"mode": "serial", "records_per_second": 100}
+        ]}, directory)
+        changes = save_results({"version": "c", "settings": slow, "results": [
+            {"mode": "serial", "records_per_second": 12},
+            {"mode": "async", "error": "HTTPError: 503"}
+        ]}, directory)
+
+        assert changes == {"serial": 0.2}
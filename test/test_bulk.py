@@ -0,0 +1,171 @@
+from bench.fake_server import FakeOpenLibrary
+from src.bulk import ClaimedKeys, iter_bulk_book_data, main, read_authors, run_bulk
+from src.sinks import NDJSONSink, read_ndjson
+import pytest
+from unittest.mock import patch
+
+
+@pytest.fixture
+def server():
+    """Starts a fake openlibrary server whose authors share every work."""
+    with FakeOpenLibrary(num_books=6, payload_size=1) as server:
+        yield server
+
+
+class TestReadAuthors:
+    """Tests for the read_authors function."""
+
+    def test_skips_blanks_comments_and_repeats(self, tmp_path):
+        """Checks that only distinct names are read, in order."""
+        path = tmp_path / "authors.txt"
+        path.write_text("# authors\nB\n\n  A  \nB\nC\n")
+
+        assert read_authors(str(path)) == ["B", "A", "C"]
+
+
+class TestClaimedKeys:
+    """Tests for the ClaimedKeys container."""
+
+    def test_first_check_claims_the_key(self, tmp_path):
+        """Checks that a key is only unclaimed the first time."""
+        path = str(tmp_path / "claims.db")
+        first = ClaimedKeys(path)
+        second = ClaimedKeys(path)
+
+        assert "/works/OL1W" not in first
+        assert "/works/OL1W" in second
+        assert "/works/OL1W" in first
+        assert "/works/OL2W" not in second
+
+    def test_release_drops_pending_claims(self, tmp_path):
+        """Checks that only pending claims of the owner are released."""
+        path = str(tmp_path / "claims.db")
+        claims = ClaimedKeys(path, owner="A")
+        other = ClaimedKeys(path, owner="B")
+
+        assert "/works/OL1W" not in claims
+        assert "/works/OL2W" not in claims
+        assert "/works/OL3W" not in other
+        claims.mark_done(["/works/OL1W"])
+        claims.release("A")
+
+        assert "/works/OL1W" in other
+        assert "/works/OL2W" not in other
+        assert "/works/OL3W" in claims
+
+
+class TestIterBulkBookData:
+    """Tests for the iter_bulk_book_data generator."""
+
+    def test_enriches_shared_works_once(self, server):
+        """Checks that works shared by several authors are yielded once."""
+        records = list(iter_bulk_book_data(
+            ["A", "B", "C", "D"], server.url, processes=2, max_workers=2
+        ))
+
+        assert sorted(record["id"] for record in records) == [
+            f"/works/OL{i}W" for i in range(6)
+        ]
+
+    def test_reused_claims_skip_finished_works(self, server, tmp_path):
+        """Checks that a claims database carries over between runs."""
+        claims = str(tmp_path / "claims.db")
+
+        first = list(iter_bulk_book_data(
+            ["A"], server.url, processes=1, claims_path=claims
+        ))
+        second = list(iter_bulk_book_data(
+            ["B"], server.url, processes=1, claims_path=claims
+        ))
+
+        assert len(first) == 6
+        assert second == []
+
+    def test_failed_author_releases_its_claims(self, server, tmp_path):
+        """Checks that a failed author is recorded and retried on rerun."""
+        claims = str(tmp_path / "claims.db")
+        server.failing_paths = {"/works/OL3W.json"}
+        failures = {}
+
+        first = list(iter_bulk_book_data(
+            ["A"], server.url, processes=1, claims_path=claims,
+            failures=failures
+        ))
+        server.failing_paths = set()
+        second = list(iter_bulk_book_data(
+            ["A"], server.url, processes=1, claims_path=claims
+        ))
+
+        assert first == []
+        assert list(failures) == ["A"]
+        assert len(second) == 6
+
+    def test_keeps_going_after_a_failure(self, server):
+        """Checks that one failing author does not stop the others."""
+        server.failing_paths = {"/search.json"}
+        failures = {}
+
+        records = list(iter_bulk_book_data(
+            ["A", "B"], server.url, processes=2, failures=failures
+        ))
+
+        assert records == []
+        assert sorted(failures) == ["A", "B"]
+
+    def test_only_taken_records_keep_their_claims(self, server, tmp_path):
+        """Checks that only records the consumer moved past stay claimed."""
+        claims = str(tmp_path / "claims.db")
+
+        records = iter_bulk_book_data(
+            ["A"], server.url, processes=1, claims_path=claims
+        )
+        taken = [next(records), next(records)]
+        records.close()
+        rest = list(iter_bulk_book_data(
+            ["A"], server.url, processes=1, claims_path=claims
+        ))
+
+        assert [record["id"] for record in taken] == ["/works/OL0W", "/works/OL1W"]
+        assert [record["id"] for record in rest] == [
+            f"/works/OL{i}W" for i in range(1, 6)
+        ]
+
+    def test_handles_no_authors(self, server):
+        """Checks that an empty author list yields nothing."""
+        assert list(iter_bulk_book_data([], server.url, processes=1)) == []
+
+
+class TestRunBulk:
+    """Tests for the run_bulk function."""
+
+    def test_writes_one_merged_stream(self, server, tmp_path):
+        """Checks that every author's records end up in one file."""
+        path = str(tmp_path / "books.ndjson.gz")
+
+        with NDJSONSink(path) as sink:
+            written = run_bulk(["A", "B"], sink, server.url, processes=2)
+
+        assert written == 6
+        assert len(list(read_ndjson(path))) == 6
+
+
+class TestMain:
+    """Tests for the command line entry point."""
+
+    def test_rerun_with_claims_keeps_output(self, server, tmp_path):
+        """Checks that rerunning with the same claims appends, not truncates."""
+        authors = tmp_path / "authors.txt"
+        authors.write_text("A\nB\n")
+        output = str(tmp_path / "books.ndjson")
+        argv = [
+            "bulk", str(authors), output,
+            "--url", server.url,
+            "--processes", "1",
+            "--claims", str(tmp_path / "claims.db")
+        ]
+
+        with patch("sys.argv", argv):
+            main()
+            main()
+
+        assert len(list(read_ndjson(output))) == 6
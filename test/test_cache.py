@@ -0,0 +1,157 @@
+from src.cache import DAY, ResponseCache, CachedSession, build_response
+from src.utils import fetch_book_subjects
+import json
+import pytest
+from unittest.mock import Mock
+
+
+def make_response(status_code=200, body=None, headers=None):
+    """Creates a fake network response."""
+    response = Mock()
+    response.status_code = status_code
+    response.content = json.dumps(body or {}).encode()
+    response.headers = headers or {}
+    response.json.return_value = body
+    return response
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Creates a cache backed by a temporary database file."""
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def session():
+    """Creates a session returning a work with validators."""
+    session = Mock()
+    session.get.return_value = make_response(
+        body={"subjects": ["Fiction"]},
+        headers={"ETag": '"abc"', "Last-Modified": "Tue, 01 Jul 2025 00:00:00 GMT"}
+    )
+    yield session
+
+
+class TestResponseCache:
+    """Tests for the ResponseCache class."""
+
+    def test_returns_none_for_unknown_url(self, cache):
+        """Checks that a miss returns None."""
+        assert cache.get("url/works/OL1W.json") is None
+
+    def test_stores_body_and_validators(self, cache):
+        """Checks that stored entries can be read back."""
+        cache.put("url/works/OL1W.json", b"{}", '"abc"', "yesterday")
+
+        entry = cache.get("url/works/OL1W.json")
+
+        assert entry["body"] == b"{}"
+        assert entry["etag"] == '"abc"'
+        assert entry["last_modified"] == "yesterday"
+
+    def test_persists_between_connections(self, tmp_path):
+        """Checks that entries survive reopening the database."""
+        path = str(tmp_path / "cache.db")
+        cache = ResponseCache(path)
+        cache.put("url/books/OL1M.json", b"{}")
+        cache.close()
+
+        reopened = ResponseCache(path)
+
+        assert reopened.get("url/books/OL1M.json")["body"] == b"{}"
+        reopened.close()
+
+
+class TestCachedSession:
+    """Tests for the CachedSession class."""
+
+    def test_serves_fresh_entries_from_cache(self, cache, session):
+        """Checks that a second request does not reach the network."""
+        cached_session = CachedSession(cache, session)
+
+        first = fetch_book_subjects("/works/OL1W", "url", cached_session)
+        second = fetch_book_subjects("/works/OL1W", "url", cached_session)
+
+        assert first == second == {"subjects": ["Fiction"]}
+        session.get.assert_called_once()
+        assert cached_session.stats == {"hits": 1, "misses": 1, "revalidated": 0}
+
+    def test_keys_on_query_parameters(self, cache, session):
+        """Checks that different parameters are cached separately."""
+        cached_session = CachedSession(cache, session)
+
+        cached_session.get("url/search.json", params={"page": 1})
+        cached_session.get("url/search.json", params={"page": 2})
+
+        assert session.get.call_count == 2
+        assert cache.get("url/search.json?page=2") is not None
+
+    def test_revalidates_stale_entries(self, cache, session):
+        """Checks that stale entries send validators and reuse 304s."""
+        cached_session = CachedSession(cache, session, ttls={"/works/": 0})
+        cached_session.get("url/works/OL1W.json")
+        session.get.return_value = make_response(status_code=304)
+
+        response = cached_session.get("url/works/OL1W.json")
+
+        assert response.json() == {"subjects": ["Fiction"]}
+        assert response.from_cache
+        assert session.get.call_args.kwargs["headers"] == {
+            "If-None-Match": '"abc"',
+            "If-Modified-Since": "Tue, 01 Jul 2025 00:00:00 GMT"
+        }
+        assert cached_session.stats["revalidated"] == 1
+
+    def test_replaces_changed_entries(self, cache, session):
+        """Checks that a changed response replaces the cached body."""
+        cached_session = CachedSession(cache, session, ttls={"/works/": 0})
+        cached_session.get("url/works/OL1W.json")
+        session.get.return_value = make_response(body={"subjects": ["Poetry"]})
+
+        cached_session.get("url/works/OL1W.json")
+
+        assert json.loads(cache.get("url/works/OL1W.json")["body"]) == {
+            "subjects": ["Poetry"]
+        }
+        assert cached_session.stats["misses"] == 2
+
+    def test_does_not_cache_errors(self, cache, session):
+        """Checks that failed responses are not stored."""
+        session.get.return_value = make_response(status_code=500)
+        cached_session = CachedSession(cache, session)
+
+        cached_session.get("url/works/OL1W.json")
+
+        assert cache.get("url/works/OL1W.json") is None
+
+    def test_uses_endpoint_ttls(self, cache):
+        """Checks that TTLs are matched by URL fragment."""
+        cached_session = CachedSession(
+            cache, ttls={"/search.json": 10, "/books/": 20}, default_ttl=5
+        )
+
+        assert cached_session.ttl_for("url/search.json?author=a") == 10
+        assert cached_session.ttl_for("url/books/OL1M.json") == 20
+        assert cached_session.ttl_for("url/authors/OL1A.json") == 5
+
+    def test_batched_editions_use_the_edition_ttl(self, cache):
+        """Checks that books API batches are cached as long as editions."""
+        cached_session = CachedSession(cache)
+
+        assert cached_session.ttl_for(
+            "url/api/books?bibkeys=OLID%3AOL1M&format=json&jscmd=details"
+        ) == cached_session.ttl_for("url/books/OL1M.json") == 7 * DAY
+
+
+class TestBuildResponse:
+    """Tests for the build_response function."""
+
+    def test_builds_successful_response(self):
+        """Checks that a cached body behaves like a live response."""
+        response = build_response("url", b'{"docs": []}')
+
+        response.raise_for_status()
+        assert response.json() == {"docs": []}
+        assert b"".join(response.iter_content(4)) == b'{"docs": []}'
@@ -0,0 +1,184 @@
+from src.checkpoint import Checkpoint, run_checkpointed
+from src.sinks import NDJSONSink, read_ndjson
+import pytest
+from unittest.mock import Mock
+
+
+@pytest.fixture
+def session():
+    """Creates a session serving two authors with three books each."""
+    def get(url, params=None, **kwargs):
+        response = Mock()
+        if url.endswith("/search.json"):
+            author = params["author"]
+            response.json.return_value = {"docs": [
+                {
+                    "key": f"/works/{author}{i}W",
+                    "title": f"{author} {i}",
+                    "edition_count": 1,
+                    "cover_edition_key": f"{author}{i}M"
+                }
+                for i in range(3)
+            ]}
+        elif "/works/" in url:
+            response.json.return_value = {"subjects": ["Fiction"]}
+        else:
+            response.json.return_value = {
+                bibkey: {"details": {"publishers": ["Virago"]}}
+                for bibkey in params["bibkeys"].split(",")
+            }
+        return response
+
+    session = Mock()
+    session.get.side_effect = get
+    yield session
+
+
+def work_requests(session):
+    """Lists the work URLs a session was asked for."""
+    return [
+        call.args[0] for call in session.get.call_args_list
+        if "/works/" in call.args[0]
+    ]
+
+
+class FailingSink(NDJSONSink):
+    """An NDJSON sink that crashes, losing any buffered records."""
+
+    def __init__(self, path, fail_after):
+        super().__init__(path)
+        self.fail_after = fail_after
+
+    def write(self, record):
+        if self.count == self.fail_after:
+            raise RuntimeError("Crashed")
+        super().write(record)
+
+
+class TestCheckpoint:
+    """Tests for the Checkpoint class."""
+
+    def test_marks_keys_done(self, tmp_path):
+        """Checks that marked keys are reported as done."""
+        with Checkpoint(str(tmp_path / "checkpoint.db")) as checkpoint:
+            checkpoint.mark_done([("work", "/works/OL1W", "Atwood")])
+
+            assert checkpoint.is_done("work", "/works/OL1W")
+            assert not checkpoint.is_done("edition", "/works/OL1W")
+            assert "/works/OL1W" in checkpoint.done("work")
+            assert checkpoint.parent("work", "/works/OL1W") == "Atwood"
+
+    def test_marking_is_idempotent(self, tmp_path):
+        """Checks that marking a key twice keeps one entry."""
+        with Checkpoint(str(tmp_path / "checkpoint.db")) as checkpoint:
+            checkpoint.mark_done([("author", "Atwood", None)])
+            checkpoint.mark_done([("author", "Atwood", None)])
+
+            count = checkpoint.connection.execute(
+                "SELECT COUNT(*) FROM done"
+            ).fetchone()[0]
+
+        assert count == 1
+
+    def test_lists_children(self, tmp_path):
+        """Checks that keys can be looked up by their parent."""
+        with Checkpoint(str(tmp_path / "checkpoint.db")) as checkpoint:
+            checkpoint.mark_done([
+                ("edition", "OL1M", "/works/OL1W"),
+                ("edition", "OL2M", "/works/OL2W")
+            ])
+
+            assert checkpoint.children("edition", "/works/OL1W") == ["OL1M"]
+            assert checkpoint.children("work", "/works/OL1W") == []
+
+    def test_stores_marks(self, tmp_path):
+        """Checks that marks persist and can be moved forward."""
+        path = str(tmp_path / "checkpoint.db")
+
+        with Checkpoint(path) as checkpoint:
+            assert checkpoint.mark("feed") is None
+            checkpoint.set_mark("feed", "2024-01-01")
+            checkpoint.set_mark("feed", "2024-01-02")
+
+        with Checkpoint(path) as checkpoint:
+            assert checkpoint.mark("feed") == "2024-01-02"
+
+
+class TestRunCheckpointed:
+    """Tests for the run_checkpointed function."""
+
+    def test_writes_every_author(self, tmp_path, session):
+        """Checks that all books are written and marked done."""
+        path = str(tmp_path / "books.ndjson")
+
+        with Checkpoint(str(tmp_path / "checkpoint.db")) as checkpoint:
+            with NDJSONSink(path) as sink:
+                written = run_checkpointed(
+                    ["A", "B"], "url", sink, checkpoint, session=session
+                )
+
+            assert checkpoint.is_done("author", "B")
+            assert checkpoint.parent("edition", "A1M") == "/works/A1W"
+
+        assert written == 6
+        assert len(list(read_ndjson(path))) == 6
+
+    def test_resumes_after_crash(self, tmp_path, session):
+        """Checks that a restarted run skips persisted work."""
+        checkpoint_path = str(tmp_path / "checkpoint.db")
+        path = str(tmp_path / "books.ndjson")
+
+        with Checkpoint(checkpoint_path) as checkpoint:
+            sink = FailingSink(path, fail_after=4)
+            with pytest.raises(RuntimeError):
+                run_checkpointed(
+                    ["A", "B"], "url", sink, checkpoint,
+                    interval=2, session=session
+                )
+
+        first_run = [record["id"] for record in read_ndjson(path)]
+        session.get.reset_mock()
+
+        with Checkpoint(checkpoint_path) as checkpoint:
+            with NDJSONSink(path, append=True) as sink:
+                run_checkpointed(
+                    ["A", "B"], "url", sink, checkpoint,
+                    interval=2, session=session
+                )
+
+        assert first_run == ["/works/A0W", "/works/A1W", "/works/A2W"]
+        assert [record["id"] for record in read_ndjson(path)] == [
+            "/works/A0W", "/works/A1W", "/works/A2W",
+            "/works/B0W", "/works/B1W", "/works/B2W"
+        ]
+        assert work_requests(session) == [
+            "url/works/B0W.json", "url/works/B1W.json", "url/works/B2W.json"
+        ]
+
+    def test_refuses_to_resume_into_replaced_output(self, tmp_path, session):
+        """Checks that resuming into a truncating sink is an error."""
+        path = str(tmp_path / "books.ndjson")
+
+        with Checkpoint(str(tmp_path / "checkpoint.db")) as checkpoint:
+            with NDJSONSink(path) as sink:
+                run_checkpointed(["A"], "url", sink, checkpoint, session=session)
+
+            with NDJSONSink(path) as sink:
+                with pytest.raises(ValueError):
+                    run_checkpointed(
+                        ["A", "B"], "url", sink, checkpoint, session=session
+                    )
+
+    def test_finished_run_fetches_nothing(self, tmp_path, session):
+        """Checks that rerunning a finished run makes no requests."""
+        with Checkpoint(str(tmp_path / "checkpoint.db")) as checkpoint:
+            with NDJSONSink(str(tmp_path / "books.ndjson"), append=True) as sink:
+                run_checkpointed(["A"], "url", sink, checkpoint, session=session)
+                session.get.reset_mock()
+
+                written = run_checkpointed(
+                    ["A"], "url", sink, checkpoint, session=session
+                )
+
+        assert written == 0
+        session.get.assert_not_called()
@@ -0,0 +1,302 @@
+from bench.fake_server import FakeOpenLibrary
+from src.coalesce import CoalescingSession
+from src.metrics import InstrumentedSession, Metrics
+from src.utils import (
+    create_session,
+    fetch_book_subjects,
+    fetch_isbn_and_publisher_data_batch,
+    generate_book_data
+)
+from concurrent.futures import ThreadPoolExecutor
+import json
+import pytest
+import threading
+import time
+import requests
+from unittest.mock import Mock, patch
+
+
+def make_response(status_code, body):
+    """Creates a real response with a JSON body."""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode()
+    return response
+
+
+@pytest.fixture
+def slow_session():
+    """Creates a session whose requests wait until released."""
+    session = Mock()
+    session.release = threading.Event()
+
+    def get(url, params=None, **kwargs):
+        session.release.wait(5)
+        return make_response(200, {"subjects": [url]})
+
+    session.get.side_effect = get
+    return session
+
+
+class TestCoalescingSession:
+    """Tests for the CoalescingSession class."""
+
+    def test_concurrent_requests_share_one_fetch(self, slow_session):
+        """Checks that identical in-flight requests reach the network once."""
+        coalescing = CoalescingSession(slow_session)
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [
+                executor.submit(fetch_book_subjects, "/works/OL1W", "url", coalescing)
+                for _ in range(5)
+            ]
+            while coalescing.stats["coalesced"] < 4:
+                time.sleep(0.001)
+            slow_session.release.set()
+            results = [future.result() for future in futures]
+
+        assert slow_session.get.call_count == 1
+        assert results == [{"subjects": ["url/works/OL1W.json"]}] * 5
+        assert coalescing.stats == {"hits": 0, "coalesced": 4, "misses": 1}
+
+    def test_decodes_shared_response_once(self, slow_session):
+        """Checks that callers share one decoded body."""
+        slow_session.release.set()
+        coalescing = CoalescingSession(slow_session)
+
+        first = coalescing.get("url/works/OL1W.json").json()
+        second = coalescing.get("url/works/OL1W.json").json()
+
+        assert first is second
+        assert coalescing.stats["hits"] == 1
+
+    def test_evicts_least_recently_used(self, slow_session):
+        """Checks that the LRU keeps at most max_entries responses."""
+        slow_session.release.set()
+        coalescing = CoalescingSession(slow_session, max_entries=2)
+
+        for key in ("OL1W", "OL2W", "OL1W", "OL3W", "OL1W", "OL2W"):
+            coalescing.get(f"url/works/{key}.json")
+
+        assert [call.args[0] for call in slow_session.get.call_args_list] == [
+            "url/works/OL1W.json",
+            "url/works/OL2W.json",
+            "url/works/OL3W.json",
+            "url/works/OL2W.json"
+        ]
+
+    def test_expires_resolved_responses(self, slow_session):
+        """Checks that responses older than the ttl are fetched again."""
+        slow_session.release.set()
+        coalescing = CoalescingSession(slow_session, ttl=60)
+
+        with patch("time.monotonic", return_value=1000):
+            coalescing.get("url/works/OL1W.json")
+            coalescing.get("url/works/OL1W.json")
+        with patch("time.monotonic", return_value=1060):
+            coalescing.get("url/works/OL1W.json")
+
+        assert slow_session.get.call_count == 2
+        assert coalescing.stats == {"hits": 1, "coalesced": 0, "misses": 2}
+
+    def test_does_not_keep_failures(self):
+        """Checks that error responses are fetched again next time."""
+        session = Mock()
+        session.get.return_value = make_response(503, {})
+        coalescing = CoalescingSession(session)
+
+        coalescing.get("url/books/OL1M.json")
+        coalescing.get("url/books/OL1M.json")
+
+        assert session.get.call_count == 2
+
+    def test_shares_exceptions_with_waiters(self, slow_session):
+        """Checks that every waiting caller sees the leader's error."""
+        def get(url, params=None, **kwargs):
+            slow_session.release.wait(5)
+            raise requests.ConnectionError
+
+        slow_session.get.side_effect = get
+        coalescing = CoalescingSession(slow_session)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(coalescing.get, "url/works/OL1W.json")
+                for _ in range(3)
+            ]
+            while coalescing.stats["coalesced"] < 2:
+                time.sleep(0.001)
+            slow_session.release.set()
+
+            for future in futures:
+                with pytest.raises(requests.ConnectionError):
+                    future.result()
+
+        assert slow_session.get.call_count == 1
+        assert coalescing.in_flight == {}
+
+    def test_passes_other_requests_through(self, slow_session):
+        """Checks that search and streamed requests are not coalesced."""
+        slow_session.release.set()
+        coalescing = CoalescingSession(slow_session)
+
+        coalescing.get("url/search.json", params={"author": "a"})
+        coalescing.get("url/search.json", params={"author": "a"})
+        coalescing.get("url/works/OL1W.json", stream=True)
+        coalescing.get("url/works/OL1W.json", stream=True)
+
+        assert slow_session.get.call_count == 4
+        assert coalescing.stats == {"hits": 0, "coalesced": 0, "misses": 0}
+
+    def test_repeated_runs_skip_the_network(self):
+        """Checks that a second author run reuses resolved works and editions."""
+        with FakeOpenLibrary(num_books=5, payload_size=1) as server, \
+                create_session() as session:
+            coalescing = CoalescingSession(session)
+            first = generate_book_data("Author", server.url, 4, coalescing)
+            requests_after_first = server.request_count
+            second = generate_book_data("Author", server.url, 4, coalescing)
+
+            assert first == second
+            assert server.request_count == requests_after_first + 1
+
+
+@pytest.fixture
+def books_api():
+    """Creates a books API session that records the bibkeys requested."""
+    session = Mock()
+    session.release = threading.Event()
+    session.release.set()
+    session.bibkeys = []
+
+    def get(url, params=None, **kwargs):
+        keys = params["bibkeys"].split(",")
+        session.bibkeys.append(keys)
+        session.release.wait(5)
+        return make_response(200, {
+            key: {"details": {"publishers": [key]}} for key in keys
+        })
+
+    session.get.side_effect = get
+    return session
+
+
+class TestEditionCoalescing:
+    """Tests for coalescing batched edition lookups per key."""
+
+    def test_batches_only_unresolved_editions(self, books_api):
+        """Checks that resolved editions are not requested again."""
+        coalescing = CoalescingSession(books_api)
+
+        fetch_isbn_and_publisher_data_batch(["OL1M", "OL2M"], "url", coalescing)
+        result = fetch_isbn_and_publisher_data_batch(
+            ["OL2M", "OL3M"], "url", coalescing
+        )
+
+        assert books_api.bibkeys == [["OLID:OL1M", "OLID:OL2M"], ["OLID:OL3M"]]
+        assert result["OL2M"]["publisher"] == ["OLID:OL2M"]
+        assert result["OL3M"]["publisher"] == ["OLID:OL3M"]
+        assert coalescing.editions.stats == {
+            "hits": 1, "coalesced": 0, "misses": 3, "batches": 2
+        }
+
+    def test_expires_resolved_editions(self, books_api):
+        """Checks that editions older than the ttl are requested again."""
+        coalescing = CoalescingSession(books_api, ttl=60)
+
+        with patch("time.monotonic", return_value=1000):
+            fetch_isbn_and_publisher_data_batch(["OL1M"], "url", coalescing)
+            fetch_isbn_and_publisher_data_batch(["OL1M"], "url", coalescing)
+        with patch("time.monotonic", return_value=1060):
+            fetch_isbn_and_publisher_data_batch(["OL1M"], "url", coalescing)
+
+        assert books_api.bibkeys == [["OLID:OL1M"], ["OLID:OL1M"]]
+
+    def test_waits_for_editions_in_flight(self, books_api):
+        """Checks that overlapping concurrent batches share editions."""
+        books_api.release.clear()
+        coalescing = CoalescingSession(books_api)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(
+                fetch_isbn_and_publisher_data_batch,
+                ["OL1M", "OL2M"], "url", coalescing
+            )
+            while not books_api.bibkeys:
+                time.sleep(0.001)
+            second = executor.submit(
+                fetch_isbn_and_publisher_data_batch,
+                ["OL2M", "OL3M"], "url", coalescing
+            )
+            while coalescing.editions.stats["coalesced"] < 1:
+                time.sleep(0.001)
+            books_api.release.set()
+
+            assert set(second.result()) == {"OL2M", "OL3M"}
+            assert set(first.result()) == {"OL1M", "OL2M"}
+
+        assert books_api.bibkeys == [["OLID:OL1M", "OLID:OL2M"], ["OLID:OL3M"]]
+        assert coalescing.editions.in_flight == {}
+
+    def test_batches_concurrent_lookups_together(self, books_api):
+        """Checks that different callers' editions share one request."""
+        coalescing = CoalescingSession(books_api, batch_window=0.2)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(
+                    fetch_isbn_and_publisher_data_batch,
+                    [f"OL{i}M", f"OL{i + 3}M"], "url", coalescing
+                )
+                for i in range(3)
+            ]
+            results = [future.result() for future in futures]
+
+        assert len(books_api.bibkeys) == 1
+        assert sorted(books_api.bibkeys[0]) == sorted(
+            f"OLID:OL{i}M" for i in range(6)
+        )
+        assert set(results[1]) == {"OL1M", "OL4M"}
+        assert results[1]["OL4M"]["publisher"] == ["OLID:OL4M"]
+        assert coalescing.editions.stats["batches"] == 1
+
+    def test_batch_errors_reach_every_caller(self, books_api):
+        """Checks that a failed shared batch fails each caller in it."""
+        books_api.get.side_effect = requests.ConnectionError
+        coalescing = CoalescingSession(books_api, batch_window=0.2)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(
+                    fetch_isbn_and_publisher_data_batch,
+                    [f"OL{i}M"], "url", coalescing
+                )
+                for i in range(2)
+            ]
+            for future in futures:
+                with pytest.raises(requests.ConnectionError):
+                    future.result()
+
+        assert books_api.get.call_count == 1
+        assert coalescing.editions.in_flight == {}
+        assert coalescing.editions.pending == {}
+
+    def test_shares_errors_and_keeps_nothing(self, books_api):
+        """Checks that a failed batch is not cached."""
+        books_api.get.side_effect = requests.ConnectionError
+        coalescing = CoalescingSession(books_api)
+
+        with pytest.raises(requests.ConnectionError):
+            fetch_isbn_and_publisher_data_batch(["OL1M"], "url", coalescing)
+
+        assert coalescing.editions.in_flight == {}
+        assert coalescing.editions.resolved == {}
+
+    def test_coalesces_through_instrumented_session(self, books_api):
+        """Checks that an instrumented session still coalesces editions."""
+        session = InstrumentedSession(CoalescingSession(books_api), Metrics())
+
+        fetch_isbn_and_publisher_data_batch(["OL1M"], "url", session)
+        fetch_isbn_and_publisher_data_batch(["OL1M"], "url", session)
+
+        assert books_api.bibkeys == [["OLID:OL1M"]]
@@ -0,0 +1,160 @@
+from src.dumps import (
+    iter_dump,
+    iter_dump_book_data,
+    DumpIndex,
+    choose_edition,
+    edition_languages,
+    earliest_year
+)
+import gzip
+import json
+import pytest
+
+
+def write_dump(path, records):
+    """Writes records to a gzipped dump in the openlibrary format."""
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        for record_type, record in records:
+            file.write(
+                f"{record_type}\t{record['key']}\t1\t2024-01-01T00:00:00\t"
+                f"{json.dumps(record)}\n"
+            )
+    return str(path)
+
+
+@pytest.fixture
+def dumps(tmp_path):
+    """Creates small works, editions and authors dumps."""
+    authors = write_dump(tmp_path / "authors.txt.gz", [
+        ("/type/author", {"key": "/authors/OL52922A", "name": "Margaret Atwood"})
+    ])
+    works = write_dump(tmp_path / "works.txt.gz", [
+        ("/type/work", {
+            "key": "/works/OL675783W",
+            "title": "The Handmaid's Tale",
+            "authors": [{"author": {"key": "/authors/OL52922A"}}],
+            "subjects": ["Dystopias", "Fiction"]
+        }),
+        ("/type/work", {
+            "key": "/works/OL1W",
+            "title": "Unpublished Work"
+        }),
+        ("/type/redirect", {"key": "/works/OL2W", "location": "/works/OL1W"})
+    ])
+    editions = write_dump(tmp_path / "editions.txt.gz", [
+        ("/type/edition", {
+            "key": "/books/OL1M",
+            "works": [{"key": "/works/OL675783W"}],
+            "publish_date": "March 1986",
+            "publishers": ["Houghton Mifflin"],
+            "languages": [{"key": "/languages/eng"}]
+        }),
+        ("/type/edition", {
+            "key": "/books/OL2769393M",
+            "works": [{"key": "/works/OL675783W"}],
+            "publish_date": "1985",
+            "publishers": ["McClelland & Stewart"],
+            "covers": [8231851],
+            "isbn_10": ["0771008139"],
+            "languages": [{"key": "/languages/eng"}, {"key": "/languages/fre"}]
+        })
+    ])
+    yield works, editions, authors
+
+
+class TestIterDump:
+    """Tests for the iter_dump function."""
+
+    def test_yields_type_key_and_record(self, dumps):
+        """Checks that dump lines are split and decoded."""
+        works, _, _ = dumps
+
+        result = list(iter_dump(works))
+
+        assert [(record_type, key) for record_type, key, _ in result] == [
+            ("/type/work", "/works/OL675783W"),
+            ("/type/work", "/works/OL1W"),
+            ("/type/redirect", "/works/OL2W")
+        ]
+        assert result[0][2]["title"] == "The Handmaid's Tale"
+
+
+class TestDumpIndex:
+    """Tests for the DumpIndex class."""
+
+    def test_joins_editions_to_works(self, dumps, tmp_path):
+        """Checks that editions are looked up by work key."""
+        _, editions, authors = dumps
+
+        with DumpIndex(str(tmp_path / "index.db")) as index:
+            index.add_editions(editions)
+            index.add_authors(authors)
+
+            assert len(index.editions("/works/OL675783W")) == 2
+            assert index.editions("/works/OL1W") == []
+            assert index.author_names(
+                ["/authors/OL52922A", "/authors/OL0A"]
+            ) == ["Margaret Atwood"]
+
+
+class TestIterDumpBookData:
+    """Tests for the iter_dump_book_data function."""
+
+    def test_builds_pipeline_records(self, dumps, tmp_path):
+        """Checks that dump records match generate_book_data's shape."""
+        result = list(iter_dump_book_data(*dumps, str(tmp_path / "index.db")))
+
+        assert result[0] == {
+            "id": "/works/OL675783W",
+            "title": "The Handmaid's Tale",
+            "author_name": ["Margaret Atwood"],
+            "first_publish_year": 1985,
+            "edition_count": 2,
+            "language": ["eng", "fre"],
+            "subjects": ["Dystopias", "Fiction"],
+            "publisher": ["McClelland & Stewart"],
+            "isbn": {"isbn_10": ["0771008139"], "isbn_13": []}
+        }
+
+    def test_handles_works_without_editions(self, dumps, tmp_path):
+        """Checks that works without editions have empty data."""
+        result = list(iter_dump_book_data(*dumps, str(tmp_path / "index.db")))
+
+        assert len(result) == 2
+        assert result[1] == {
+            "id": "/works/OL1W",
+            "title": "Unpublished Work",
+            "author_name": [],
+            "first_publish_year": [],
+            "edition_count": 0,
+            "language": [],
+            "subjects": [],
+            "publisher": [],
+            "isbn": {"isbn_10": [], "isbn_13": []}
+        }
+
+
+class TestHelpers:
+    """Tests for the edition helper functions."""
+
+    def test_choose_edition_prefers_covers(self):
+        """Checks that editions with covers are chosen first."""
+        editions = [{"key": "a", "publishers": ["P"]}, {"key": "b", "covers": [1]}]
+
+        assert choose_edition(editions)["key"] == "b"
+        assert choose_edition(editions[:1])["key"] == "a"
+        assert choose_edition([]) is None
+
+    def test_edition_languages_are_unique(self):
+        """Checks that language codes are listed once each."""
+        editions = [
+            {"languages": [{"key": "/languages/eng"}]},
+            {"languages": [{"key": "/languages/eng"}, {"key": "/languages/ger"}]}
+        ]
+
+        assert edition_languages(editions) == ["eng", "ger"]
+
+    def test_earliest_year(self):
+        """Checks that the earliest year is found in free-text dates."""
+        assert earliest_year(["March 3, 1986", None, "1985", "n.d."]) == 1985
+        assert earliest_year([None, "unknown"]) is None
@@ -0,0 +1,132 @@
+from src.hedge import HedgedSession
+import pytest
+import threading
+import time
+import requests
+from unittest.mock import Mock
+
+
+@pytest.fixture
+def slow_session():
+    """
+    Creates a session whose requests take the delays in its schedule.
+
+    An exception in the schedule is raised after a short delay instead.
+    """
+    session = Mock()
+    session.delays = []
+    session.responses = []
+    lock = threading.Lock()
+
+    def get(url, **kwargs):
+        with lock:
+            delay = session.delays.pop(0) if session.delays else 0
+        if isinstance(delay, Exception):
+            time.sleep(0.05)
+            raise delay
+        time.sleep(delay)
+        response = Mock()
+        response.delay = delay
+        session.responses.append(response)
+        return response
+
+    session.get.side_effect = get
+    return session
+
+
+def warm_up(hedged, count=20):
+    """Sends fast requests so hedging has a latency percentile."""
+    for _ in range(count):
+        hedged.get("url/works/OL1W.json")
+
+
+class TestHedgedSession:
+    """Tests for the HedgedSession class."""
+
+    def test_does_not_hedge_before_min_samples(self, slow_session):
+        """Checks that requests are sent once until latencies are known."""
+        hedged = HedgedSession(slow_session, max_hedge_rate=1)
+        slow_session.delays = [0.05]
+
+        hedged.get("url/works/OL1W.json")
+
+        assert slow_session.get.call_count == 1
+        assert hedged.deadline() is None
+
+    def test_hedges_slow_requests(self, slow_session):
+        """Checks that the hedge answers when the first request is slow."""
+        hedged = HedgedSession(slow_session, max_hedge_rate=1)
+        warm_up(hedged)
+        slow_session.delays = [1, 0]
+
+        started = time.perf_counter()
+        response = hedged.get("url/works/OL1W.json")
+
+        assert time.perf_counter() - started < 0.5
+        assert response.delay == 0
+        assert response.hedged
+        assert hedged.stats == {"requests": 21, "hedged": 1, "hedge_wins": 1}
+        hedged.close()
+
+    def test_closes_losing_response(self, slow_session):
+        """Checks that the slower response is closed when it arrives."""
+        hedged = HedgedSession(slow_session, max_hedge_rate=1)
+        warm_up(hedged)
+        slow_session.delays = [0.2, 0]
+
+        response = hedged.get("url/works/OL1W.json")
+        hedged.close()
+
+        losing = slow_session.responses[-1]
+        assert losing.delay == 0.2
+        losing.close.assert_called_once_with()
+        response.close.assert_not_called()
+
+    def test_caps_hedge_rate(self, slow_session):
+        """Checks that no more than max_hedge_rate requests are hedged."""
+        hedged = HedgedSession(slow_session, max_hedge_rate=0.05)
+        warm_up(hedged, 19)
+        slow_session.delays = [0.02] * 10
+
+        for _ in range(5):
+            hedged.get("url/books/OL1M.json")
+
+        assert hedged.stats["requests"] == 24
+        assert hedged.stats["hedged"] == 1
+        assert hedged.hedge_rate() == pytest.approx(1 / 24)
+
+    def test_uses_hedge_when_first_request_fails(self, slow_session):
+        """Checks that a failed request falls back to its hedge."""
+        hedged = HedgedSession(slow_session, max_hedge_rate=1)
+        warm_up(hedged)
+        slow_session.delays = [requests.ConnectionError(), 0.2]
+
+        response = hedged.get("url/works/OL1W.json")
+
+        assert response.delay == 0.2
+        assert response.hedged
+
+    def test_raises_when_every_attempt_fails(self, slow_session):
+        """Checks that the error is raised if the hedge fails too."""
+        hedged = HedgedSession(slow_session, max_hedge_rate=1)
+        warm_up(hedged)
+        slow_session.delays = [
+            requests.ConnectionError(), requests.ConnectionError()
+        ]
+
+        with pytest.raises(requests.ConnectionError):
+            hedged.get("url/works/OL1W.json")
+
+    def test_passes_other_requests_through(self, slow_session):
+        """Checks that search and streamed requests are never hedged."""
+        hedged = HedgedSession(slow_session, max_hedge_rate=1, min_samples=0)
+
+        hedged.get("url/search.json", params={"page": 1})
+        hedged.get("url/works/OL1W.json", stream=True)
+
+        assert hedged.stats["requests"] == 0
+        assert slow_session.get.call_count == 2
+
+    def test_hedge_rate_without_requests(self):
+        """Checks that the hedge rate starts at zero."""
+        assert HedgedSession(Mock()).hedge_rate() == 0.0
@@ -0,0 +1,114 @@
+from bench.fake_server import FakeOpenLibrary
+from src.json_stream import iter_json_array, json_loads
+from src.utils import generate_book_data
+import json
+import pytest
+
+
+@pytest.fixture
+def search_body():
+    """Creates a search response with awkward strings in its docs."""
+    return {
+        "numFound": 3,
+        "start": 0,
+        "docs": [
+            {"key": "/works/OL1W", "title": 'Say "hi" \\ [ok]'},
+            {"key": "/works/OL2W", "title": "Café 中文", "language": []},
+            {"key": "/works/OL3W", "edition_count": 2.5, "ia": None}
+        ],
+        "q": "",
+        "offset": None
+    }
+
+
+def split(data, size):
+    """Cuts bytes into chunks of a fixed size."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJSONArray:
+    """Tests for the iter_json_array generator."""
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 1024])
+    @pytest.mark.parametrize("ensure_ascii", [True, False])
+    def test_decodes_across_chunk_boundaries(
+        self, search_body, size, ensure_ascii
+    ):
+        """Checks that docs decode correctly however the bytes are split."""
+        data = json.dumps(search_body, ensure_ascii=ensure_ascii).encode()
+        header = {}
+
+        result = list(iter_json_array(split(data, size), "docs", header))
+
+        assert result == search_body["docs"]
+        assert header == {"numFound": 3, "start": 0, "q": "", "offset": None}
+
+    def test_accepts_text_and_whitespace(self, search_body):
+        """Checks that indented str chunks are decoded."""
+        text = json.dumps(search_body, indent=2)
+
+        assert list(iter_json_array(split(text, 5), "docs")) == search_body["docs"]
+
+    def test_yields_before_the_stream_ends(self):
+        """Checks that a doc is yielded before later chunks are read."""
+        read = []
+
+        def chunks():
+            for chunk in (b'{"docs": [{"key": 1}', b', {"key": 2}', b"]}"):
+                read.append(chunk)
+                yield chunk
+
+        docs = iter_json_array(chunks(), "docs")
+
+        assert next(docs) == {"key": 1}
+        assert len(read) == 1
+
+    @pytest.mark.parametrize("data", [b'{"docs": []}', b"{}", b'{"q": 1}'])
+    def test_handles_empty_and_missing_arrays(self, data):
+        """Checks that nothing is yielded without docs."""
+        assert list(iter_json_array([data], "docs")) == []
+
+    @pytest.mark.parametrize("data", [
+        b'{"docs": [{"key": 1}',
+        b'{"docs": [{"key": "',
+        b'["docs"]',
+        b""
+    ])
+    def test_rejects_invalid_streams(self, data):
+        """Checks that truncated or non-object JSON raises a ValueError."""
+        with pytest.raises(ValueError):
+            list(iter_json_array([data], "docs"))
+
+    def test_uses_given_decoder(self):
+        """Checks that elements are decoded with loads."""
+        result = list(iter_json_array(
+            [b'{"docs": [1, 2]}'], "docs", loads=lambda text: text.strip()
+        ))
+
+        assert result == ["1", "2"]
+
+
+class TestJSONLoads:
+    """Tests for the json_loads function."""
+
+    def test_decodes_json(self):
+        """Checks that the chosen decoder decodes JSON text."""
+        assert json_loads()('{"a": [1]}') == {"a": [1]}
+
+
+class TestStreamedPipeline:
+    """Tests for generate_book_data with streamed search pages."""
+
+    @pytest.mark.parametrize("max_workers", [None, 4])
+    def test_matches_unstreamed_results(self, max_workers):
+        """Checks that streaming search pages does not change the output."""
+        with FakeOpenLibrary(num_books=205, payload_size=1) as server:
+            streamed = generate_book_data(
+                "Author", server.url, max_workers=max_workers, stream=True
+            )
+            buffered = generate_book_data(
+                "Author", server.url, max_workers=max_workers
+            )
+
+        assert len(streamed) == 205
+        assert streamed == buffered
@@ -0,0 +1,199 @@
+from bench.fake_server import FakeOpenLibrary
+from src.coalesce import CoalescingSession
+from src.metrics import (
+    Metrics,
+    InstrumentedSession,
+    InstrumentedSink,
+    endpoint_for,
+    stage_timer
+)
+from src.sinks import NDJSONSink
+from src.utils import fetch_book_subjects, generate_book_data
+import json
+import pytest
+from unittest.mock import Mock
+import requests
+
+
+def make_response(status_code, body, **attributes):
+    """Creates a real response with a JSON body."""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode()
+    for name, value in attributes.items():
+        setattr(response, name, value)
+    return response
+
+
+class TestMetrics:
+    """Tests for the Metrics class."""
+
+    def test_records_requests_by_endpoint(self):
+        """Checks that latency, bytes, statuses, retries and hits add up."""
+        metrics = Metrics()
+        metrics.observe_request("works", 0.02, 200, 100, retries=1)
+        metrics.observe_request("works", 0.3, 503, 20)
+        metrics.observe_request("search", 0.001, 200, 50, from_cache=True)
+
+        snapshot = metrics.snapshot()["requests"]
+
+        assert snapshot["works"]["latency"]["count"] == 2
+        assert snapshot["works"]["latency"]["buckets"]["0.025"] == 1
+        assert snapshot["works"]["latency"]["buckets"]["0.5"] == 2
+        assert snapshot["works"]["bytes"] == 120
+        assert snapshot["works"]["status_codes"] == {"200": 1, "503": 1}
+        assert snapshot["works"]["retries"] == 1
+        assert snapshot["search"]["cache_hits"] == 1
+
+    def test_times_stages(self):
+        """Checks that a stage records one observation per use."""
+        metrics = Metrics()
+
+        with metrics.stage("normalise"):
+            pass
+        with metrics.stage("normalise"):
+            pass
+
+        assert metrics.snapshot()["stages"]["normalise"]["count"] == 2
+
+    def test_calls_hooks(self):
+        """Checks that hooks receive every observation."""
+        metrics = Metrics()
+        hook = Mock()
+        metrics.add_hook(hook)
+
+        metrics.observe_request("books", 0.1, 200)
+        metrics.observe_stage("merge", 0.001)
+
+        events = [call.args[0] for call in hook.call_args_list]
+        assert [event["type"] for event in events] == ["request", "stage"]
+        assert events[0]["endpoint"] == "books"
+        assert events[1]["stage"] == "merge"
+
+    def test_exports_json_and_prometheus(self):
+        """Checks both export formats."""
+        metrics = Metrics()
+        metrics.observe_request("works", 0.02, 200, 100)
+        metrics.observe_stage("sink", 0.5)
+
+        assert json.loads(metrics.to_json()) == metrics.snapshot()
+
+        text = metrics.to_prometheus()
+        assert 'book_pipeline_request_seconds_count{endpoint="works"} 1' in text
+        assert 'book_pipeline_request_seconds_bucket{endpoint="works",le="0.01"} 0' in text
+        assert 'book_pipeline_response_bytes_total{endpoint="works"} 100' in text
+        assert 'book_pipeline_responses_total{endpoint="works",status="200"} 1' in text
+        assert 'book_pipeline_stage_seconds_bucket{stage="sink",le="+Inf"} 1' in text
+
+    def test_stage_timer_without_metrics(self):
+        """Checks that stage_timer does nothing when metrics are off."""
+        with stage_timer(None, "merge"):
+            pass
+
+
+class TestEndpointFor:
+    """Tests for the endpoint_for function."""
+
+    @pytest.mark.parametrize("url, endpoint", [
+        ("https://openlibrary.org/search.json", "search"),
+        ("https://openlibrary.org/works/OL1W.json", "works"),
+        ("https://openlibrary.org/books/OL1M.json", "books"),
+        ("https://openlibrary.org/api/books", "books"),
+        ("https://openlibrary.org/authors/OL1A.json", "other")
+    ])
+    def test_classifies_urls(self, url, endpoint):
+        """Checks that URLs are grouped by endpoint."""
+        assert endpoint_for(url) == endpoint
+
+
+class TestInstrumentedSession:
+    """Tests for the InstrumentedSession class."""
+
+    def test_records_responses_and_decode_time(self):
+        """Checks that a GET and its JSON decoding are both recorded."""
+        session = Mock()
+        session.get.return_value = make_response(
+            200, {"subjects": []}, retries=2, from_cache=True
+        )
+        metrics = Metrics()
+
+        response = InstrumentedSession(session, metrics).get(
+            "url/works/OL1W.json", timeout=5
+        )
+
+        assert response.json() == {"subjects": []}
+        session.get.assert_called_once_with("url/works/OL1W.json", timeout=5)
+        snapshot = metrics.snapshot()
+        works = snapshot["requests"]["works"]
+        assert works["bytes"] == len(b'{"subjects": []}')
+        assert works["retries"] == 2
+        assert works["cache_hits"] == 1
+        assert snapshot["stages"]["decode"]["count"] == 1
+
+    def test_does_not_modify_shared_responses(self):
+        """Checks that repeated GETs of a shared response time one decode each."""
+        response = make_response(200, {"subjects": ["Fiction"]})
+        session = Mock()
+        session.get.return_value = response
+        metrics = Metrics()
+        coalescing = CoalescingSession(session)
+
+        for _ in range(1500):
+            instrumented = InstrumentedSession(coalescing, metrics)
+            fetch_book_subjects("/works/OL1W", "url", instrumented)
+
+        assert "json" not in vars(response)
+        snapshot = metrics.snapshot()
+        assert snapshot["stages"]["decode"]["count"] == 1500
+        assert snapshot["requests"]["works"]["cache_hits"] == 1499
+
+    def test_records_errors(self):
+        """Checks that failed requests are counted and re-raised."""
+        session = Mock()
+        session.get.side_effect = requests.ConnectionError
+        metrics = Metrics()
+
+        with pytest.raises(requests.ConnectionError):
+            InstrumentedSession(session, metrics).get("url/search.json")
+
+        assert metrics.snapshot()["requests"]["search"]["status_codes"] == {
+            "error": 1
+        }
+
+
+class TestInstrumentedSink:
+    """Tests for the InstrumentedSink class."""
+
+    def test_times_writes(self, tmp_path):
+        """Checks that writes, flushes and closes are timed as the sink."""
+        metrics = Metrics()
+
+        with InstrumentedSink(NDJSONSink(str(tmp_path / "books.ndjson")), metrics) as sink:
+            sink.write({"id": "/works/OL1W"})
+            sink.flush()
+
+        assert metrics.snapshot()["stages"]["sink"]["count"] == 3
+        assert (tmp_path / "books.ndjson").read_text() == '{"id": "/works/OL1W"}\n'
+
+
+class TestPipelineMetrics:
+    """Tests for metrics collected by generate_book_data."""
+
+    @pytest.mark.parametrize("max_workers", [None, 4])
+    def test_records_every_endpoint_and_stage(self, max_workers):
+        """Checks that a run records its requests and stage timings."""
+        metrics = Metrics()
+
+        with FakeOpenLibrary(num_books=5, payload_size=1) as server:
+            result = generate_book_data(
+                "Author", server.url, max_workers=max_workers, metrics=metrics
+            )
+
+        snapshot = metrics.snapshot()
+        assert len(result) == 5
+        assert snapshot["requests"]["search"]["latency"]["count"] == 1
+        assert snapshot["requests"]["works"]["latency"]["count"] == 5
+        assert snapshot["requests"]["books"]["latency"]["count"] == 1
+        assert snapshot["stages"]["normalise"]["count"] == 5
+        assert snapshot["stages"]["merge"]["count"] == 5
+        assert snapshot["stages"]["decode"]["count"] == 7
@@ -0,0 +1,184 @@
+from bench.fake_server import FakeOpenLibrary
+from src.pipeline import (
+    Pipeline,
+    Stage,
+    build_book_pipeline,
+    iter_staged_book_data
+)
+from src.sinks import NDJSONSink, read_ndjson
+from src.utils import generate_book_data
+import pytest
+import threading
+import time
+
+
+@pytest.fixture
+def server():
+    """Starts a fake openlibrary server."""
+    with FakeOpenLibrary(num_books=25, payload_size=1) as server:
+        yield server
+
+
+class TestPipeline:
+    """Tests for the Pipeline class."""
+
+    def test_yields_results_in_source_order(self):
+        """Checks that parallel workers do not reorder the results."""
+        def slow_double(value):
+            time.sleep(0.01 * (value % 3))
+            return value * 2
+
+        pipeline = Pipeline(range(20), [
+            Stage("double", slow_double, workers=4),
+            Stage("add", lambda value: value + 1, workers=2)
+        ])
+
+        assert list(pipeline) == [value * 2 + 1 for value in range(20)]
+
+    def test_batches_queued_items(self):
+        """Checks that a batch stage receives several items at once."""
+        sizes = []
+
+        def record(values):
+            sizes.append(len(values))
+            return values
+
+        gate = threading.Event()
+        pipeline = Pipeline(range(10), [
+            Stage("wait", lambda value: gate.wait() and value, workers=1),
+            Stage("batch", record, workers=1, batch_size=4)
+        ], queue_size=1)
+
+        results = pipeline.run()
+        gate.set()
+
+        assert list(results) == list(range(10))
+        assert sum(sizes) == 10
+        assert max(sizes) <= 4
+
+    def test_full_queue_blocks_earlier_stages(self):
+        """Checks that a stalled stage stops the source from racing ahead."""
+        gate = threading.Event()
+        read = []
+
+        def source():
+            for value in range(100):
+                read.append(value)
+                yield value
+
+        pipeline = Pipeline(source(), [
+            Stage("stall", lambda value: gate.wait() and value, workers=1)
+        ], queue_size=2)
+
+        results = pipeline.run()
+        collected = []
+        thread = threading.Thread(target=lambda: collected.extend(results))
+        thread.start()
+        time.sleep(0.2)
+
+        assert len(read) <= 5
+        assert pipeline.stats()["stall"]["queue_depth"] == 2
+
+        gate.set()
+        thread.join()
+        assert collected == list(range(100))
+
+    def test_reports_stage_throughput(self):
+        """Checks that each stage counts the items it processed."""
+        pipeline = Pipeline(range(5), [
+            Stage("first", lambda value: value, workers=2),
+            Stage("second", lambda value: value, workers=1)
+        ])
+
+        list(pipeline)
+        stats = pipeline.stats()
+
+        assert list(stats) == ["source", "first", "second"]
+        assert stats["source"]["workers"] == 1
+        assert stats["source"]["processed"] == 5
+        assert stats["first"]["workers"] == 2
+        assert stats["first"]["processed"] == 5
+        assert stats["second"]["processed"] == 5
+        assert stats["second"]["queue_depth"] == 0
+        assert stats["second"]["items_per_second"] > 0
+
+    def test_raises_stage_errors(self):
+        """Checks that a stage error is raised from the output in order."""
+        def fail_on_three(value):
+            if value == 3:
+                raise ValueError("three")
+            return value
+
+        pipeline = Pipeline(range(10), [
+            Stage("check", fail_on_three, workers=3),
+            Stage("after", lambda value: value, workers=1)
+        ])
+        results = []
+
+        with pytest.raises(ValueError, match="three"):
+            for value in pipeline:
+                results.append(value)
+
+        assert results == [0, 1, 2]
+
+    def test_raises_source_errors(self):
+        """Checks that an error from the source reaches the output."""
+        def source():
+            yield 1
+            raise ConnectionError("search failed")
+
+        pipeline = Pipeline(source(), [Stage("copy", lambda value: value)])
+
+        with pytest.raises(ConnectionError):
+            list(pipeline)
+
+    def test_stops_when_closed_early(self):
+        """Checks that the workers exit once the output is abandoned."""
+        pipeline = Pipeline(iter(range(1000)), [
+            Stage("copy", lambda value: value, workers=2)
+        ], queue_size=2)
+
+        results = pipeline.run()
+        assert next(results) == 0
+        results.close()
+
+        for thread in pipeline.threads:
+            thread.join(timeout=2)
+            assert not thread.is_alive()
+
+
+class TestBookPipeline:
+    """Tests for build_book_pipeline and iter_staged_book_data."""
+
+    def test_matches_generate_book_data(self, server):
+        """Checks that the staged pipeline yields the same records."""
+        expected = generate_book_data("Author", server.url)
+
+        records = list(iter_staged_book_data(
+            "Author",
+            server.url,
+            workers={"enrich-work": 4},
+            queue_size=5,
+            edition_batch_size=10
+        ))
+
+        assert records == expected
+
+    def test_sink_stage_writes_records(self, server, tmp_path):
+        """Checks that the sink stage writes every record once."""
+        path = str(tmp_path / "books.ndjson")
+
+        with NDJSONSink(path) as sink:
+            pipeline = build_book_pipeline("Author", server.url, sink=sink)
+            books = list(pipeline)
+
+        assert sorted(record["id"] for record in read_ndjson(path)) == sorted(
+            book.id for book in books
+        )
+        stats = pipeline.stats()
+        assert list(stats) == [
+            "search", "normalise", "enrich-work", "enrich-edition", "merge",
+            "sink"
+        ]
+        assert stats["search"]["busy_seconds"] > 0
+        assert all(stage["processed"] == 25 for stage in stats.values())
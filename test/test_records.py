@@ -0,0 +1,92 @@
+from src.records import Book
+from src.utils import update_book_data, merge_dicts
+import json
+import pytest
+
+
+@pytest.fixture
+def search_doc():
+    """Creates a search API doc."""
+    yield {
+        "key": "/works/OL675783W",
+        "title": "The Handmaid's Tale",
+        "author_name": ["Margaret Atwood"],
+        "first_publish_year": 1985,
+        "edition_count": 147,
+        "language": ["eng"],
+        "ia": ["handmaidstale0000atwo_n4n6"]
+    }
+
+
+class TestBook:
+    """Tests for the Book record class."""
+
+    def test_has_no_instance_dict(self):
+        """Checks that records use slots rather than a dictionary."""
+        book = Book()
+
+        assert not hasattr(book, "__dict__")
+        with pytest.raises(AttributeError):
+            book.cover_i = 1
+
+    def test_from_search_doc_matches_update_book_data(self, search_doc):
+        """Checks that records are filled like update_book_data."""
+        book = Book.from_search_doc(search_doc)
+
+        assert book.id == "/works/OL675783W"
+        assert book.edition_count == 147
+        assert {
+            key: value
+            for key, value in book.to_dict().items()
+            if key in update_book_data(search_doc)
+        } == update_book_data(search_doc)
+
+    def test_missing_optional_fields_are_empty_lists(self, search_doc):
+        """Checks that missing optional fields default to empty lists."""
+        search_doc.pop("author_name")
+
+        book = Book.from_search_doc(search_doc)
+
+        assert book.author_name == []
+
+    def test_to_dict_matches_merged_data(self, search_doc):
+        """Checks that enriched records convert to the merged dictionary."""
+        subjects = {"subjects": ["Dystopias"]}
+        isbn_data = {
+            "publisher": ["Virago"],
+            "isbn": {"isbn_10": ["0771008139"], "isbn_13": []}
+        }
+        book = Book.from_search_doc(search_doc)
+        book.update(subjects)
+        book.update(isbn_data)
+
+        expected = merge_dicts(update_book_data(search_doc), subjects, isbn_data)
+
+        assert book.to_dict() == expected
+        assert list(book.to_dict()) == list(expected)
+
+    def test_to_json(self, search_doc):
+        """Checks that records serialise to JSON objects."""
+        book = Book.from_search_doc(search_doc)
+
+        assert json.loads(book.to_json()) == book.to_dict()
+
+    def test_fields_follow_schema(self):
+        """Checks that the slots and output keys come from SCHEMA."""
+        keys = tuple(key for key, _, _ in Book.SCHEMA)
+
+        assert Book.FIELDS == keys + ("subjects", "publisher", "isbn")
+        assert set(Book.__slots__) == set(Book.FIELDS) | {"edition_key"}
+        assert list(Book().to_dict()) == list(Book.FIELDS)
+
+    def test_defaults_are_not_shared(self):
+        """Checks that each record gets its own empty lists."""
+        first, second = Book(), Book()
+        first.subjects.append("Fiction")
+
+        assert second.subjects == []
+
+    def test_equality(self, search_doc):
+        """Checks that records with the same fields are equal."""
+        assert Book(id="a", title="b") == Book(id="a", title="b")
+        assert Book(id="a") != Book(id="b")
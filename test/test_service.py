@@ -0,0 +1,134 @@
+from bench.fake_server import FakeOpenLibrary
+from src.service import BookService, serve
+from src.utils import generate_book_data
+from concurrent.futures import ThreadPoolExecutor
+import json
+import pytest
+import requests
+import threading
+
+
+@pytest.fixture
+def upstream():
+    """Starts a fake openlibrary server."""
+    with FakeOpenLibrary(num_books=5, payload_size=1) as server:
+        yield server
+
+
+@pytest.fixture
+def service(upstream):
+    """Creates a service backed by the fake server."""
+    with BookService(upstream.url, max_workers=4, batch_window=0.05) as service:
+        yield service
+
+
+@pytest.fixture
+def api(service):
+    """Serves the service on a free local port."""
+    server = serve(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestBookService:
+    """Tests for the BookService class."""
+
+    def test_returns_generate_book_data_records(self, upstream, service):
+        """Checks that lookups match a direct generate_book_data call."""
+        assert json.loads(service.books("Author")) == generate_book_data(
+            "Author", upstream.url
+        )
+
+    def test_serves_repeat_lookups_from_memory(self, upstream, service):
+        """Checks that a second lookup does not reach the upstream."""
+        first = service.books("Author")
+        requests_after_first = upstream.request_count
+
+        assert service.books("Author") == first
+        assert upstream.request_count == requests_after_first
+        assert service.stats["hits"] == 1
+
+    def test_expires_results(self, upstream):
+        """Checks that results older than result_ttl are fetched again."""
+        with BookService(upstream.url, result_ttl=0) as service:
+            service.books("Author")
+            service.books("Author")
+
+        assert service.stats["fetched"] == 2
+
+    def test_expired_lookups_refresh_works_and_editions(self, upstream):
+        """Checks that work and edition data expires with the results."""
+        with BookService(upstream.url, result_ttl=0) as service:
+            service.books("Author")
+            upstream.publisher = "New Press"
+            books = json.loads(service.books("Author"))
+
+        assert {book["publisher"][0] for book in books} == {"New Press"}
+
+    def test_shares_concurrent_lookups(self, service):
+        """Checks that concurrent lookups of an author share one fetch."""
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(executor.map(
+                service.books, ["A", "B", "A", "C", "B", "A"]
+            ))
+
+        assert results[0] == results[2] == results[5]
+        assert service.stats["fetched"] == 3
+        assert service.stats["joined"] + service.stats["hits"] == 3
+
+    def test_propagates_errors(self, upstream):
+        """Checks that failed lookups raise and are not cached."""
+        with FakeOpenLibrary(error_rate=1) as failing, \
+                BookService(failing.url) as service:
+            with pytest.raises(requests.HTTPError):
+                service.books("Author")
+
+            assert service.in_flight == {}
+            assert service.results == {}
+
+
+class TestServe:
+    """Tests for the HTTP API."""
+
+    def test_serves_author_books(self, api):
+        """Checks the books route, including an encoded author name."""
+        response = requests.get(f"{api}/authors/Margaret%20Atwood/books")
+
+        assert response.status_code == 200
+        books = response.json()
+        assert len(books) == 5
+        assert books[0]["author_name"] == ["Margaret Atwood"]
+
+    def test_serves_health_and_metrics(self, api):
+        """Checks the health and metrics routes."""
+        requests.get(f"{api}/authors/Author/books")
+
+        health = requests.get(f"{api}/health").json()
+        metrics = requests.get(f"{api}/metrics").text
+
+        assert health["status"] == "ok"
+        assert health["fetched"] == 1
+        assert health["edition_batches"] == 1
+        assert 'book_pipeline_request_seconds_count{endpoint="search"} 1' in metrics
+
+    def test_unknown_routes(self, api):
+        """Checks that other paths are not found."""
+        assert requests.get(f"{api}/authors/Author").status_code == 404
+
+    def test_upstream_errors(self):
+        """Checks that upstream failures are reported as bad gateway."""
+        with FakeOpenLibrary(error_rate=1) as failing, \
+                BookService(failing.url) as service:
+            server = serve(service, port=0)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            host, port = server.server_address
+            response = requests.get(f"http://{host}:{port}/authors/A/books")
+            server.shutdown()
+            server.server_close()
+
+        assert response.status_code == 502
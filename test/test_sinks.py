@@ -0,0 +1,342 @@
+from src.sinks import (
+    NDJSONSink,
+    read_ndjson,
+    SQLSink,
+    ParquetSink,
+    to_record_batch
+)
+from src.records import Book
+import gzip
+import json
+import pytest
+import sqlite3
+from unittest.mock import Mock
+
+
+@pytest.fixture
+def records():
+    """Creates a list of book records."""
+    yield [
+        {
+            "id": f"/works/OL{i}W",
+            "title": f"Livre {i} – édition",
+            "subjects": ["Fiction"],
+            "isbn": {"isbn_10": [], "isbn_13": [f"978{i}"]}
+        }
+        for i in range(5)
+    ]
+
+
+class TestNDJSONSink:
+    """Tests for the NDJSONSink class."""
+
+    def test_writes_one_record_per_line(self, tmp_path, records):
+        """Checks that each record is written as a JSON line."""
+        path = str(tmp_path / "books.ndjson")
+
+        with NDJSONSink(path) as sink:
+            count = sink.write_all(records)
+
+        with open(path, encoding="utf-8") as file:
+            lines = file.read().splitlines()
+
+        assert count == 5
+        assert [json.loads(line) for line in lines] == records
+
+    def test_compresses_gz_paths(self, tmp_path, records):
+        """Checks that .gz paths are gzip-compressed."""
+        path = str(tmp_path / "books.ndjson.gz")
+
+        with NDJSONSink(path) as sink:
+            sink.write_all(records)
+
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            assert len(file.read().splitlines()) == 5
+        assert list(read_ndjson(path)) == records
+
+    @pytest.mark.parametrize("name", ["books.ndjson", "books.ndjson.gz"])
+    def test_appends_to_existing_output(self, tmp_path, records, name):
+        """Checks that append mode keeps the records already written."""
+        path = str(tmp_path / name)
+
+        with NDJSONSink(path) as sink:
+            sink.write_all(records[:2])
+        with NDJSONSink(path, append=True) as sink:
+            sink.write_all(records[2:])
+
+        assert list(read_ndjson(path)) == records
+
+    def test_append_drops_partial_last_line(self, tmp_path, records):
+        """Checks that a line cut off by a crash is dropped on append."""
+        path = str(tmp_path / "books.ndjson")
+
+        with NDJSONSink(path) as sink:
+            sink.write_all(records[:2])
+        with open(path, "a", encoding="utf-8") as file:
+            file.write('{"id": "/works/OL')
+        with NDJSONSink(path, append=True) as sink:
+            sink.write_all(records[2:])
+
+        assert list(read_ndjson(path)) == records
+
+    def test_append_recovers_unfinished_gzip_member(self, tmp_path, records):
+        """Checks that a gzip member cut off by a crash is repaired on append."""
+        path = str(tmp_path / "books.ndjson.gz")
+
+        with NDJSONSink(path) as sink:
+            sink.write_all(records[:1])
+        sink = NDJSONSink(path, append=True, batch_size=1)
+        sink.write_all(records[1:3])
+        sink.file.write('{"id": "/works/OL')
+        sink.file.flush()
+        with open(path, "rb") as file:
+            crashed = file.read()
+        sink.close()
+        with open(path, "wb") as file:
+            file.write(crashed)
+
+        with NDJSONSink(path, append=True) as sink:
+            sink.write_all(records[3:])
+
+        assert list(read_ndjson(path)) == records
+
+    def test_append_after_truncated_gzip(self, tmp_path, records):
+        """Checks that appending after a truncated gzip file stays readable."""
+        path = str(tmp_path / "books.ndjson.gz")
+
+        with NDJSONSink(path, batch_size=1) as sink:
+            sink.write_all(records[:4])
+        with open(path, "r+b") as file:
+            file.truncate(file.seek(0, 2) - 12)
+        with NDJSONSink(path, append=True) as sink:
+            sink.write(records[4])
+
+        recovered = list(read_ndjson(path))
+        assert recovered[-1] == records[4]
+        assert recovered[:-1] == records[:len(recovered) - 1]
+
+    def test_flushes_in_batches(self, tmp_path, records):
+        """Checks that records are written once a batch is full."""
+        path = str(tmp_path / "books.ndjson")
+        sink = NDJSONSink(path, batch_size=2)
+
+        for record in records[:3]:
+            sink.write(record)
+
+        assert len(list(read_ndjson(path))) == 2
+        assert len(sink.buffer) == 1
+
+        sink.close()
+
+        assert list(read_ndjson(path)) == records[:3]
+
+    def test_writes_book_records(self, tmp_path, records):
+        """Checks that Book records are written as their dictionaries."""
+        path = str(tmp_path / "books.ndjson")
+        book = Book(id="/works/OL1W", title="Book")
+
+        with NDJSONSink(path) as sink:
+            sink.write(book)
+
+        assert list(read_ndjson(path)) == [book.to_dict()]
+
+    def test_close_is_idempotent(self, tmp_path, records):
+        """Checks that closing twice does not fail."""
+        sink = NDJSONSink(str(tmp_path / "books.ndjson"))
+        sink.write(records[0])
+        sink.close()
+        sink.close()
+
+
+@pytest.fixture
+def book_records():
+    """Creates records shaped like generate_book_data's output."""
+    yield [
+        {
+            "id": f"/works/OL{i}W",
+            "title": f"Book {i}",
+            "author_name": ["Margaret Atwood"],
+            "first_publish_year": 1985 + i if i else [],
+            "edition_count": i,
+            "language": ["eng", "fre"] if i % 2 else ["eng"],
+            "subjects": ["Fiction"],
+            "publisher": ["Virago"],
+            "isbn": {"isbn_10": [], "isbn_13": [f"978{i}"]}
+        }
+        for i in range(5)
+    ]
+
+
+class TestSQLSink:
+    """Tests for the SQLSink class."""
+
+    def test_upserts_books_and_child_tables(self, book_records):
+        """Checks that records are split into normalised tables."""
+        connection = sqlite3.connect(":memory:")
+
+        with SQLSink(connection) as sink:
+            sink.write_all(book_records)
+
+        assert connection.execute("SELECT COUNT(*) FROM books").fetchone() == (5,)
+        assert connection.execute(
+            "SELECT title, first_publish_year, edition_count "
+            "FROM books WHERE id = '/works/OL1W'"
+        ).fetchone() == ("Book 1", 1986, 1)
+        assert connection.execute(
+            "SELECT first_publish_year FROM books WHERE id = '/works/OL0W'"
+        ).fetchone() == (None,)
+        assert connection.execute(
+            "SELECT language FROM book_languages "
+            "WHERE book_id = '/works/OL1W' ORDER BY language"
+        ).fetchall() == [("eng",), ("fre",)]
+        assert connection.execute(
+            "SELECT isbn, isbn_type FROM book_isbns WHERE book_id = '/works/OL2W'"
+        ).fetchall() == [("9782", "isbn_13")]
+
+    def test_rewriting_a_book_replaces_it(self, book_records):
+        """Checks that writing the same id again updates the book."""
+        connection = sqlite3.connect(":memory:")
+        updated = dict(book_records[1], title="New Title", language=["ger"])
+
+        with SQLSink(connection) as sink:
+            sink.write_all(book_records)
+            sink.write(updated)
+
+        assert connection.execute(
+            "SELECT title FROM books WHERE id = '/works/OL1W'"
+        ).fetchall() == [("New Title",)]
+        assert connection.execute(
+            "SELECT language FROM book_languages WHERE book_id = '/works/OL1W'"
+        ).fetchall() == [("ger",)]
+
+    def test_writes_in_batches_and_commits_at_interval(self, book_records):
+        """Checks that rows are batched and commits are spaced out."""
+        connection = Mock()
+        cursor = connection.cursor.return_value
+        sink = SQLSink(
+            connection, batch_size=2, commit_interval=4, create_tables=False
+        )
+
+        sink.write_all(book_records[:4])
+
+        book_inserts = [
+            call for call in cursor.executemany.call_args_list
+            if "INSERT INTO books" in call.args[0]
+        ]
+        assert [len(call.args[1]) for call in book_inserts] == [2, 2]
+        connection.commit.assert_called_once()
+
+    def test_uses_format_paramstyle(self, book_records):
+        """Checks that %s placeholders are used for format drivers."""
+        connection = Mock()
+        cursor = connection.cursor.return_value
+
+        with SQLSink(connection, paramstyle="format", create_tables=False) as sink:
+            sink.write(book_records[0])
+
+        statements = [call.args[0] for call in cursor.executemany.call_args_list]
+        assert all("?" not in statement for statement in statements)
+        assert "%s" in statements[0]
+
+    @pytest.mark.parametrize("paramstyle", ["named", "numeric"])
+    def test_rejects_unsupported_paramstyles(self, paramstyle):
+        """Checks that paramstyles without positional placeholders raise."""
+        with pytest.raises(ValueError, match=paramstyle):
+            SQLSink(Mock(), paramstyle=paramstyle, create_tables=False)
+
+    def test_flush_commits(self, book_records, tmp_path):
+        """Checks that flushed records are visible to other connections."""
+        path = str(tmp_path / "books.db")
+        sink = SQLSink(sqlite3.connect(path))
+        sink.write(book_records[0])
+        sink.flush()
+
+        other = sqlite3.connect(path)
+
+        assert other.execute("SELECT id FROM books").fetchall() == [("/works/OL0W",)]
+
+    def test_reads_records_back(self, book_records):
+        """Checks that stored records round-trip, skipping unknown ids."""
+        connection = sqlite3.connect(":memory:")
+
+        with SQLSink(connection, batch_size=2) as sink:
+            sink.write_all(book_records)
+            records = sink.read(
+                ["/works/OL0W", "/works/OL1W", "/works/OL3W", "/works/OL9W"]
+            )
+
+        assert records == {
+            record["id"]: record
+            for record in (book_records[0], book_records[1], book_records[3])
+        }
+
+
+class TestToRecordBatch:
+    """Tests for the to_record_batch function."""
+
+    def test_converts_records_to_columns(self, book_records):
+        """Checks that each field becomes a column."""
+        pytest.importorskip("pyarrow")
+
+        batch = to_record_batch(book_records)
+
+        assert batch.num_rows == 5
+        assert batch.column("title").to_pylist()[1] == "Book 1"
+        assert batch.column("isbn").to_pylist()[2] == {
+            "isbn_10": [], "isbn_13": ["9782"]
+        }
+
+    def test_missing_years_become_nulls(self, book_records):
+        """Checks that empty publish years are stored as nulls."""
+        pytest.importorskip("pyarrow")
+
+        batch = to_record_batch(book_records)
+
+        assert batch.column("first_publish_year").to_pylist() == [
+            None, 1986, 1987, 1988, 1989
+        ]
+
+    def test_dictionary_encodes_languages_and_subjects(self, book_records):
+        """Checks that repeated categories share a dictionary."""
+        pa = pytest.importorskip("pyarrow")
+
+        batch = to_record_batch(book_records)
+
+        for name in ("language", "subjects"):
+            assert pa.types.is_dictionary(batch.schema.field(name).type.value_type)
+        assert batch.column("language").to_pylist()[1] == ["eng", "fre"]
+
+
+class TestParquetSink:
+    """Tests for the ParquetSink class."""
+
+    def test_writes_one_row_group_per_batch(self, tmp_path, book_records):
+        """Checks that batches are written as separate row groups."""
+        pq = pytest.importorskip("pyarrow.parquet")
+        path = str(tmp_path / "books.parquet")
+
+        with ParquetSink(path, batch_size=2) as sink:
+            count = sink.write_all(book_records)
+
+        parquet_file = pq.ParquetFile(path)
+
+        assert count == 5
+        assert parquet_file.metadata.num_row_groups == 3
+        assert parquet_file.read().to_pylist()[3]["language"] == ["eng", "fre"]
+
+    def test_dictionary_encodes_languages_and_subjects(self, tmp_path, book_records):
+        """Checks that Parquet stores categories with dictionary encoding."""
+        pq = pytest.importorskip("pyarrow.parquet")
+        path = str(tmp_path / "books.parquet")
+
+        with ParquetSink(path) as sink:
+            sink.write_all(book_records)
+
+        row_group = pq.ParquetFile(path).metadata.row_group(0)
+        encodings = {
+            row_group.column(i).path_in_schema: row_group.column(i).encodings
+            for i in range(row_group.num_columns)
+        }
+
+        assert "RLE_DICTIONARY" in encodings["language.list.element"]
+        assert "RLE_DICTIONARY" in encodings["subjects.list.element"]
@@ -0,0 +1,99 @@
+from src.records import Book
+from src.store import BookStore, matching
+import pytest
+
+
+def record(book_id, year, subjects, language, author="A", publisher="P", isbn=None):
+    """Creates a pipeline-ready record with the given indexed fields."""
+    return Book(
+        id=book_id,
+        title=f"Title {book_id}",
+        author_name=[author],
+        first_publish_year=year,
+        edition_count=1,
+        language=language,
+        subjects=subjects,
+        publisher=[publisher],
+        isbn={"isbn_10": [], "isbn_13": [isbn] if isbn else []}
+    ).to_dict()
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Creates a store holding a few records."""
+    with BookStore(str(tmp_path / "store.db")) as store:
+        store.load([
+            record("/works/OL1W", 1985, ["Fiction", "Poetry"], ["eng"]),
+            record("/works/OL2W", 1995, ["Fiction"], ["eng", "fre"], isbn="9780000000002"),
+            record("/works/OL3W", 2005, ["Fiction"], ["fre"], author="B"),
+            record("/works/OL4W", 2010, ["History"], ["eng"], publisher="Q")
+        ])
+        yield store
+
+
+class TestBookStore:
+    """Tests for the BookStore class."""
+
+    def test_intersects_filters(self, store):
+        """Checks that a record must match every filter."""
+        assert store.query(
+            subject="Fiction", language="eng", min_year=1990
+        ) == ["/works/OL2W"]
+
+    def test_list_filter_requires_every_value(self, store):
+        """Checks that every value of a list filter must match."""
+        assert store.query(language=["eng", "fre"]) == ["/works/OL2W"]
+        assert store.query(subject=["Fiction", "Poetry"]) == ["/works/OL1W"]
+
+    def test_year_range(self, store):
+        """Checks that the year bounds are inclusive and optional."""
+        assert store.query(min_year=2005) == ["/works/OL3W", "/works/OL4W"]
+        assert store.query(max_year=1995) == ["/works/OL1W", "/works/OL2W"]
+        assert store.query(min_year=1995, max_year=2005) == [
+            "/works/OL2W", "/works/OL3W"
+        ]
+
+    def test_indexed_fields(self, store):
+        """Checks the author, publisher and ISBN indexes."""
+        assert store.query(author="B") == ["/works/OL3W"]
+        assert store.query(publisher="Q") == ["/works/OL4W"]
+        assert store.query(isbn="9780000000002") == ["/works/OL2W"]
+        assert store.query(isbn="missing") == []
+
+    def test_without_filters_lists_everything(self, store):
+        """Checks that no filters match every record, with paging."""
+        assert store.count() == 4
+        assert store.query(limit=2, offset=1) == ["/works/OL2W", "/works/OL3W"]
+
+    def test_find_reads_records(self, store):
+        """Checks that find returns the stored records."""
+        found = store.find(subject="History")
+
+        assert found == [
+            record("/works/OL4W", 2010, ["History"], ["eng"], publisher="Q")
+        ]
+
+    def test_count(self, store):
+        """Checks that count matches the length of the query."""
+        assert store.count(subject="Fiction") == 3
+        assert store.count(subject="Fiction", language="fre") == 2
+
+    def test_rewritten_records_are_reindexed(self, store):
+        """Checks that writing a record again replaces its index entries."""
+        store.write(record("/works/OL4W", 2010, ["Science"], ["eng"]))
+        store.flush()
+
+        assert store.query(subject="History") == []
+        assert store.query(subject="Science") == ["/works/OL4W"]
+
+    def test_queries_use_indexes(self, store):
+        """Checks that filtered queries do not scan the tables."""
+        sql, params = matching(subject="Fiction", min_year=1990, max_year=2000)
+        plan = store.connection.execute(
+            f"EXPLAIN QUERY PLAN {sql}", params
+        ).fetchall()
+        details = " ".join(row[-1] for row in plan)
+
+        assert "book_subjects_subject_index" in details
+        assert "books_first_publish_year_index" in details
+        assert "SCAN" not in details
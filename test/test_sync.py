@@ -0,0 +1,128 @@
+from bench.fake_server import FakeOpenLibrary
+from src.checkpoint import Checkpoint, run_checkpointed
+from src.sinks import SQLSink
+from src.sync import (
+    SYNC_MARK,
+    affected_books,
+    changed_keys,
+    iter_recent_changes,
+    sync_changes
+)
+import pytest
+import sqlite3
+
+
+def change(timestamp, *keys):
+    """Creates a recent-changes entry touching keys."""
+    return {
+        "timestamp": timestamp,
+        "kind": "update",
+        "changes": [{"key": key, "revision": 2} for key in keys]
+    }
+
+
+@pytest.fixture
+def server():
+    """Starts a fake openlibrary server with an empty changes feed."""
+    with FakeOpenLibrary(num_books=6, payload_size=1) as server:
+        yield server
+
+
+@pytest.fixture
+def store(server, tmp_path):
+    """Stores every book of one author with a checkpointed run."""
+    sink = SQLSink(sqlite3.connect(str(tmp_path / "books.db")))
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.db"))
+    server.changes = [change("2024-01-01T00:00:00")]
+    sync_changes(server.url, sink, checkpoint)
+    run_checkpointed(["Author"], server.url, sink, checkpoint)
+    yield sink, checkpoint
+    checkpoint.close()
+
+
+class TestIterRecentChanges:
+    """Tests for the iter_recent_changes generator."""
+
+    def test_stops_at_the_mark(self, server):
+        """Checks that only changes newer than since are yielded, across pages."""
+        server.changes = [
+            change(f"2024-01-0{day}T00:00:00", f"/works/OL{day}W")
+            for day in range(9, 0, -1)
+        ]
+
+        result = list(iter_recent_changes(
+            server.url, "2024-01-03T00:00:00", limit=2
+        ))
+
+        assert [c["timestamp"][:10] for c in result] == [
+            f"2024-01-0{day}" for day in range(9, 3, -1)
+        ]
+
+
+class TestChangedKeys:
+    """Tests for the changed_keys and affected_books functions."""
+
+    def test_splits_works_and_editions(self):
+        """Checks that other kinds of keys are ignored."""
+        works, editions = changed_keys([
+            change("t", "/works/OL1W", "/books/OL1M"),
+            change("t", "/authors/OL1A", "/works/OL1W", "/books/OL2M")
+        ])
+
+        assert works == {"/works/OL1W"}
+        assert editions == {"OL1M", "OL2M"}
+
+    def test_maps_keys_to_stored_records(self, store):
+        """Checks that editions map to their work and unknown keys drop out."""
+        _, checkpoint = store
+
+        assert affected_books(
+            {"/works/OL1W", "/works/OL99W"}, {"OL2M", "OL99M"}, checkpoint
+        ) == {"/works/OL1W", "/works/OL2W"}
+
+
+class TestSyncChanges:
+    """Tests for the sync_changes function."""
+
+    def test_first_sync_only_sets_the_mark(self, store):
+        """Checks that the fixture's first sync recorded the newest change."""
+        _, checkpoint = store
+
+        assert checkpoint.mark(SYNC_MARK) == "2024-01-01T00:00:00"
+
+    def test_refreshes_only_changed_records(self, server, store):
+        """Checks that changed works and editions are re-fetched and merged."""
+        sink, checkpoint = store
+        server.payload_size = 2
+        server.publisher = "New Press"
+        server.changes = [
+            change("2024-01-03T00:00:00", "/works/OL1W"),
+            change("2024-01-02T00:00:00", "/books/OL4M", "/authors/OL1A"),
+            change("2024-01-01T00:00:00", "/works/OL5W")
+        ]
+        requests_before = server.request_count
+
+        refreshed = sync_changes(server.url, sink, checkpoint)
+
+        records = sink.read([f"/works/OL{i}W" for i in range(6)])
+        assert refreshed == 2
+        assert server.request_count - requests_before == 1 + 2 + 1
+        assert checkpoint.mark(SYNC_MARK) == "2024-01-03T00:00:00"
+        for i in (1, 4):
+            assert records[f"/works/OL{i}W"]["subjects"] == [
+                "Subject 0", "Subject 1"
+            ]
+            assert records[f"/works/OL{i}W"]["publisher"] == ["New Press"]
+        for i in (0, 2, 3, 5):
+            assert records[f"/works/OL{i}W"]["subjects"] == ["Subject 0"]
+            assert records[f"/works/OL{i}W"]["publisher"] == ["Fake Press"]
+        assert records["/works/OL1W"]["title"] == "Book 1"
+        assert records["/works/OL1W"]["isbn"]["isbn_13"]
+
+    def test_does_nothing_without_new_changes(self, server, store):
+        """Checks that a sync at the mark fetches only the feed."""
+        sink, checkpoint = store
+        requests_before = server.request_count
+
+        assert sync_changes(server.url, sink, checkpoint) == 0
+        assert server.request_count - requests_before == 1
@@ -0,0 +1,241 @@
+from src.throttle import (
+    TokenBucket,
+    AdaptiveConcurrency,
+    ThrottledSession,
+    parse_retry_after
+)
+import pytest
+from unittest.mock import patch, Mock
+import requests
+
+
+@pytest.fixture
+def fake_clock():
+    """Replaces the clock with one that sleeping moves forward."""
+    clock = {"now": 1000.0, "slept": []}
+
+    def sleep(seconds):
+        clock["slept"].append(seconds)
+        clock["now"] += seconds
+
+    with patch("time.monotonic", side_effect=lambda: clock["now"]), \
+            patch("time.sleep", side_effect=sleep):
+        yield clock
+
+
+def make_response(status_code, headers=None):
+    """Creates a fake response with a status code."""
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+class TestTokenBucket:
+    """Tests for the TokenBucket class."""
+
+    def test_allows_bursts_up_to_capacity(self, fake_clock):
+        """Checks that a full bucket hands out tokens without waiting."""
+        bucket = TokenBucket(rate=1, capacity=3)
+
+        for _ in range(3):
+            bucket.acquire()
+
+        assert fake_clock["slept"] == []
+
+    def test_waits_for_tokens_to_refill(self, fake_clock):
+        """Checks that an empty bucket waits for the refill rate."""
+        bucket = TokenBucket(rate=2, capacity=1)
+        bucket.acquire()
+        bucket.acquire()
+
+        assert fake_clock["slept"] == [0.5]
+
+    def test_pause_delays_tokens(self, fake_clock):
+        """Checks that no tokens are handed out while paused."""
+        bucket = TokenBucket(rate=100, capacity=5)
+        bucket.pause(30)
+        bucket.acquire()
+
+        assert sum(fake_clock["slept"]) == 30
+
+    def test_unlimited_without_rate(self, fake_clock):
+        """Checks that a bucket without a rate only waits out pauses."""
+        bucket = TokenBucket()
+
+        for _ in range(100):
+            bucket.acquire()
+        assert fake_clock["slept"] == []
+
+        bucket.pause(7)
+        bucket.acquire()
+        assert fake_clock["slept"] == [7]
+
+
+class TestAdaptiveConcurrency:
+    """Tests for the AdaptiveConcurrency class."""
+
+    def test_increases_additively(self):
+        """Checks that successes grow the limit by about one per round."""
+        concurrency = AdaptiveConcurrency(initial=4, maximum=10)
+
+        for _ in range(4):
+            concurrency.on_success()
+
+        assert 4.9 < concurrency.limit < 5
+
+    def test_decreases_multiplicatively(self):
+        """Checks that throttling halves the limit."""
+        concurrency = AdaptiveConcurrency(initial=8)
+        concurrency.on_throttle()
+
+        assert concurrency.limit == 4
+
+    def test_stays_within_bounds(self):
+        """Checks that the limit respects its minimum and maximum."""
+        concurrency = AdaptiveConcurrency(initial=2, minimum=1, maximum=2)
+
+        for _ in range(5):
+            concurrency.on_throttle()
+        assert concurrency.limit == 1
+
+        for _ in range(5):
+            concurrency.on_success()
+        assert concurrency.limit == 2
+
+    def test_tracks_requests_in_flight(self):
+        """Checks that slots are taken and released."""
+        concurrency = AdaptiveConcurrency(initial=2)
+
+        with concurrency:
+            assert concurrency.in_flight == 1
+
+        assert concurrency.in_flight == 0
+
+
+class TestThrottledSession:
+    """Tests for the ThrottledSession class."""
+
+    def test_returns_successful_response(self, fake_clock):
+        """Checks that a successful response is returned unchanged."""
+        session = Mock()
+        session.get.return_value = make_response(200)
+        throttled = ThrottledSession(session)
+
+        response = throttled.get("url/works/OL1W.json", timeout=5)
+
+        assert response is session.get.return_value
+        assert response.retries == 0
+        session.get.assert_called_once_with("url/works/OL1W.json", timeout=5)
+
+    def test_does_not_cap_rate_by_default(self, fake_clock):
+        """Checks that the default session sends requests without waiting."""
+        session = Mock()
+        session.get.return_value = make_response(200)
+        throttled = ThrottledSession(session)
+
+        for _ in range(50):
+            throttled.get("url")
+
+        assert fake_clock["slept"] == []
+        assert throttled.stats["requests"] == 50
+
+    def test_honours_retry_after(self, fake_clock):
+        """Checks that a 429 pauses for the Retry-After time and retries."""
+        session = Mock()
+        session.get.side_effect = [
+            make_response(429, {"Retry-After": "7"}),
+            make_response(200)
+        ]
+        throttled = ThrottledSession(session)
+
+        response = throttled.get("url")
+
+        assert response.status_code == 200
+        assert response.retries == 1
+        assert sum(fake_clock["slept"]) >= 7
+        assert throttled.stats == {"requests": 1, "retries": 1, "throttled": 1}
+
+    def test_throttling_reduces_concurrency(self, fake_clock):
+        """Checks that throttled responses cut the concurrency limit."""
+        session = Mock()
+        session.get.side_effect = [make_response(503), make_response(200)]
+        concurrency = AdaptiveConcurrency(initial=8)
+
+        ThrottledSession(session, concurrency=concurrency).get("url")
+
+        assert 4 < concurrency.limit < 5
+
+    def test_backs_off_on_server_errors(self, fake_clock):
+        """Checks that server errors are retried after a jittered delay."""
+        session = Mock()
+        session.get.side_effect = [
+            make_response(500),
+            make_response(502),
+            make_response(200)
+        ]
+        throttled = ThrottledSession(session, backoff=1)
+
+        with patch("random.uniform", side_effect=lambda low, high: high):
+            throttled.get("url")
+
+        assert fake_clock["slept"][-2:] == [1, 2]
+
+    def test_retries_connection_errors(self, fake_clock):
+        """Checks that connection errors are retried."""
+        session = Mock()
+        session.get.side_effect = [
+            requests.exceptions.ConnectionError("Failed to connect"),
+            make_response(200)
+        ]
+
+        response = ThrottledSession(session).get("url")
+
+        assert response.status_code == 200
+
+    def test_gives_up_after_max_retries(self, fake_clock):
+        """Checks that the last error is surfaced after the retries."""
+        session = Mock()
+        session.get.side_effect = requests.exceptions.Timeout("Timed out")
+
+        with pytest.raises(requests.exceptions.Timeout):
+            ThrottledSession(session, max_retries=2).get("url")
+
+        assert session.get.call_count == 3
+
+    def test_returns_last_response_after_max_retries(self, fake_clock):
+        """Checks that a persistent 429 is returned for raise_for_status."""
+        session = Mock()
+        session.get.return_value = make_response(429)
+
+        response = ThrottledSession(session, max_retries=2).get("url")
+
+        assert response.status_code == 429
+        assert session.get.call_count == 3
+
+    def test_does_not_retry_client_errors(self, fake_clock):
+        """Checks that a 404 is returned straight away."""
+        session = Mock()
+        session.get.return_value = make_response(404)
+
+        ThrottledSession(session).get("url")
+
+        session.get.assert_called_once()
+
+
+class TestParseRetryAfter:
+    """Tests for the parse_retry_after function."""
+
+    def test_parses_seconds(self):
+        """Checks that delays in seconds are parsed."""
+        assert parse_retry_after("120") == 120
+
+    def test_parses_http_dates(self):
+        """Checks that HTTP dates are converted into a delay."""
+        with patch("time.time", return_value=784111777):
+            assert parse_retry_after("Sun, 06 Nov 1994 08:50:07 GMT") == 30
+
+    def test_ignores_missing_and_invalid_values(self):
+        """Checks that unusable headers return None."""
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("soon") is None
@@ -1,17 +1,36 @@
 from src.utils import (
     fetch_books_by_author,
+    iter_books_by_author,
+    search_fields,
     update_book_data,
     fetch_book_subjects,
     fetch_isbn_and_publisher_data,
+    fetch_isbn_and_publisher_data_batch,
     get_edition_key,
     merge_dicts,
-    generate_book_data
+    generate_book_data,
+    iter_book_data,
+    iter_book_records,
+    create_session
 )
+from src.records import BOOK_FIELDS, ENRICHED_FIELDS, Book
+import io
+import json
 import pytest
 from unittest.mock import patch, Mock
 import requests
 
 
+def book_class(schema):
+    """Creates a Book subclass with slots for a different search doc schema."""
+    fields = tuple(key for key, _, _ in schema) + ENRICHED_FIELDS
+    return type("Book", (Book,), {
+        "SCHEMA": schema,
+        "FIELDS": fields,
+        "__slots__": tuple(key for key in fields if key not in Book.FIELDS)
+    })
+
+
 @pytest.fixture
 def mock_get_request():
     """Creates a test response body."""
@@ -152,6 +171,101 @@ class TestFetchBooksByAuthor:
                 fetch_books_by_author("name", "url")
 
 
+@pytest.fixture
+def mock_search_pages():
+    """Serves five books in pages of the requested size."""
+    books = [{"key": f"/works/OL{i}W"} for i in range(5)]
+
+    def get(url, params=None, **kwargs):
+        start = (params["page"] - 1) * params["limit"]
+        body = {
+            "numFound": len(books),
+            "docs": books[start:start + params["limit"]]
+        }
+        if kwargs.get("stream"):
+            response = requests.Response()
+            response.status_code = 200
+            response.raw = io.BytesIO(json.dumps(body).encode())
+            return response
+        response = Mock()
+        response.json.return_value = body
+        return response
+
+    with patch("requests.get", side_effect=get) as mock_get:
+        yield mock_get
+
+
+class TestIterBooksByAuthor:
+    """Tests for the iter_books_by_author generator."""
+
+    def test_yields_books_from_every_page(self, mock_search_pages):
+        """Checks that all pages are walked in order."""
+        result = list(iter_books_by_author("name", "url", limit=2))
+
+        assert [book["key"] for book in result] == [
+            f"/works/OL{i}W" for i in range(5)
+        ]
+        assert [
+            call.kwargs["params"]["page"]
+            for call in mock_search_pages.call_args_list
+        ] == [1, 2, 3]
+
+    def test_stops_when_all_books_found(self, mock_search_pages):
+        """Checks that a full last page does not trigger another request."""
+        result = list(iter_books_by_author("name", "url", limit=5))
+
+        assert len(result) == 5
+        assert mock_search_pages.call_count == 1
+
+    def test_sends_author_and_page_size(self, mock_search_pages):
+        """Checks that the search parameters are sent."""
+        list(iter_books_by_author("Margaret Atwood", "url", limit=10))
+
+        mock_search_pages.assert_called_once_with(
+            "url/search.json",
+            params={
+                "author": "Margaret Atwood",
+                "page": 1,
+                "limit": 10,
+                "fields": search_fields()
+            }
+        )
+
+    def test_prefetches_next_page(self, mock_search_pages):
+        """Checks that the next page is requested before it is consumed."""
+        books = iter_books_by_author("name", "url", limit=2)
+        next(books)
+        books.close()
+
+        assert mock_search_pages.call_count == 2
+
+    @pytest.mark.parametrize("limit, pages", [(2, [1, 2, 3]), (5, [1])])
+    def test_streams_every_page(self, mock_search_pages, limit, pages):
+        """Checks that streamed pages are decoded into the same books."""
+        result = list(iter_books_by_author(
+            "name", "url", limit=limit, stream=True
+        ))
+
+        assert [book["key"] for book in result] == [
+            f"/works/OL{i}W" for i in range(5)
+        ]
+        assert [
+            call.kwargs["params"]["page"]
+            for call in mock_search_pages.call_args_list
+        ] == pages
+        assert all(
+            call.kwargs["stream"] for call in mock_search_pages.call_args_list
+        )
+
+    def test_streaming_prefetches_from_num_found(self, mock_search_pages):
+        """Checks that numFound triggers the next page at the first book."""
+        books = iter_books_by_author("name", "url", limit=2, stream=True)
+        next(books)
+        books.close()
+
+        assert mock_search_pages.call_count == 2
+
+
 @pytest.fixture
 def dummy_book_dict():
     """Creates a dummy book dictionary."""
@@ -184,6 +298,57 @@ def dummy_book_dict():
     yield dummy_data
 
 
+class TestSearchFields:
+    """Tests for the search_fields function."""
+
+    def test_lists_fields_read_from_search_docs(self):
+        """Checks that every field used downstream is requested."""
+        assert search_fields().split(",") == [
+            "key",
+            "title",
+            "author_name",
+            "first_publish_year",
+            "edition_count",
+            "language",
+            "cover_edition_key",
+            "lending_edition_s"
+        ]
+
+    def test_excludes_unused_fields(self):
+        """Checks that large unused arrays are not requested."""
+        fields = search_fields().split(",")
+
+        for field in ["ia", "lending_identifier_s", "ia_collection_s"]:
+            assert field not in fields
+
+    def test_follows_schema_changes(self, dummy_book_dict):
+        """Checks that new schema fields are requested and kept."""
+        schema = BOOK_FIELDS + (("cover_id", "cover_i", False),)
+
+        with patch("src.utils.Book", book_class(schema)):
+            assert "cover_i" in search_fields().split(",")
+            assert update_book_data(dummy_book_dict)["cover_id"] == 8231851
+
+    def test_generate_book_data_follows_schema_changes(self, dummy_book_dict):
+        """Checks that the main path keeps new schema fields too."""
+        schema = BOOK_FIELDS + (("cover_id", "cover_i", False),)
+        bodies = {
+            "url/search.json": {"numFound": 1, "docs": [dummy_book_dict]},
+            "url/works/OL675783W.json": {"subjects": ["Fiction"]},
+            "url/api/books": {}
+        }
+        session = Mock()
+        session.get.side_effect = lambda url, **kwargs: Mock(
+            **{"json.return_value": bodies[url]}
+        )
+
+        with patch("src.utils.Book", book_class(schema)):
+            books = generate_book_data("Margaret Atwood", "url", session=session)
+
+        assert books[0]["cover_id"] == 8231851
+        assert books[0]["subjects"] == ["Fiction"]
+
+
 class TestUpdateBookData:
     """Tests for the update_book_data function."""
 
@@ -566,7 +731,273 @@ class TestMergeDicts:
         }
 
 
-# class TestGenerateBookData:
-#     """Tests for the generate_book_data function."""
+@pytest.fixture
+def mock_pipeline_requests():
+    """Routes requests to search, work and edition response bodies."""
+    search_data = {
+        "numFound": 2,
+        "docs": [
+            {
+                "key": "/works/OL675783W",
+                "title": "The Handmaid's Tale",
+                "author_name": ["Margaret Atwood"],
+                "first_publish_year": 1985,
+                "edition_count": 147,
+                "language": ["eng"],
+                "cover_edition_key": "OL2769393M"
+            },
+            {
+                "key": "/works/OL675698W",
+                "title": "The Blind Assassin",
+                "author_name": ["Margaret Atwood"],
+                "first_publish_year": 2000,
+                "edition_count": 89,
+                "language": ["eng"],
+                "lending_edition_s": "OL37790601M"
+            }
+        ]
+    }
+    work_data = {
+        "/works/OL675783W": {"subjects": ["Dystopias"]},
+        "/works/OL675698W": {"subjects": ["Sisters", "Fiction"]}
+    }
+    edition_data = {
+        "OL2769393M": {
+            "publishers": ["McClelland & Stewart"],
+            "isbn_10": ["0771008139"]
+        },
+        "OL37790601M": {
+            "publishers": ["Virago"],
+            "isbn_13": ["9781844080298"]
+        }
+    }
+
+    def get(url, params=None, **kwargs):
+        response = Mock()
+        if "/search.json" in url:
+            response.json.return_value = search_data
+        elif "/works/" in url:
+            response.json.return_value = work_data[url[len("url"):-len(".json")]]
+        else:
+            response.json.return_value = {
+                bibkey: {"bib_key": bibkey, "details": edition_data[bibkey[5:]]}
+                for bibkey in params["bibkeys"].split(",")
+                if bibkey[5:] in edition_data
+            }
+        return response
+
+    with patch("requests.Session.get", side_effect=get) as mock_get:
+        yield mock_get
+
+
+class TestGenerateBookData:
+    """Tests for the generate_book_data function."""
+
+    expected = [
+        {
+            "id": "/works/OL675783W",
+            "title": "The Handmaid's Tale",
+            "author_name": ["Margaret Atwood"],
+            "first_publish_year": 1985,
+            "edition_count": 147,
+            "language": ["eng"],
+            "subjects": ["Dystopias"],
+            "publisher": ["McClelland & Stewart"],
+            "isbn": {"isbn_10": ["0771008139"], "isbn_13": []}
+        },
+        {
+            "id": "/works/OL675698W",
+            "title": "The Blind Assassin",
+            "author_name": ["Margaret Atwood"],
+            "first_publish_year": 2000,
+            "edition_count": 89,
+            "language": ["eng"],
+            "subjects": ["Sisters", "Fiction"],
+            "publisher": ["Virago"],
+            "isbn": {"isbn_10": [], "isbn_13": ["9781844080298"]}
+        }
+    ]
+
+    def test_generates_merged_book_data(self, mock_pipeline_requests):
+        """Checks that each book is merged with its subjects and ISBNs."""
+        result = generate_book_data("Margaret Atwood", "url")
+
+        assert result == self.expected
+        assert mock_pipeline_requests.call_count == 4
+
+    def test_concurrent_mode_returns_same_data(self, mock_pipeline_requests):
+        """Checks that the worker pool returns books in the same order."""
+        result = generate_book_data("Margaret Atwood", "url", max_workers=4)
+
+        assert result == self.expected
+        assert mock_pipeline_requests.call_count == 4
+
+    def test_concurrent_mode_raises_errors(self, mock_pipeline_requests):
+        """Checks that a failed enrichment request is not swallowed."""
+        route = mock_pipeline_requests.side_effect
+
+        def get(url, params=None, **kwargs):
+            response = route(url, params)
+            if "/api/books" in url:
+                response.raise_for_status.side_effect = (
+                    requests.exceptions.HTTPError("404 Client Error")
+                )
+            return response
+
+        mock_pipeline_requests.side_effect = get
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            generate_book_data("Margaret Atwood", "url", max_workers=2)
+
+    def test_uses_given_session(self, mock_pipeline_requests):
+        """Checks that every request goes through an injected session."""
+        session = Mock()
+        session.get.side_effect = mock_pipeline_requests.side_effect
+
+        result = generate_book_data("Margaret Atwood", "url", session=session)
+
+        assert result == self.expected
+        assert session.get.call_count == 4
+        mock_pipeline_requests.assert_not_called()
+
+
+    def test_batches_edition_lookups(self, mock_pipeline_requests):
+        """Checks that editions are looked up in batches of the given size."""
+        result = generate_book_data(
+            "Margaret Atwood", "url", max_workers=2, edition_batch_size=1
+        )
+
+        assert result == self.expected
+        assert mock_pipeline_requests.call_count == 5
+
+    def test_books_without_editions_have_empty_data(self, mock_pipeline_requests):
+        """Checks that books with no edition key are still returned."""
+        search = mock_pipeline_requests.side_effect("url/search.json")
+        search.json.return_value["docs"][1].pop("lending_edition_s")
+
+        result = generate_book_data("Margaret Atwood", "url")
+
+        assert result[0] == self.expected[0]
+        assert result[1]["publisher"] == []
+        assert result[1]["isbn"] == {"isbn_10": [], "isbn_13": []}
+
+
+class TestIterBookData:
+    """Tests for the iter_book_data generator."""
+
+    def test_yields_same_records_as_generate_book_data(
+        self, mock_pipeline_requests
+    ):
+        """Checks that the generator yields the generate_book_data records."""
+        result = iter_book_data("Margaret Atwood", "url")
+
+        assert not isinstance(result, list)
+        assert list(result) == TestGenerateBookData.expected
+
+    def test_yields_before_later_books_are_fetched(self, mock_pipeline_requests):
+        """Checks that the first record is available before the last."""
+        books = iter_book_data("Margaret Atwood", "url", edition_batch_size=1)
+
+        assert next(books) == TestGenerateBookData.expected[0]
+        assert mock_pipeline_requests.call_count == 3
+        books.close()
+
+    def test_book_records_match_book_data(self, mock_pipeline_requests):
+        """Checks that Book records convert to the same dictionaries."""
+        result = list(iter_book_records("Margaret Atwood", "url", max_workers=2))
+
+        assert all(isinstance(book, Book) for book in result)
+        assert [book.to_dict() for book in result] == TestGenerateBookData.expected
+
+    def test_concurrent_mode_streams_in_order(self, mock_pipeline_requests):
+        """Checks that the worker pool yields records in search order."""
+        result = list(iter_book_data(
+            "Margaret Atwood", "url", max_workers=3, edition_batch_size=1
+        ))
+
+        assert result == TestGenerateBookData.expected
+
+
+class TestFetchISBNandPublisherDataBatch:
+    """Tests for the fetch_isbn_and_publisher_data_batch function."""
+
+    def test_returns_data_for_each_edition(self, mock_pipeline_requests):
+        """Checks that every requested edition is resolved."""
+        with patch("requests.get", side_effect=mock_pipeline_requests.side_effect):
+            result = fetch_isbn_and_publisher_data_batch(
+                ["OL2769393M", "OL37790601M"], "url"
+            )
+
+        assert result == {
+            "OL2769393M": {
+                "publisher": ["McClelland & Stewart"],
+                "isbn": {"isbn_10": ["0771008139"], "isbn_13": []}
+            },
+            "OL37790601M": {
+                "publisher": ["Virago"],
+                "isbn": {"isbn_10": [], "isbn_13": ["9781844080298"]}
+            }
+        }
+
+    def test_requests_editions_in_batches(self):
+        """Checks that one request is made per batch of edition keys."""
+        session = Mock()
+        session.get.return_value.json.return_value = {}
+
+        result = fetch_isbn_and_publisher_data_batch(
+            ["OL1M", "OL2M", None, "OL3M", "OL1M"], "url", session, batch_size=2
+        )
+
+        assert [
+            call.kwargs["params"]["bibkeys"]
+            for call in session.get.call_args_list
+        ] == ["OLID:OL1M,OLID:OL2M", "OLID:OL3M"]
+        session.get.assert_called_with(
+            "url/api/books",
+            params={"bibkeys": "OLID:OL3M", "format": "json", "jscmd": "details"}
+        )
+        assert list(result) == ["OL1M", "OL2M", "OL3M"]
+        assert result["OL3M"] == {
+            "publisher": [], "isbn": {"isbn_10": [], "isbn_13": []}
+        }
+
+    def test_errors_raised(self):
+        """Checks that HTTP errors are raised."""
+        session = Mock()
+        session.get.return_value.raise_for_status.side_effect = (
+            requests.exceptions.HTTPError("500 Server Error")
+        )
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            fetch_isbn_and_publisher_data_batch(["OL1M"], "url", session)
+
+
+class TestCreateSession:
+    """Tests for the create_session function."""
+
+    def test_mounts_pooled_adapters(self):
+        """Checks that both schemes share a pool of the requested size."""
+        session = create_session(pool_size=25)
+
+        for prefix in ("https://", "http://"):
+            adapter = session.get_adapter(prefix + "openlibrary.org")
+            assert adapter._pool_maxsize == 25
+            assert adapter._pool_connections == 25
+
+    def test_requests_gzip_responses(self):
+        """Checks that gzip encoding is accepted."""
+        session = create_session()
+
+        assert session.headers["Accept-Encoding"] == "gzip"
+        assert session.headers["Connection"] == "keep-alive"
+
+    def test_fetch_functions_use_session(self, mock_subject_request):
+        """Checks that a session is used in place of requests.get."""
+        session = Mock()
+        session.get.return_value.json.return_value = {"subjects": ["Fiction"]}
+
+        result = fetch_book_subjects("/works/OL675783W", "url", session)
 
-#     def test_generates_data_for_single_book(self, mock_get_request):
+        assert result == {"subjects": ["Fiction"]}
+        session.get.assert_called_once_with("url/works/OL675783W.json")
+        mock_subject_request.assert_not_called()
@@ -0,0 +1,149 @@
+from bench.fake_server import FakeOpenLibrary
+from src.utils import generate_book_data
+from src.work_queue import WorkQueue, iter_queue_records, run_worker
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from unittest.mock import patch
+
+
+@pytest.fixture
+def queue(tmp_path):
+    """Creates a work queue in a temporary file."""
+    with WorkQueue(str(tmp_path / "queue.db")) as queue:
+        yield queue
+
+
+class TestWorkQueue:
+    """Tests for the WorkQueue class."""
+
+    def test_leases_each_task_once(self, queue):
+        """Checks that leased tasks are hidden from other workers."""
+        queue.put([("work", f"/works/OL{i}W", None) for i in range(3)])
+
+        first = queue.lease("a", limit=2)
+        second = queue.lease("b", limit=2)
+
+        assert len(first) == 2
+        assert len(second) == 1
+        assert queue.lease("c") == []
+        assert {key for _, key, _ in first + second} == {
+            "/works/OL0W", "/works/OL1W", "/works/OL2W"
+        }
+
+    def test_ignores_duplicate_tasks(self, queue):
+        """Checks that adding a task twice keeps one copy."""
+        queue.put([("edition", "OL1M", None)])
+        queue.put([("edition", "OL1M", {"other": True})])
+
+        assert queue.lease("a") == [("edition", "OL1M", None)]
+
+    def test_expired_leases_are_taken_again(self, queue):
+        """Checks the visibility timeout and that stale owners lose out."""
+        queue.put([("work", "/works/OL1W", None)])
+        queue.lease("a", visibility_timeout=10)
+
+        with patch("time.time", return_value=10 ** 10):
+            assert len(queue.lease("b")) == 1
+
+        assert not queue.complete("a", "work", "/works/OL1W", {"late": 1})
+        assert queue.complete("b", "work", "/works/OL1W", {"subjects": []})
+        assert queue.result("work", "/works/OL1W") == {"subjects": []}
+
+    def test_failed_tasks_are_retried_then_given_up(self, queue):
+        """Checks that a task fails for good after max_attempts."""
+        queue.put([("work", "/works/OL1W", None)])
+
+        queue.lease("a")
+        queue.fail("a", "work", "/works/OL1W", "boom", max_attempts=2)
+        assert queue.counts()["ready"] == 1
+
+        queue.lease("a")
+        queue.fail("a", "work", "/works/OL1W", "boom", max_attempts=2)
+        assert queue.counts() == {"ready": 0, "leased": 0, "done": 0, "failed": 1}
+
+    def test_expired_leases_count_as_attempts(self, queue):
+        """Checks that a task whose worker always dies is given up on."""
+        queue.put([("work", "/works/OL1W", None)])
+        queue.lease("a", visibility_timeout=10, max_attempts=2)
+
+        with patch("time.time", return_value=10 ** 10):
+            assert len(queue.lease("b", visibility_timeout=10, max_attempts=2)) == 1
+        with patch("time.time", return_value=10 ** 11):
+            assert queue.lease("c", max_attempts=2) == []
+
+        assert queue.counts() == {"ready": 0, "leased": 0, "done": 0, "failed": 1}
+        assert queue.pending() == 0
+
+    def test_uses_rollback_journal(self, queue):
+        """Checks that the database does not need WAL's shared memory."""
+        mode, = queue.connection.execute("PRAGMA journal_mode").fetchone()
+
+        assert mode == "delete"
+
+    def test_shards_split_tasks(self, tmp_path):
+        """Checks that each shard only leases its own tasks."""
+        path = str(tmp_path / "queue.db")
+        keys = [f"/works/OL{i}W" for i in range(20)]
+
+        with WorkQueue(path, shards=3) as queue:
+            queue.put([("work", key, None) for key in keys])
+            leased = [
+                {key for _, key, _ in queue.lease("a", limit=20, shard=shard)}
+                for shard in range(3)
+            ]
+
+        assert all(leased)
+        assert set().union(*leased) == set(keys)
+        assert sum(map(len, leased)) == len(keys)
+
+    def test_any_shard_runs_author_tasks(self, tmp_path):
+        """Checks that author tasks are leased whatever their shard."""
+        with WorkQueue(str(tmp_path / "queue.db"), shards=4) as queue:
+            queue.put([("author", f"Author {i}", None) for i in range(8)])
+
+            assert len(queue.lease("a", limit=8, shard=0)) == 8
+
+
+class TestRunWorker:
+    """Tests for running workers against a queue."""
+
+    def test_workers_produce_pipeline_records(self, tmp_path):
+        """Checks that several workers together match generate_book_data."""
+        path = str(tmp_path / "queue.db")
+
+        with FakeOpenLibrary(num_books=12, payload_size=1) as server:
+            with WorkQueue(path, shards=2) as queue:
+                queue.put([("author", "Author", None)])
+
+            def work(shard):
+                with WorkQueue(path, shards=2) as queue:
+                    return run_worker(
+                        queue,
+                        server.url,
+                        owner=f"worker-{shard}",
+                        shard=shard,
+                        lease_size=3,
+                        poll_interval=0.01
+                    )
+
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                completed = list(executor.map(work, [0, 1]))
+
+            expected = generate_book_data("Author", server.url)
+
+        with WorkQueue(path) as queue:
+            records = sorted(iter_queue_records(queue), key=lambda r: r["id"])
+            assert queue.counts()["done"] == 1 + 12 + 12
+
+        assert sum(completed) == 25
+        assert records == sorted(expected, key=lambda r: r["id"])
+
+    def test_records_failures(self, queue):
+        """Checks that failing tasks end up failed without stopping the worker."""
+        with FakeOpenLibrary(error_rate=1) as server:
+            queue.put([("work", "/works/OL1W", None)])
+            completed = run_worker(queue, server.url, max_attempts=2)
+
+        assert completed == 0
+        assert queue.counts()["failed"] == 1
+        assert list(iter_queue_records(queue)) == []